@@ -46,8 +46,14 @@ class Agent:
 
         if not self.generate_only:
             self.verifierClient = VerifierClient(
-                host = config["verifier"]["host"],
-                port = config["verifier"]["port"]
+                host      = config["verifier"]["host"],
+                port      = config["verifier"]["port"],
+                client_id = config["verifier"].get("client_id", None),
+                priority  = config["verifier"].get("priority", None),
+                # Off by default: tasks still queued or running after `deadline` seconds are cancelled on the server
+                deadline  = config["agent"]["verification"].get("deadline", None),
+                # Retries attach to the first submission instead of running the task again
+                idempotent = config["verifier"].get("idempotent", False),
             )
             self.verifierClient.wait_until_connected()
             self.verification_path = verification_path if verification_path else config["agent"]["verification"]["path"]
@@ -219,10 +225,10 @@ class Agent:
         if verification_executor: verification_executor.shutdown()
 
     def verify(self, data_list: list[str]) -> list[str]:
-        return [
-            self.verifierClient.query(
-                query_type = VerifierClient.QueryType.EQUAL,
-                data       = {
+        return self.verifierClient.query(
+            query_type = VerifierClient.QueryType.EQUAL,
+            data       = [
+                {
                    "signal_list" : Utils.extract_signals_nl2sva_human(
                         data["problem"],
                         data["testbench"],
@@ -233,9 +239,9 @@ class Agent:
                    "tb"          : data["testbench"],
                    "key_signal"  : "tb_reset",
                 }
-            )
-            for data in data_list
-        ]
+                for data in data_list
+            ]
+        )
     
     def generate(self, problem_data: list[dict[str, str]]) -> tuple[list[str]]:
         responses = self.get_responses(problem_data)
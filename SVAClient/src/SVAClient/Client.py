@@ -4,16 +4,64 @@ import requests
 import time
 import logging
 import os
-from typing import List, Callable, Any
+from typing import List, Callable, Any, Iterator
 from abc import ABC, abstractmethod
 from transformers import AutoTokenizer
 import traceback
+import json
+import uuid
 from enum import Enum
 
-from SVAClient.Utils import START_BACKOFF, backoff_update
+from SVAClient.Utils import START_BACKOFF, backoff_update, jittered_sleep
 
 CONNECTION_INTERVAL = 3
 
+class ServerBusyError(Exception):
+    """
+    The server rejected the request because its queue is full, `retry_after` is its drain time estimate in seconds.
+    """
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DeadlineExceededError(Exception):
+    """
+    The server gave up on the task because the deadline sent with the request passed, it is not retried.
+    """
+
+class TaskError(Exception):
+    """
+    The server ran the task but it failed, e.g. on a malformed payload. It is not retried.
+    """
+
+def raise_for_busy(response):
+    if response.status_code in (429, 503):
+        retry_after = response.headers.get("Retry-After")
+        raise ServerBusyError(
+            f"Response Code: {response.status_code}, {response.text}",
+            float(retry_after) if retry_after is not None else None,
+        )
+    if response.status_code == 504:
+        raise DeadlineExceededError(f"Response Code: {response.status_code}, {response.text}")
+
+def raise_for_errors(results):
+    """
+    Raise if the server could not produce the result of a /batch item, so such an error never ends up as a
+    result: `ServerBusyError` for items the server asks to send again (spilled by a drain, no backend free),
+    `TaskError` for the others. Those items carry "retryable", unlike tool failures (e.g. a JasperGold
+    timeout) which are results of their own.
+    """
+    failed = [(i, result) for i, result in enumerate(results) if "error" in result and "retryable" in result]
+    retryable = [result for _, result in failed if result.get("retryable")]
+    if retryable:
+        raise ServerBusyError(
+            f"{len(retryable)} of {len(results)} tasks must be sent again: {retryable[0]['error']}",
+            max((result.get("retry_after") for result in retryable if result.get("retry_after") is not None), default=None),
+        )
+    if failed:
+        index, result = failed[0]
+        raise TaskError(f"{len(failed)} of {len(results)} tasks failed, item {index}: {result['error']}")
+
 class Client(ABC):
 
     def wait_until_connected(self, time_interval=CONNECTION_INTERVAL):
@@ -30,6 +78,16 @@ class Client(ABC):
         while True:
             try:
                 return self._query_impl(**kwargs)
+            except (DeadlineExceededError, TaskError):
+                raise
+            except ServerBusyError as err:
+                if err.retry_after is None:
+                    logging.warning(f"{self.__class__.__name__}: server busy, waiting {curr_backoff} seconds and then retrying...")
+                    curr_backoff = backoff_update(curr_backoff)
+                else:
+                    logging.warning(f"{self.__class__.__name__}: server busy, retrying after about {err.retry_after} seconds...")
+                    jittered_sleep(err.retry_after)
+                continue
             except Exception as err:
                 logging.error(f"Error in {self.__class__.__name__}: {err}, waiting {curr_backoff} seconds and then retrying...")
                 logging.error(traceback.format_exc())
@@ -48,14 +106,35 @@ class VerifierClient(Client):
         VERIFY_IMPL_ONLY   = 6
         MVOTE              = 7
         EQUAL_OPT          = 8
+        EQUAL_MULTI        = 9
 
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, client_id: str | None = None, priority: int | None = None, deadline: float | None = None, include_report: bool = False, idempotent: bool = False):
         self._url = f"http://{host}:{port}"
+        # Send an idempotency key with each query, the server then keeps its result for a retry for `job_ttl`
+        self.idempotent = idempotent
+        # Optional scheduling hints: tasks of the same client share the server fairly, larger priority runs first
+        self.headers = dict(self.VERIFIER_SERVER_HEADER)
+        if client_id is not None:
+            self.headers["X-Client-Id"] = client_id
+        if priority is not None:
+            self.headers["X-Priority"] = str(priority)
+        # Seconds after which the server cancels a request's tasks instead of finishing them for nobody
+        if deadline is not None:
+            self.headers["X-Deadline"] = str(deadline)
+        # Results carry a report_id instead of the raw tool report unless it is asked for, see `get_report`
+        if include_report:
+            self.headers["X-Include-Report"] = "1"
 
     @property
     def url(self) -> str:
         return self._url
 
+    def query(self, **kwargs) -> Any:
+        # One idempotency key for all retries of this query, so the server runs it at most once
+        if self.idempotent:
+            kwargs.setdefault("idempotency_key", uuid.uuid4().hex)
+        return super().query(**kwargs)
+
     def get_query_type(self, query_type: QueryType):
         if query_type == self.QueryType.SYNTAX:
             return "syntax"
@@ -73,14 +152,88 @@ class VerifierClient(Client):
             return "mvote"
         if query_type == self.QueryType.EQUAL_OPT:
             return "equal_opt"
+        if query_type == self.QueryType.EQUAL_MULTI:
+            return "equal_multi"
         assert False, f"Unknown query type: {query_type}"
 
-    def _query_impl(self, query_type: str, data: dict[str, str]) -> dict[str, str]:
-        response = requests.post(url=f"{self.url}/{self.get_query_type(query_type)}", json=data, headers=self.VERIFIER_SERVER_HEADER)
+    def _query_impl(self, query_type: str, data: dict[str, str] | List[dict[str, str]], idempotency_key: str | None = None) -> dict[str, str] | List[dict[str, str]]:
+        headers = self.headers if idempotency_key is None else self.headers | {"Idempotency-Key": idempotency_key}
+        if isinstance(data, list):
+            # Send all tasks in one /batch call, results keep the order of `data`
+            batch = [{"endpoint": self.get_query_type(query_type), "payload": d} for d in data]
+            response = requests.post(url=f"{self.url}/batch", json=batch, headers=headers)
+        else:
+            response = requests.post(url=f"{self.url}/{self.get_query_type(query_type)}", json=data, headers=headers)
+        raise_for_busy(response)
         if response.status_code == 200:
             responses = response.json()
+            if isinstance(data, list):
+                raise_for_errors(responses)
             return responses
         raise Exception(f"Response Code: {response.status_code}, {response.text}")
+
+    def stream_query(self, query_type: QueryType, data: List[dict[str, str]]) -> Iterator[tuple[int, dict[str, str]]]:
+        """
+        Run `data` through /batch/stream and yield (index, result) pairs as soon as each task is done.
+        Unlike `query`, this is not retried since results may already have been consumed: failed items are
+        yielded as {"error", "retryable"}, retryable ones (spilled by a drain) can be sent again by the caller.
+        """
+        batch = [{"endpoint": self.get_query_type(query_type), "payload": d} for d in data]
+        with requests.post(url=f"{self.url}/batch/stream", json=batch, headers=self.headers, stream=True) as response:
+            raise_for_busy(response)
+            if response.status_code != 200:
+                raise Exception(f"Response Code: {response.status_code}, {response.text}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                yield item["index"], item["result"]
+
+    def submit_jobs(self, query_type: QueryType, data: List[dict[str, str]]) -> List[str]:
+        """
+        Enqueue `data` on the server without waiting, the results are fetched later with `poll_jobs`.
+        """
+        batch = [{"endpoint": self.get_query_type(query_type), "payload": d} for d in data]
+        response = requests.post(url=f"{self.url}/jobs", json=batch, headers=self.headers)
+        raise_for_busy(response)
+        if response.status_code == 200:
+            return response.json()["job_ids"]
+        raise Exception(f"Response Code: {response.status_code}, {response.text}")
+
+    def poll_jobs(self, job_ids: List[str], wait: float = 30) -> List[dict[str, Any]]:
+        """
+        Return the status of each job ("pending", "done", "error" or "unknown"), results are in "result".
+        Blocks up to `wait` seconds on the server until at least one of the jobs is finished.
+        """
+        response = requests.post(url=f"{self.url}/jobs/poll", json={"job_ids": job_ids, "wait": wait}, headers=self.headers)
+        if response.status_code == 200:
+            return response.json()["jobs"]
+        raise Exception(f"Response Code: {response.status_code}, {response.text}")
+
+    def get_report(self, report_id: str) -> str | None:
+        """
+        Raw tool report of a result, None once the server has evicted it.
+        """
+        response = requests.get(url=f"{self.url}/reports/{report_id}", headers=self.headers)
+        if response.status_code == 200:
+            return response.text
+        if response.status_code == 404:
+            return None
+        raise Exception(f"Response Code: {response.status_code}, {response.text}")
+
+    def wait_jobs(self, job_ids: List[str], poll_wait: float = 30) -> Iterator[tuple[str, dict[str, Any]]]:
+        """
+        Yield (job_id, status) for every job once it is finished, all from the calling thread.
+        """
+        pending = list(job_ids)
+        while pending:
+            jobs = self.poll_jobs(pending, wait=poll_wait)
+            pending = []
+            for job in jobs:
+                if job["status"] == "pending":
+                    pending.append(job["job_id"])
+                else:
+                    yield job["job_id"], job
         
 class LLMClient(Client):
     def __init__(self, config: dict[str, str]):
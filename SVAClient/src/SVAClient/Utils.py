@@ -6,13 +6,16 @@ import SVAClient.Prompter as Prompter
 from copy import deepcopy
 
 START_BACKOFF = 3
-MAX_BACKOFF   = 3
+MAX_BACKOFF   = 30
+
+def jittered_sleep(seconds):
+	# Spread retries of many clients over [0.5, 1.5] x `seconds` so they do not arrive in lockstep
+	time.sleep(seconds * random.uniform(0.5, 1.5))
 
 def backoff_update(curr_backoff):
-	time.sleep(curr_backoff)
+	jittered_sleep(curr_backoff)
 	curr_backoff *= 1.5
 	curr_backoff = min(curr_backoff, MAX_BACKOFF)
-	curr_backoff += random.random() * curr_backoff / 3
 	return curr_backoff
 
 def extract_after_last_think(text):
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Bump when the result format of any task, or how a task decides its result, changes so that old entries are ignored
+CACHE_VERSION = 5
+TCL_DIR = "tcls"
+EVICT_INTERVAL = 256
+
+def get_tcl_version():
+    """
+    Hash of every script under `tcls/`, so that editing a TCL flow invalidates the results it produced.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(TCL_DIR)):
+        digest.update(name.encode())
+        with open(os.path.join(TCL_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def normalize_payload(value):
+    # Trailing whitespace and surrounding blank lines never change the verification result
+    if isinstance(value, str):
+        return "\n".join(line.rstrip() for line in value.strip().splitlines())
+    if isinstance(value, dict):
+        return {k: normalize_payload(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [normalize_payload(v) for v in value]
+    return value
+
+def make_key(namespace, payload, version=""):
+    text = json.dumps(
+        [CACHE_VERSION, version, namespace, normalize_payload(payload)],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class ResultCache:
+    """
+    Content-addressed result cache stored in SQLite.
+    Entries are evicted in least-recently-used order once `max_entries` or `max_bytes` is exceeded.
+    The database may be shared by several processes.
+    """
+
+    def __init__(self, path, max_entries, max_bytes):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path        = path
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+        self._puts       = 0
+        self._lock       = threading.Lock()
+        self._conn       = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        text = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, len(text), time.time()),
+            )
+            self._puts += 1
+            if self._puts % EVICT_INTERVAL == 0:
+                self._evict()
+
+    def _evict(self):
+        count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        # Evict down to 90% of the limits to avoid evicting on every put
+        target_count = int(self.max_entries * 0.9)
+        target_size  = int(self.max_bytes * 0.9)
+        victims = []
+        for key, entry_size in self._conn.execute("SELECT key, size FROM cache ORDER BY last_access"):
+            if count <= target_count and size <= target_size:
+                break
+            victims.append((key,))
+            count -= 1
+            size  -= entry_size
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": count,
+            "size_bytes": size,
+        }
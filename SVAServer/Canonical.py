@@ -0,0 +1,426 @@
+import re
+
+# Canonical form of a concurrent assertion: two assertions with the same form are equivalent without asking
+# the formal tool. The form is an S-expression of the parsed property, so parentheses and whitespace are gone,
+# and it is normalized by:
+#   - dropping the label, the action block and the trailing `;`
+#   - sorting the operands of commutative operators and flattening associative ones
+#   - writing `a |=> b` as `a |-> ##1 b`, merging constant leading delays and dropping a leading `##0`
+#   - writing `>`/`>=` as `<`/`<=` with the operands swapped
+#   - writing `===`/`!==` as `==`/`!=` when both sides are known to be one bit wide and hold no x/z literal
+#   - writing based literals without x/z as `<width>'d<value>`
+# Anything outside the supported subset (`if`, `case`, `dist`, local variables, ...) has no canonical form.
+
+TOKEN = re.compile(r"""
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\])*")
+  | (?P<number>(?:\d[\d_]*\s*)?'[sS]?[bBoOdDhH]\s*[0-9a-fA-FxXzZ?_]+|'[01xXzZ]|\d[\d_]*(?:\.\d+)?)
+  | (?P<name>\$?[A-Za-z_][\w$]*|\\\S+)
+  | (?P<op>\[->|\[\*|\[=|\[\+\]|\|->|\|=>|\#-\#|\#=\#|<->|===|!==|==\?|!=\?|<<<|>>>
+          |\#\#|->|==|!=|<=|>=|&&|\|\||<<|>>|\*\*|~&|~\||~\^|\^~|\+:|-:
+          |[()\[\]{},;:@?!~&|^+\-*/%<>=.$])
+""", re.VERBOSE | re.DOTALL)
+
+# Binding powers, larger binds tighter. Boolean operators bind tighter than sequence and property operators.
+BINARY = {
+    "|->": 8, "|=>": 8, "#-#": 8, "#=#": 8,
+    "until": 10, "s_until": 10, "until_with": 10, "s_until_with": 10, "implies": 10,
+    "iff": 12,
+    "or": 14,
+    "and": 16,
+    "intersect": 20,
+    "within": 22,
+    "throughout": 24,
+    "##": 26,
+    "->": 30, "<->": 30,
+    "?": 32,
+    "||": 34,
+    "&&": 36,
+    "|": 38,
+    "^": 40, "~^": 40, "^~": 40,
+    "&": 42,
+    "==": 44, "!=": 44, "===": 44, "!==": 44, "==?": 44, "!=?": 44,
+    "<": 46, "<=": 46, ">": 46, ">=": 46,
+    "<<": 48, ">>": 48, "<<<": 48, ">>>": 48,
+    "+": 50, "-": 50,
+    "*": 52, "/": 52, "%": 52,
+    "**": 54,
+}
+RIGHT_ASSOCIATIVE = {
+    "|->", "|=>", "#-#", "#=#", "until", "s_until", "until_with", "s_until_with", "implies", "iff",
+    "throughout", "->", "<->", "?",
+}
+REPETITION_POWER = 28
+UNARY_POWER      = 56
+PREFIX_PROPERTY  = {"not": 18, "nexttime": 18, "s_nexttime": 18, "always": 6, "s_always": 6, "eventually": 6, "s_eventually": 6}
+UNARY            = {"!", "~", "&", "|", "^", "~&", "~|", "~^", "^~", "+", "-"}
+
+COMMUTATIVE = {"&&", "||", "&", "|", "^", "~^", "^~", "+", "*", "==", "!=", "===", "!==", "and", "or", "intersect", "iff", "<->"}
+ASSOCIATIVE = {"&&", "||", "&", "|", "^", "+", "*", "and", "or", "intersect"}
+MIRRORED    = {">": "<", ">=": "<="}
+# Operators and system functions whose result is one bit wide
+ONE_BIT_OPERATORS = {"&&", "||", "==", "!=", "===", "!==", "==?", "!=?", "<", "<=", "->", "<->"}
+ONE_BIT_UNARY     = {"!", "&", "|", "^", "~&", "~|", "~^", "^~"}
+ONE_BIT_FUNCTIONS = {"$rose", "$fell", "$stable", "$changed", "$onehot", "$onehot0", "$isunknown"}
+DIRECTIVES        = {"assert", "assume", "cover"}
+PROPERTY_OPERATORS = {"|->", "|=>", "#-#", "#=#", "until", "s_until", "until_with", "s_until_with", "implies", "iff", "not", "nexttime", "s_nexttime"}
+
+class ParseError(ValueError):
+    """
+    The assertion is outside the subset of SVA understood here.
+    """
+
+def tokenize(text):
+    tokens, pos = [], 0
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None:
+            raise ParseError(f"Unexpected character {text[pos]!r}")
+        pos = match.end()
+        if match.lastgroup != "space":
+            tokens.append((match.lastgroup, match.group()))
+    return tokens
+
+def canonical_number(text):
+    literal = re.fullmatch(r"(\d[\d_]*)?\s*'([sS]?)([bBoOdDhH])\s*([0-9a-fA-FxXzZ?_]+)", text)
+    if literal is None:
+        return text.replace("_", "").lower()
+    width, signed, base, digits = literal.groups()
+    digits = digits.replace("_", "").lower()
+    if re.search(r"[xz?]", digits):
+        return text.replace(" ", "").replace("_", "").lower()
+    value = int(digits, {"b": 2, "o": 8, "d": 10, "h": 16}[base.lower()])
+    return f"{width or ''}'{signed.lower()}d{value}"
+
+class Parser:
+    """
+    Pratt parser of SVA property expressions. Nodes are tuples, the first item names the node:
+    ("id", name), ("num", text), ("op", operator, operands...), ("seq", operand, delay, operand, ...) with None
+    as the first operand of a leading delay, ("delay", low, high), ("rep", kind, low, high, operand),
+    ("call", name, arguments...), ("select", base, index...), ("prefix", operator, range, operand).
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos    = 0
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index][1] if index < len(self.tokens) else None
+
+    def kind(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index][0] if index < len(self.tokens) else None
+
+    def next(self):
+        if self.pos >= len(self.tokens):
+            raise ParseError("Unexpected end of assertion")
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def expect(self, token):
+        found = self.next()
+        if found != token:
+            raise ParseError(f"Expected {token!r}, found {found!r}")
+
+    def assertion(self):
+        # [label :] assert property ( [clocking] [disable iff (...)] property ) [action block] [;]
+        if self.kind() == "name" and self.peek(1) == ":":
+            self.pos += 2
+        directive = None
+        if self.peek() in DIRECTIVES and self.peek(1) == "property":
+            directive = self.next()
+            self.pos += 1
+            self.expect("(")
+        clock, disable = self.clocking(), None
+        if self.peek() == "disable":
+            self.pos += 1
+            self.expect("iff")
+            self.expect("(")
+            disable = self.expression(0)
+            self.expect(")")
+        body = self.expression(0)
+        if directive is not None:
+            self.expect(")")
+            if self.peek() == "else":
+                # The action block has no effect on the proof
+                self.pos = len(self.tokens)
+        if self.peek() == ";":
+            self.pos += 1
+        if self.pos != len(self.tokens):
+            raise ParseError(f"Unexpected {self.peek()!r}")
+        return ("property", directive or "assert", clock, disable, body)
+
+    def clocking(self):
+        if self.peek() != "@":
+            return None
+        self.pos += 1
+        if self.peek() != "(":
+            return ("clock", None, ("id", self.next()))
+        self.pos += 1
+        edge = self.next() if self.peek() in ("posedge", "negedge", "edge") else None
+        signal = self.expression(0)
+        self.expect(")")
+        return ("clock", edge, signal)
+
+    def expression(self, power):
+        left = self.prefix()
+        while True:
+            token = self.peek()
+            if token in ("[*", "[=", "[->", "[+]") and REPETITION_POWER > power:
+                left = self.repetition(left)
+                continue
+            if self.kind() not in ("op", "name") or token not in BINARY or BINARY[token] <= power:
+                return left
+            self.pos += 1
+            right_power = BINARY[token] - 1 if token in RIGHT_ASSOCIATIVE else BINARY[token]
+            if token == "?":
+                middle = self.expression(0)
+                self.expect(":")
+                left = ("op", "?:", left, middle, self.expression(right_power))
+            elif token == "##":
+                delay = self.delay()
+                left = ("seq", left, delay, self.expression(right_power))
+            else:
+                left = ("op", token, left, self.expression(right_power))
+
+    def prefix(self):
+        token, kind = self.peek(), self.kind()
+        if token == "##":
+            self.pos += 1
+            delay = self.delay()
+            return ("seq", None, delay, self.expression(BINARY["##"]))
+        if kind == "name" and token in PREFIX_PROPERTY:
+            self.pos += 1
+            bounds = self.range() if self.peek() == "[" else None
+            return ("prefix", token, bounds, self.expression(PREFIX_PROPERTY[token]))
+        if kind == "op" and token in UNARY:
+            self.pos += 1
+            return ("op", token, self.expression(UNARY_POWER))
+        if token == "(":
+            self.pos += 1
+            inner = self.expression(0)
+            self.expect(")")
+            return inner
+        if token == "@":
+            clock = self.clocking()
+            return ("clocked", clock, self.expression(0))
+        return self.postfix(self.primary())
+
+    def primary(self):
+        kind, token = self.kind(), self.next()
+        if kind == "number":
+            return ("num", canonical_number(token))
+        if kind == "name":
+            if token in ("if", "case", "dist", "inside", "property", "sequence", "else", "disable", "strong", "weak",
+                         "first_match", "accept_on", "reject_on", "sync_accept_on", "sync_reject_on"):
+                raise ParseError(f"Unsupported {token!r}")
+            if self.peek() == "(":
+                self.pos += 1
+                arguments = []
+                while self.peek() != ")":
+                    if self.peek() == "@":
+                        raise ParseError("Clocked function arguments are not supported")
+                    arguments.append(self.expression(0))
+                    if self.peek() == ",":
+                        self.pos += 1
+                    elif self.peek() != ")":
+                        raise ParseError(f"Unexpected {self.peek()!r} in arguments")
+                self.pos += 1
+                return ("call", token, *arguments)
+            return ("id", token)
+        if token == "$":
+            return ("id", "$")
+        if token == "{":
+            items = [self.expression(0)]
+            if self.peek() == "{":
+                # Replication {n{...}}
+                self.pos += 1
+                inner = [self.expression(0)]
+                while self.peek() == ",":
+                    self.pos += 1
+                    inner.append(self.expression(0))
+                self.expect("}")
+                self.expect("}")
+                return ("repl", items[0], ("concat", *inner))
+            while self.peek() == ",":
+                self.pos += 1
+                items.append(self.expression(0))
+            self.expect("}")
+            return ("concat", *items)
+        raise ParseError(f"Unexpected {token!r}")
+
+    def postfix(self, node):
+        while True:
+            if self.peek() == "[":
+                self.pos += 1
+                index = self.expression(0)
+                if self.peek() in (":", "+:", "-:"):
+                    op = self.next()
+                    node = ("select", node, index, op, self.expression(0))
+                else:
+                    node = ("select", node, index)
+                self.expect("]")
+            elif self.peek() == "." and self.kind(1) == "name":
+                self.pos += 1
+                node = ("member", node, self.next())
+            else:
+                return node
+
+    def range(self):
+        # [low : high] with `$` for an unbounded high
+        self.expect("[")
+        low = self.expression(0)
+        high = low
+        if self.peek() == ":":
+            self.pos += 1
+            high = self.expression(0)
+        self.expect("]")
+        return (low, high)
+
+    def delay(self):
+        token = self.peek()
+        if token == "[*":
+            self.pos += 1
+            self.expect("]")
+            return ("delay", ("num", "0"), ("id", "$"))
+        if token == "[+]":
+            self.pos += 1
+            return ("delay", ("num", "1"), ("id", "$"))
+        if token == "[":
+            return ("delay", *self.range())
+        if token == "(":
+            self.pos += 1
+            value = self.expression(0)
+            self.expect(")")
+            return ("delay", value, value)
+        value = self.postfix(self.primary())
+        return ("delay", value, value)
+
+    def repetition(self, operand):
+        token = self.next()
+        if token == "[+]":
+            return ("rep", "[*", ("num", "1"), ("id", "$"), operand)
+        if token == "[*" and self.peek() == "]":
+            self.pos += 1
+            return ("rep", "[*", ("num", "0"), ("id", "$"), operand)
+        low = self.expression(0)
+        high = low
+        if self.peek() == ":":
+            self.pos += 1
+            high = self.expression(0)
+        self.expect("]")
+        return ("rep", token, low, high, operand)
+
+def constant(node):
+    # Value of an unsized decimal literal, None otherwise
+    if node[0] == "num" and node[1].isdigit():
+        return int(node[1])
+    return None
+
+def one_bit(node, one_bit_signals, vectors):
+    tag = node[0]
+    if tag == "id":
+        return node[1] in one_bit_signals
+    if tag == "num":
+        # A literal with an x, z or ? digit is never a known one bit value
+        return re.fullmatch(r"1's?d[01]", node[1]) is not None
+    if tag == "select":
+        # A single index of a multi-dimensional array selects a whole element
+        return len(node) == 3 and node[1][0] == "id" and node[1][1] in vectors
+    if tag == "call":
+        return node[1] in ONE_BIT_FUNCTIONS
+    if tag == "op":
+        if len(node) == 3:
+            return node[1] in ONE_BIT_UNARY or (node[1] == "~" and one_bit(node[2], one_bit_signals, vectors))
+        if node[1] in ONE_BIT_OPERATORS:
+            return True
+        if node[1] in ("&", "|", "^", "~^", "^~"):
+            return all(one_bit(operand, one_bit_signals, vectors) for operand in node[2:])
+    return False
+
+def has_unknown(node):
+    # Whether a literal with an x, z or ? digit appears anywhere in `node`, e.g. as the index of a select
+    if node[0] == "num":
+        return re.search(r"'s?[bodh]?[0-9a-f_]*[xz?]", node[1]) is not None
+    return any(has_unknown(child) for child in node[1:] if isinstance(child, tuple))
+
+def is_property(node):
+    # Only a sequence can follow a delay, so `a |=> p` is kept when `p` is a property
+    return node[0] in ("prefix", "clocked") or (node[0] == "op" and node[1] in PROPERTY_OPERATORS)
+
+def leading_delay(delay, node):
+    # `##delay node` with constant leading delays merged and `##0` dropped
+    if node[0] == "seq" and node[1] is None:
+        low, high = constant(node[2][1]), constant(node[2][2])
+        outer_low, outer_high = constant(delay[1]), constant(delay[2])
+        if None not in (low, high, outer_low, outer_high):
+            rest = node[3] if len(node) == 4 else ("seq", *node[3:])
+            return leading_delay(("delay", ("num", str(low + outer_low)), ("num", str(high + outer_high))), rest)
+        return ("seq", None, delay, node)
+    if constant(delay[1]) == 0 and constant(delay[2]) == 0:
+        return node
+    if node[0] == "seq":
+        return ("seq", None, delay, *node[1:])
+    return ("seq", None, delay, node)
+
+def normalize(node, one_bit_signals, vectors):
+    if node is None or not isinstance(node, tuple) or node[0] in ("id", "num"):
+        return node
+    node = tuple(normalize(child, one_bit_signals, vectors) if isinstance(child, tuple) else child for child in node)
+    tag = node[0]
+    if tag == "seq":
+        # Concatenation is associative: flatten (a ##1 b) ##1 c and a ##1 (b ##1 c) into one chain,
+        # only the first item of a chain can be a leading delay
+        items = []
+        for i, item in enumerate(node[1:]):
+            if i % 2 == 0 and item is not None and item[0] == "seq" and (item[1] is not None or i == 0):
+                items.extend(item[1:])
+            else:
+                items.append(item)
+        if items[0] is None:
+            return leading_delay(items[1], items[2] if len(items) == 3 else ("seq", *items[2:]))
+        return ("seq", *items)
+    if tag == "rep" and node[1] == "[*" and constant(node[2]) == 1 and constant(node[3]) == 1:
+        return node[4]
+    if tag != "op" or len(node) != 4:
+        return node
+    op, left, right = node[1:]
+    if op == "|=>" and not is_property(right):
+        return ("op", "|->", left, leading_delay(("delay", ("num", "1"), ("num", "1")), right))
+    if op in MIRRORED:
+        return ("op", MIRRORED[op], right, left)
+    if (
+        op in ("===", "!==")
+        and one_bit(left, one_bit_signals, vectors) and one_bit(right, one_bit_signals, vectors)
+        and not has_unknown(left) and not has_unknown(right)
+    ):
+        op = op[:-1]
+    operands = [left, right]
+    if op in ASSOCIATIVE:
+        operands = []
+        for operand in (left, right):
+            operands.extend(operand[2:] if operand[0] == "op" and operand[1] == op and len(operand) > 3 else [operand])
+    if op in COMMUTATIVE:
+        operands.sort(key=render)
+    return ("op", op, *operands)
+
+def render(node):
+    if node is None:
+        return "_"
+    if node[0] in ("id", "num"):
+        return node[1]
+    return "(" + " ".join(render(child) if isinstance(child, tuple) or child is None else str(child) for child in node) + ")"
+
+def canonical(sva, one_bit_signals=frozenset(), vectors=frozenset()):
+    """
+    Canonical form of the assertion `sva`, None if it is outside the supported subset.
+    `one_bit_signals` names the signals known to be one bit wide, `vectors` those known to have a single
+    dimension, a single index of them is one bit. The form always contains a space, so it never equals
+    an assertion with its whitespace removed.
+    """
+    try:
+        tree = Parser(sva).assertion()
+    except (ParseError, IndexError, RecursionError):
+        return None
+    return render(normalize(tree, frozenset(one_bit_signals), frozenset(vectors)))
@@ -0,0 +1,506 @@
+import uvicorn
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+import httpx
+import asyncio
+import argparse
+import bisect
+import hashlib
+import json
+import time
+import yaml
+from Tasks import TASK_TYPES
+
+# Forwarded to the backends, X-Client-Id is always set so that fair queuing still sees the real client
+FORWARDED_HEADERS = ("X-Client-Id", "X-Priority", "X-Deadline", "X-Include-Report")
+
+def hash_key(text):
+    return int(hashlib.sha1(text.encode()).hexdigest()[:16], 16)
+
+def shard_key(payload):
+    # Tasks on the same design go to the same backend, so its design level caches stay warm
+    if not isinstance(payload, dict):
+        return None
+    design = payload.get("tb") or payload.get("impl")
+    return design if isinstance(design, str) else None
+
+class Backend:
+    def __init__(self, url):
+        self.url         = url.rstrip("/")
+        self.healthy     = False
+        self.max_workers = 1
+        # Queued and running tasks reported by the backend at the last probe
+        self.reported    = 0
+        # Tasks sent by the coordinator that are not answered yet
+        self.inflight    = 0
+        # The backend answered 429, do not send it anything before this time
+        self.busy_until  = 0.0
+
+    def load(self):
+        return max(self.reported, self.inflight) / max(self.max_workers, 1)
+
+    def available(self):
+        return self.healthy and time.time() >= self.busy_until
+
+    def snapshot(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "max_workers": self.max_workers,
+            "reported": self.reported,
+            "inflight": self.inflight,
+            "load": self.load(),
+            "busy_for": max(0.0, self.busy_until - time.time()),
+        }
+
+class HashRing:
+    """
+    Consistent hash ring with `virtual_nodes` points per backend, adding or removing a backend
+    only moves the designs next to its points.
+    """
+
+    def __init__(self, backends, virtual_nodes):
+        self._ring = sorted(
+            (hash_key(f"{backend.url}#{i}"), index)
+            for index, backend in enumerate(backends)
+            for i in range(virtual_nodes)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    def walk(self, key):
+        # Backend indices in ring order, starting at the point after `key`
+        start = bisect.bisect(self._points, hash_key(key))
+        seen = set()
+        for i in range(len(self._ring)):
+            index = self._ring[(start + i) % len(self._ring)][1]
+            if index not in seen:
+                seen.add(index)
+                yield index
+
+def candidates(payload):
+    """
+    Backends to try for `payload`, best first. Without a shard key the least loaded backend comes first.
+    With one, the first backend in ring order whose load is within `LOAD_SLACK` of the average (or that
+    still has idle workers) comes first, so a hot design spills over instead of overloading its backend.
+    """
+    available = [backend for backend in backends if backend.available()]
+    by_load = sorted(available, key=lambda backend: backend.load())
+    key = shard_key(payload)
+    if key is None or not available:
+        return by_load
+    bound = max(1.0, (1 + LOAD_SLACK) * sum(backend.load() for backend in available) / len(available))
+    for index in hash_ring.walk(key):
+        backend = backends[index]
+        if backend.available() and backend.load() < bound:
+            return [backend] + [other for other in by_load if other is not backend]
+    return by_load
+
+def forward_headers(request: Request, idempotency_key=None):
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    headers.setdefault("X-Client-Id", request.client.host if request.client else "anonymous")
+    if idempotency_key is not None:
+        headers["Idempotency-Key"] = idempotency_key
+    return headers
+
+def busy_response(message):
+    # Every backend is busy (or down): tell the client when the first saturated one expects to have room again,
+    # a backend that is only down may be back at the next probe
+    now = time.time()
+    waits = [backend.busy_until - now for backend in backends if backend.busy_until > now]
+    retry_after = max(1, round(min(waits, default=PROBE_INTERVAL)))
+    return JSONResponse(
+        content={"error": message, "retry_after": retry_after},
+        status_code=429 if any(backend.healthy for backend in backends) else 503,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+def refused(backend, response):
+    # Queue full or draining for a restart, the backend gets nothing until its Retry-After has passed
+    if response.status_code not in (429, 503):
+        return False
+    backend.busy_until = time.time() + float(response.headers.get("Retry-After", PROBE_INTERVAL))
+    return True
+
+async def forward(path, payload, headers, route_payload=None, order=None):
+    """
+    POST `payload` to the backends in `order`, by default the best ones for `route_payload` (itself `payload`
+    by default), moving on to the next one when a backend is unreachable or answers 429.
+    Returns (backend, response), or (None, None) if none took it.
+    """
+    if order is None:
+        order = candidates(payload if route_payload is None else route_payload)
+    # A batch counts with all its tasks
+    tasks = len(payload) if isinstance(payload, list) else 1
+    for backend in order:
+        if not backend.available():
+            continue
+        backend.inflight += tasks
+        try:
+            response = await http_client.post(backend.url + path, json=payload, headers=headers)
+        except httpx.TransportError:
+            backend.healthy = False
+            continue
+        finally:
+            backend.inflight -= tasks
+        if refused(backend, response):
+            continue
+        return backend, response
+    return None, None
+
+def json_body(response):
+    # Content of a successful JSON answer, None for errors and anything else a backend (or a proxy) sent
+    if response.status_code != 200 or not response.headers.get("content-type", "").startswith("application/json"):
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+def relay(response):
+    # The backend's answer as it is, without parsing it
+    return Response(content=response.content, status_code=response.status_code, media_type=response.headers.get("content-type"))
+
+async def until_disconnected(request: Request, awaitable):
+    """
+    Wait for `awaitable`, cancel it if the client disconnects first. Closing the backend connection lets the
+    backend cancel the task in turn. Returns None in that case.
+    """
+    task = asyncio.ensure_future(awaitable)
+    while not task.done():
+        await asyncio.wait([task], timeout=DISCONNECT_POLL_INTERVAL)
+        if not task.done() and await request.is_disconnected():
+            task.cancel()
+            return None
+    return task.result()
+
+async def probe(backend):
+    try:
+        response = await http_client.get(backend.url + "/status", timeout=PROBE_INTERVAL)
+        status = response.json()
+    except (httpx.HTTPError, ValueError):
+        backend.healthy = False
+        return
+    # A draining backend takes no new tasks, its jobs can still be fetched
+    backend.healthy     = not status.get("draining", False)
+    backend.max_workers = status["max_workers"]
+    backend.reported    = status["queued"] + status["active_workers"]
+    if status["queued"] < status["queue_max_size"]:
+        backend.busy_until = 0.0
+
+async def probe_backends():
+    while True:
+        await asyncio.gather(*[probe(backend) for backend in backends])
+        await asyncio.sleep(PROBE_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=None, max_keepalive_connections=MAX_CONNECTIONS))
+    await asyncio.gather(*[probe(backend) for backend in backends])
+    asyncio.create_task(probe_backends())
+    yield
+    await http_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.get("/cluster")
+async def handle_cluster_state():
+    return {"backends": [backend.snapshot() for backend in backends]}
+
+@app.post("/syntax")
+@app.post("/cov")
+@app.post("/verify")
+@app.post("/equal")
+@app.post("/equal_opt")
+@app.post("/equal_multi")
+@app.post("/testbench")
+@app.post("/verify_impl_only")
+@app.post("/svparse")
+@app.post("/mvote")
+async def handle_request(request: Request):
+    body = await request.json()
+    forwarded = await until_disconnected(request, forward(request.url.path, body, forward_headers(request, request.headers.get("Idempotency-Key"))))
+    if forwarded is None:
+        return JSONResponse(content={"error": "Client disconnected"}, status_code=499)
+    _, response = forwarded
+    if response is None:
+        return busy_response("No verifier backend can take the task, please try again later")
+    return relay(response)
+
+def parse_items(request: Request, body):
+    """
+    Items of a batch, which are routed one by one, see `plan_batch()`. The Idempotency-Key header is turned
+    into per item keys here, the same way a server does it for a whole batch.
+    """
+    if not isinstance(body, list):
+        raise ValueError("Batch body must be a list of {endpoint, payload} items")
+    key = request.headers.get("Idempotency-Key")
+    items = []
+    for i, item in enumerate(body):
+        if not isinstance(item, dict) or "payload" not in item:
+            raise ValueError(f"Batch item {i} must be a {{endpoint, payload}} object")
+        if "/" + item.get("endpoint", "").lstrip("/") not in TASK_TYPES:
+            raise ValueError(f"Unknown endpoint in batch item {i}: {item.get('endpoint')}")
+        if key and not item.get("idempotency_key"):
+            item = item | {"idempotency_key": f"{key}:{i}" if len(body) > 1 else key}
+        items.append(item)
+    return items
+
+def plan_batch(items):
+    """
+    Group the items of a batch by the backend `candidates()` picks for each of them, so that every backend gets
+    a single batch. Returns [(backends to try, indices of the items)], the indices in batch order.
+    Planned items count as in flight while the rest are placed, so items without a shard key are spread
+    over the backends like single requests would be.
+    """
+    groups = {}
+    for i, item in enumerate(items):
+        order = candidates(item["payload"])
+        backend = order[0] if order else None
+        if backend is not None:
+            backend.inflight += 1
+        groups.setdefault(backend, (order, []))[1].append(i)
+    for backend, (_, indices) in groups.items():
+        if backend is not None:
+            backend.inflight -= len(indices)
+    return list(groups.values())
+
+def no_backend_error():
+    return {"error": "No verifier backend can take the task, please try again later", "retryable": True}
+
+def response_error(response):
+    return {"error": f"Response Code: {response.status_code}, {response.text}", "retryable": False}
+
+async def forward_group(request: Request, items, order):
+    # Results of `items` sent as one batch, or error objects with "retryable" like the servers return them
+    _, response = await forward("/batch", items, forward_headers(request), order=order)
+    if response is None:
+        return [no_backend_error() for _ in items]
+    results = json_body(response)
+    if not isinstance(results, list) or len(results) != len(items):
+        return [response_error(response) for _ in items]
+    return results
+
+@app.post("/batch")
+async def handle_batch(request: Request):
+    try:
+        items = parse_items(request, await request.json())
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    groups = plan_batch(items)
+    answers = await until_disconnected(
+        request,
+        asyncio.gather(*[forward_group(request, [items[i] for i in indices], order) for order, indices in groups]),
+    )
+    if answers is None:
+        return JSONResponse(content={"error": "Client disconnected"}, status_code=499)
+    results = [None] * len(items)
+    for (_, indices), answer in zip(groups, answers):
+        for i, result in zip(indices, answer):
+            results[i] = result
+    if any(result.get("retryable") for result in results):
+        # Like a backend, the whole batch is retried when an item found no backend or was spilled by a drain
+        return busy_response("No verifier backend can take every task, please try again later")
+    return results
+
+async def stream_group(request: Request, items, indices, order, results):
+    """
+    Send `items` as one /batch/stream to the first backend in `order` that takes them and put
+    (batch index, result) on the queue `results` as the backend streams them. Items the backend never
+    answered, e.g. because it went away, get an error object.
+    """
+    answered = set()
+    error = no_backend_error()
+    for backend in order:
+        if not backend.available():
+            continue
+        backend.inflight += len(items)
+        try:
+            async with http_client.stream("POST", backend.url + "/batch/stream", json=items, headers=forward_headers(request)) as response:
+                if refused(backend, response):
+                    continue
+                if response.status_code != 200:
+                    await response.aread()
+                    error = response_error(response)
+                    break
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        answer = json.loads(line)
+                        answered.add(answer["index"])
+                        await results.put((indices[answer["index"]], answer["result"]))
+                error = {"error": "Verifier backend closed the stream early", "retryable": True}
+                break
+        except (ValueError, KeyError, IndexError, TypeError):
+            error = {"error": f"Verifier backend {backend.url} sent an invalid stream", "retryable": False}
+            break
+        except httpx.TransportError:
+            backend.healthy = False
+            if answered:
+                # The backend already ran part of the items, the client retries the rest
+                error = {"error": f"Lost verifier backend {backend.url}", "retryable": True}
+                break
+        finally:
+            backend.inflight -= len(items)
+    for i in range(len(items)):
+        if i not in answered:
+            await results.put((indices[i], error))
+
+@app.post("/batch/stream")
+async def handle_batch_stream(request: Request):
+    try:
+        items = parse_items(request, await request.json())
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    async def stream_results():
+        results = asyncio.Queue()
+        tasks = [
+            asyncio.create_task(stream_group(request, [items[i] for i in indices], indices, order, results))
+            for order, indices in plan_batch(items)
+        ]
+        try:
+            for _ in items:
+                index, result = await results.get()
+                yield json.dumps({"index": index, "result": result}, ensure_ascii=False) + "\n"
+        finally:
+            # The client went away: closing the backend streams lets the backends cancel the tasks
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# Job ids handed out by the coordinator are "<backend index>.<backend job id>"
+def make_job_id(backend, job_id):
+    return f"{backends.index(backend)}.{job_id}"
+
+def split_job_id(job_id):
+    index, _, backend_job_id = job_id.partition(".")
+    if not index.isdigit() or int(index) >= len(backends) or not backend_job_id:
+        return None, None
+    return backends[int(index)], backend_job_id
+
+@app.post("/jobs")
+async def handle_submit_jobs(request: Request):
+    body = await request.json()
+    try:
+        items = parse_items(request, [body] if isinstance(body, dict) else body)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    async def submit(group, order):
+        backend, response = await forward("/jobs", group, forward_headers(request), order=order)
+        content = json_body(response) if response is not None else None
+        if content is None or len(content.get("job_ids", ())) != len(group):
+            return [None] * len(group)
+        return [make_job_id(backend, job_id) for job_id in content["job_ids"]]
+
+    groups = plan_batch(items)
+    answers = await asyncio.gather(*[submit([items[i] for i in indices], order) for order, indices in groups])
+    job_ids = [None] * len(items)
+    for (_, indices), answer in zip(groups, answers):
+        for i, job_id in zip(indices, answer):
+            job_ids[i] = job_id
+    if None in job_ids:
+        # Jobs that were accepted keep running, a retry with the same idempotency key picks them up again
+        return busy_response("Not every job could be submitted, please try again later")
+    if isinstance(body, dict):
+        return {"job_id": job_ids[0]}
+    return {"job_ids": job_ids}
+
+async def poll_backend(backend, job_ids, wait, include_report=False):
+    body = {"job_ids": job_ids, "wait": wait, "include_report": include_report}
+    response = await http_client.post(backend.url + "/jobs/poll", json=body)
+    content = json_body(response)
+    if content is None:
+        # Its jobs are reported as unknown, like those of an unreachable backend
+        return {}
+    return {make_job_id(backend, job["job_id"]): job | {"job_id": make_job_id(backend, job["job_id"])} for job in content["jobs"]}
+
+@app.post("/jobs/poll")
+async def handle_poll_jobs(request: Request):
+    body = await request.json()
+    job_ids = body.get("job_ids", [])
+    wait = min(float(body.get("wait", 0)), JOB_MAX_WAIT)
+    include_report = bool(body.get("include_report", False))
+    by_backend = {}
+    for job_id in job_ids:
+        backend, backend_job_id = split_job_id(job_id)
+        if backend is not None:
+            by_backend.setdefault(backend, []).append(backend_job_id)
+    # Long-poll every backend, once one of them has a finished job the others are asked again without waiting
+    polls = {asyncio.create_task(poll_backend(backend, ids, wait, include_report)): backend for backend, ids in by_backend.items()}
+    done, pending = await asyncio.wait(polls, return_when=asyncio.FIRST_COMPLETED) if polls else (set(), set())
+    for task in pending:
+        task.cancel()
+    statuses = {}
+    for task in done:
+        if task.exception() is None:
+            statuses.update(task.result())
+    retries = await asyncio.gather(
+        *[poll_backend(polls[task], by_backend[polls[task]], 0, include_report) for task in pending],
+        return_exceptions=True,
+    )
+    for retry in retries:
+        if not isinstance(retry, Exception):
+            statuses.update(retry)
+    return {"jobs": [statuses.get(job_id, {"job_id": job_id, "status": "unknown"}) for job_id in job_ids]}
+
+@app.get("/jobs/{job_id}")
+async def handle_get_job(request: Request, job_id: str, wait: float = 0, include_report: bool = False):
+    backend, backend_job_id = split_job_id(job_id)
+    if backend is None:
+        return JSONResponse(content={"error": f"Unknown or expired job: {job_id}"}, status_code=404)
+    response = await http_client.get(
+        f"{backend.url}/jobs/{backend_job_id}",
+        params={"wait": min(wait, JOB_MAX_WAIT), "include_report": include_report},
+        headers=forward_headers(request),
+    )
+    content = json_body(response)
+    if content is None:
+        return relay(response)
+    return content | {"job_id": job_id}
+
+@app.delete("/jobs/{job_id}")
+async def handle_delete_job(job_id: str):
+    backend, backend_job_id = split_job_id(job_id)
+    if backend is None:
+        return {"deleted": False}
+    response = await http_client.delete(f"{backend.url}/jobs/{backend_job_id}")
+    return relay(response)
+
+@app.get("/reports/{report_id}")
+async def handle_get_report(report_id: str):
+    # Reports stay on the backend that ran the task, ask them all
+    responses = await asyncio.gather(
+        *[http_client.get(f"{backend.url}/reports/{report_id}") for backend in backends],
+        return_exceptions=True,
+    )
+    for response in responses:
+        if not isinstance(response, Exception) and response.status_code == 200:
+            return PlainTextResponse(response.text)
+    return JSONResponse(content={"error": f"Unknown or evicted report: {report_id}"}, status_code=404)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--config",
+        type=str,
+        required=True,
+        help="Config file path",
+    )
+    args = parser.parse_args()
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    config = config['coordinator']
+
+    backends        = [Backend(url) for url in config['backends']]
+    hash_ring       = HashRing(backends, virtual_nodes=config.get('virtual_nodes', 64))
+    # A design stays on its backend until that backend is this much more loaded than the average
+    LOAD_SLACK      = config.get('load_slack', 0.25)
+    PROBE_INTERVAL  = config.get('probe_interval', 2)
+    JOB_MAX_WAIT    = config.get('job_max_wait', 60)
+    MAX_CONNECTIONS = config.get('max_connections', 256)
+    DISCONNECT_POLL_INTERVAL = config.get('disconnect_poll_interval', 1.0)
+    http_client     = None
+    uvicorn.run(app, host=config['host'], port=config['port'])
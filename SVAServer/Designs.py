@@ -0,0 +1,61 @@
+import os
+import fcntl
+import threading
+import Cache
+
+# Bump when the declaration index format or its inference changes so that old entries are ignored
+SIGNAL_CACHE_VERSION = 1
+# Designs are spread over this many lock files, see `memoize()`
+LOCK_STRIPES = 64
+
+# Set by `configure()`, the cache itself is opened lazily in the process that runs the tasks
+cache_config = None
+design_cache = None
+cache_pid    = None
+cache_lock   = threading.Lock()
+
+def configure(path, max_entries, max_bytes):
+    """
+    Keep the results derived from a design (the declarations of a testbench, the testbench of an RTL design)
+    in the SQLite database `path`, shared by all worker processes.
+    Must be called before the worker processes are forked.
+    """
+    global cache_config
+    cache_config = {"path": path, "max_entries": max_entries, "max_bytes": max_bytes}
+
+def get_cache():
+    global design_cache, cache_pid
+    with cache_lock:
+        # A connection inherited through fork must not be used by the child
+        if design_cache is None or cache_pid != os.getpid():
+            design_cache = Cache.ResultCache(
+                path        = cache_config["path"],
+                max_entries = cache_config["max_entries"],
+                max_bytes   = cache_config["max_bytes"],
+            )
+            cache_pid = os.getpid()
+        return design_cache
+
+def memoize(namespace, design, version, compute):
+    """
+    Return `compute()` for the source text `design`, computed at most once per design and `version` by all
+    workers together: a worker that finds no entry takes a file lock, so concurrent requests on one design
+    wait for the first instead of running Yosys too. None (a failed run) is not stored.
+    """
+    if cache_config is None:
+        return compute()
+    key = Cache.make_key(namespace, design, version)
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_dir = cache_config["path"] + ".locks"
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, f"lock_{int(key[:8], 16) % LOCK_STRIPES}"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                cache.put(key, value)
+    return value
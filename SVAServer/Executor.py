@@ -6,28 +6,35 @@ import re
 from typing import List
 from Utils import add_sva_to_tb_equal, add_sva_to_tb_verify, add_sva_to_impl_verify, find_declarations_yosys
 import Utils
+import Runner
+import Sessions
+import Reports
+import Designs
+import Lint
+from Vote import extract_sva, normalize, assertion_key, MajorityVote
 import json
 
-def extract_sva(sva):
-    if ":" not in sva or sva.startswith("property"):
-        return sva
-    return sva.split(":", 1)[1].strip()
+# Testbenches are memoized per design and generator version, see `testbench_generate()`
+TESTBENCH_VERSION = Utils.get_generator_version()
 
-def normalize(sva):
-    return re.sub(r'\s+', '', sva)
+def report_stream(verdict=None):
+    # Reports longer than report_max_bytes keep only their head and tail, the verdict lines are matched on the fly
+    verdict = verdict or {"patterns": [], "final": []}
+    return Reports.ReportStream.for_verdict(verdict, max_bytes=Utils.config_global.get('report_max_bytes', 1 << 20))
 
-def run_jaspergold(jg_command: List[str]) -> str:
+def run_jaspergold(jg_command: List[str], stream=None, timeout=None) -> str:
+    """
+    Run JasperGold, its output is fed to `stream` and jg is stopped once the stream has its verdict.
+    The metrics are then computed from `stream.matched_text()`, the returned report may be truncated.
+    """
+    stream = stream or report_stream()
+    timeout = timeout or Utils.config_global['time_limit']
     try:
-        result = subprocess.run(
-            jg_command,
-            shell=False,
-            check=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            timeout=Utils.config_global['time_limit'],
-        )
-        report = result.stdout
+        if Sessions.enabled():
+            # Same script and -define variables, fed to a long-lived jg session instead of a new process
+            _, report = Sessions.run_jaspergold(jg_command, timeout=timeout, stream=stream)
+        else:
+            _, report, _ = Runner.run_command(jg_command, timeout=timeout, stream=stream)
         state = True
     except subprocess.TimeoutExpired:
         print("JasperGold process timed out.")
@@ -37,6 +44,10 @@ def run_jaspergold(jg_command: List[str]) -> str:
         print(f"Error running JasperGold: {str(e)}")
         report = f"Error: {str(e)}"
         state = False
+    if not state:
+        # Metrics of a failed run come from the error alone, as before
+        stream.matched.clear()
+        return {"ok": state, "report": report, "error": report}
     return {"ok": state, "report": report}
 
 def run_yosys(code, work_dir):
@@ -44,17 +55,16 @@ def run_yosys(code, work_dir):
     with open(verilog_filepath, 'w') as f:
         f.write(code)
     json_filepath = os.path.join(work_dir, "output.json")
-    yosys_script = f"""
-    read_verilog {verilog_filepath}
-    proc
-    write_json {json_filepath}
-    """
-    script_filepath = os.path.join(work_dir, "script.ys")
-    with open(script_filepath, 'w') as f:
-        f.write(yosys_script)
+    yosys_script = [
+        f"read_verilog {verilog_filepath}",
+        "proc",
+        f"write_json {json_filepath}",
+    ]
 
     try:
-        subprocess.run(['yosys', script_filepath], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=Utils.config_global['time_limit'])
+        returncode, log = Utils.run_yosys_script(yosys_script, work_dir, Utils.config_global['time_limit'])
+        if returncode != 0:
+            raise Exception(Utils.yosys_error(log))
         with open(json_filepath, 'r') as f:
             json_data = f.read()
         state = True
@@ -68,9 +78,28 @@ def run_yosys(code, work_dir):
         state = False
     return {"ok": state, "data": json_data}
 
+def lint(texts, scope=None, names=()):
+    # Problems of `texts` that fail elaboration for sure, see Lint.py, [] with static_lint off
+    if not Utils.config_global.get('static_lint', True):
+        return []
+    if scope is not None:
+        # Only logged, JasperGold may still find these names
+        for text in texts:
+            for problem in Lint.undeclared(text, scope, names):
+                print(f"Lint warning: {problem}")
+    return [problem for text in texts for problem in Lint.lint(text)]
+
+def lint_result(problems, metrics):
+    # Same metrics as a syntax error reported by JasperGold, without running it
+    return metrics | {"ok": True, "report": "Lint failed:\n" + "\n".join(problems), "lint": problems}
+
+def signal_names(task_data):
+    return re.findall(r"[A-Za-z_]\w*", task_data.get("signal_list") or "")
+
 def syntax_check(task_data, work_dir):
 
     def calculate_jg_metric_for_syntax(jasper_out_str: str):
+        # Same patterns as `Reports.SYNTAX_VERDICT`
         syntax_error_match = re.findall(r"\[ERROR \(VERI-\d+\)\]", jasper_out_str)
         syntax_error_match2 = re.findall(r"ERROR: problem encountered", jasper_out_str)
         if syntax_error_match or syntax_error_match2:
@@ -82,6 +111,9 @@ def syntax_check(task_data, work_dir):
         }
 
     impl = task_data["impl"]
+    problems = lint([impl])
+    if problems:
+        return lint_result(problems, {"syntax": False})
     sva_path = os.path.join(work_dir, "sva.sva")
     with open(sva_path, "w") as f:
         f.write(impl)
@@ -101,8 +133,9 @@ def syntax_check(task_data, work_dir):
         "-allow_unsupported_OS",
     ]
     print("Running JasperGold with command:", " ".join(jg_command))
-    result = run_jaspergold(jg_command)
-    metrics = calculate_jg_metric_for_syntax(result['report'])
+    stream = report_stream(Reports.SYNTAX_VERDICT)
+    result = run_jaspergold(jg_command, stream)
+    metrics = calculate_jg_metric_for_syntax(stream.matched_text())
     return metrics | result
 
 def coverage_check(task_data, work_dir):
@@ -143,11 +176,89 @@ def coverage_check(task_data, work_dir):
         "-allow_unsupported_OS",
     ]
     print("Running JasperGold with command:", " ".join(jg_command))
-    result = run_jaspergold(jg_command)
-    return result
+    stream = report_stream(Reports.COVERAGE_VERDICT)
+    result = run_jaspergold(jg_command, stream)
+    structured = {
+        "properties": Reports.parse_properties(stream.matched_text()),
+        "coverage": Reports.parse_coverage(stream.matched_text()),
+    }
+    return structured | result
+
+# Directive of a concurrent assertion with its label if it has one, e.g. `asrt_0: assert property (...)`
+ASSERTION_LABEL = re.compile(r"(?:\b\w+\s*:\s*)?\b(?=(assert|assume|cover)\s+property\b)")
+
+def label_assertion(label, asrt):
+    """
+    `asrt` with `label` in front of its first assert/assume/cover directive, replacing an existing label,
+    so declarations before it (`property p; ... endproperty`, `let`, `sequence`) stay valid.
+    Returns (text, False) and leaves the text alone when there is no directive.
+    """
+    text, count = ASSERTION_LABEL.subn(f"{label}: ", asrt.strip(), count=1)
+    return text, count == 1
+
+def label_assertions(asrts):
+    """
+    [(label, labeled assertion, whether the label was put in)] of a list of assertions (labeled asrt_<i>)
+    or a {label: assertion} dict, so JasperGold reports each assertion under its stable label.
+    """
+    items = asrts.items() if isinstance(asrts, dict) else ((f"asrt_{i}", asrt) for i, asrt in enumerate(asrts))
+    return [(str(label), *label_assertion(label, asrt)) for label, asrt in items]
+
+def label_statuses(labels, properties, unlabeled=()):
+    """
+    {label: status}, JasperGold names properties by their hierarchical path and the label is the last component.
+    The labels of `unlabeled` have no directive to put them on, they get the statuses of the properties
+    that no label claims, by position.
+    """
+    names = [prop["name"].rsplit(".", 1)[-1] if prop["name"] else None for prop in properties]
+    by_label = {name: prop["status"] for name, prop in zip(names, properties) if name is not None}
+    unclaimed = [prop["status"] for name, prop in zip(names, properties) if name not in labels]
+    statuses = {}
+    for label in labels:
+        if label in unlabeled:
+            statuses[label] = unclaimed.pop(0) if unclaimed else None
+        else:
+            statuses[label] = by_label.get(label)
+    return statuses
+
+def verify_multi(task_data, work_dir, verify_one):
+    """
+    Prove all assertions of `asrts` in one JasperGold run of `verify_one`. The result has a status per label
+    in `labels` ("proven", "cex", "undetermined", ..., "syntax_error" or None when JasperGold did not report it).
+    A syntax error fails the elaboration of all of them, then each assertion is verified on its own.
+    """
+    labeled = label_assertions(task_data["asrts"])
+    labels = [label for label, _, _ in labeled]
+    unlabeled = {label for label, _, has_label in labeled if not has_label}
+    task = {key: value for key, value in task_data.items() if key != "asrts"}
+    result = verify_one(task | {"asrt": "\n".join(asrt for _, asrt, _ in labeled)}, work_dir)
+    if not result.get("ok") or result["syntax"] or len(labeled) == 1:
+        statuses = label_statuses(labels, result.get("properties", []), unlabeled)
+        if result.get("ok") and not result["syntax"]:
+            statuses = {label: "syntax_error" for label in labels}
+        return result | {"labels": statuses}
+    statuses, properties = {}, []
+    for label, asrt, _ in labeled:
+        single = verify_one(task | {"asrt": asrt}, work_dir)
+        properties += single.get("properties", [])
+        if single.get("ok") and not single["syntax"]:
+            statuses[label] = "syntax_error"
+        else:
+            statuses[label] = label_statuses([label], single.get("properties", []), unlabeled)[label]
+    count = float(len(labels))
+    # Same fractions as `calculate_jg_metric_for_verify`, over the assertions instead of one run
+    return result | {
+        "syntax": sum(status != "syntax_error" for status in statuses.values()) / count,
+        "functionality": sum(status == "proven" for status in statuses.values()) / count,
+        "func_relaxed": sum(status in ("proven", "undetermined") for status in statuses.values()) / count,
+        "properties": properties,
+        "labels": statuses,
+    }
 
 def correctness_verify_impl_only(task_data, work_dir):
     # Syntax + Correctness
+    if "asrts" in task_data:
+        return verify_multi(task_data, work_dir, correctness_verify_impl_only)
     # 不需要 tb，sva 直接插入到 impl 里面
     clock          = task_data.get("clock", None)
     reset          = task_data.get("reset", None)
@@ -157,8 +268,11 @@ def correctness_verify_impl_only(task_data, work_dir):
     reset_polarity = task_data.get("reset_polarity", None)
     try:
         sva = add_sva_to_impl_verify(impl, asrt, top_name, reset, reset_polarity)
+        problems = lint([asrt], add_sva_to_impl_verify(impl, "", top_name, reset, reset_polarity))
     except Exception as err:
         return {"ok": False, "error": str(err)}
+    if problems:
+        return lint_result(problems, {"syntax": 0.0, "functionality": 0.0, "func_relaxed": 0.0, "properties": []})
     sva_path = os.path.join(work_dir, "sva.sva")
     with open(sva_path, "w") as f:
         f.write(sva)
@@ -197,12 +311,16 @@ def correctness_verify_impl_only(task_data, work_dir):
         tmp_jg_proj_dir,
         "-allow_unsupported_OS",
     ])
-    result = run_jaspergold(jg_command)
-    metrics = Utils.calculate_jg_metric_for_verify(result['report'])
+    stream = report_stream(Reports.VERIFY_VERDICT)
+    result = run_jaspergold(jg_command, stream)
+    metrics = Utils.calculate_jg_metric_for_verify(stream.matched_text())
+    metrics["properties"] = Reports.parse_properties(stream.matched_text())
     return metrics | result
 
 def correctness_verify(task_data, work_dir):
     # Syntax + Correctness
+    if "asrts" in task_data:
+        return verify_multi(task_data, work_dir, correctness_verify)
     # 需要 sv, sva, clock, reset
     clock    = task_data.get("clock", None)
     reset    = task_data.get("reset", None)
@@ -210,6 +328,9 @@ def correctness_verify(task_data, work_dir):
     asrt     = task_data["asrt"]
     impl     = task_data["impl"]
     top_name = task_data.get("top_name", None)
+    problems = lint([asrt], tb + "\n" + impl)
+    if problems:
+        return lint_result(problems, {"syntax": 0.0, "functionality": 0.0, "func_relaxed": 0.0, "properties": []})
     sva = add_sva_to_tb_verify(tb, asrt)
     sva_path = os.path.join(work_dir, "sva.sva")
     sv_path = os.path.join(work_dir, "sv.sv")
@@ -255,25 +376,49 @@ def correctness_verify(task_data, work_dir):
         tmp_jg_proj_dir,
         "-allow_unsupported_OS",
     ])
-    result = run_jaspergold(jg_command)
-    metrics = Utils.calculate_jg_metric_for_verify(result['report'])
+    stream = report_stream(Reports.VERIFY_VERDICT)
+    result = run_jaspergold(jg_command, stream)
+    metrics = Utils.calculate_jg_metric_for_verify(stream.matched_text())
+    metrics["properties"] = Reports.parse_properties(stream.matched_text())
     return metrics | result
 
+def signal_list_task(task_data, work_dir):
+    return {"ok": True, "signal_list": infer_signal_list(task_data, work_dir)}
+
 def get_local_params(code):
     params = re.findall(r"localparam\s+(?:\[[^\]]+\]\s+)?(\w+)\s*=", code)
     return [{"name" : p} for p in params]
 
-def infer_signal_list(task_data, work_dir):
-    code = task_data['tb']
+def declaration_index(code, work_dir):
+    # Declarations of the testbench, None if Yosys cannot parse it
     yosys_result = run_yosys(code, work_dir)
     if not yosys_result['ok']:
-        return ""
+        return None
     json_data = json.loads(yosys_result['data'])
     results = find_declarations_yosys(json_data)
+    return results | {"local_params": get_local_params(code)}
+
+def design_declarations(code, work_dir):
+    # Every sample of a problem shares its testbench, Yosys runs once per testbench, see `Designs.memoize()`
+    return Designs.memoize("declarations", code, Designs.SIGNAL_CACHE_VERSION, lambda: declaration_index(code, work_dir))
+
+def signal_widths(task_data, work_dir):
+    # (signals of one bit, signals with a single dimension) of the testbench, see `Canonical.canonical()`
+    results = design_declarations(task_data['tb'], work_dir)
+    if results is None:
+        return frozenset(), frozenset()
+    one_bit = frozenset(var['name'] for var in results['variables'] if var.get("width", 1) == 1)
+    return one_bit, frozenset(Utils.vector_names(task_data['tb']))
+
+def infer_signal_list(task_data, work_dir):
+    code = task_data['tb']
+    results = design_declarations(code, work_dir)
+    if results is None:
+        return ""
     signals = []
     signals_ = []
     vis = set()
-    for var in results['variables'] + results['parameters'] + get_local_params(code):
+    for var in results['variables'] + results['parameters'] + results['local_params']:
         var_name = var['name']
         if var_name in vis: continue
         vis.add(var_name)
@@ -285,62 +430,82 @@ def infer_signal_list(task_data, work_dir):
     signals.extend(signals_)
     return ', '.join(signals)
 
+def extract_assertion(sva, key_signal="tb_reset"):
+    sva = sva.strip().replace("\n", "")
+    sva = sva.split(f"{key_signal})")[-1].strip().split(");")[0].strip()
+    return sva
+
+def match_without_tool(asrt, ref_asrt, get_signal_widths):
+    """
+    Report of a pair that is equivalent by construction, None if JasperGold has to decide.
+    `get_signal_widths()` is only called when `===` or `!==` may turn into `==` or `!=`.
+    """
+    if normalize(extract_sva(asrt)) == normalize(extract_sva(ref_asrt)):
+        return "String Match Passed."
+    if assertion_key(asrt) == assertion_key(ref_asrt):
+        return "Canonical Match Passed."
+    if any(op in text for op in ("===", "!==") for text in (asrt, ref_asrt)):
+        one_bit, vectors = get_signal_widths()
+        if (one_bit or vectors) and assertion_key(asrt, one_bit, vectors) == assertion_key(ref_asrt, one_bit, vectors):
+            return "Canonical Match Passed."
+    return None
+
 def equality_check_opt(task_data, work_dir):
-    if normalize(extract_sva(task_data["asrt"])) == normalize(extract_sva(task_data["ref_asrt"])):
+    report = match_without_tool(task_data["asrt"], task_data["ref_asrt"], lambda: signal_widths(task_data, work_dir))
+    if report is not None:
         return {
             "ok": True,
             "syntax": True,
             "functionality": True,
             "func_relaxed": True,
-            "report": "String Match Passed.",
+            "report": report,
         }
     return equality_check(task_data, work_dir)
 
-def equality_check(task_data, work_dir):
+# TODO: add more metrics for other report
+def calculate_jg_metric_for_equal(jasper_out_str: str):
+    # Same patterns as `Reports.EQUAL_VERDICT`
+    # check for syntax error
+    syntax_error_match = re.findall(r"syntax error", jasper_out_str)
+    if syntax_error_match:
+        return {
+            "syntax": False,
+            "functionality": False,
+            "func_relaxed": False,
+        }
 
-    # TODO: add more metrics for other report
-    def calculate_jg_metric_for_equal(jasper_out_str: str):
-        # check for syntax error
-        syntax_error_match = re.findall(r"syntax error", jasper_out_str)
-        if syntax_error_match:
+    # check for functionality error
+    # match for "Full equivalence" in jaspert output string
+    full_equiv_match = re.findall(r"Full equivalence", jasper_out_str)
+    partial_equiv_match = re.findall(r"implies", jasper_out_str)
+    if not full_equiv_match:
+        if not partial_equiv_match:
             return {
-                "syntax": False,
+                "syntax": True,
                 "functionality": False,
                 "func_relaxed": False,
             }
+        else:
+            return {
+                "syntax": True,
+                "functionality": False,
+                "func_relaxed": True,
+            }
+    return {
+        "syntax": True,
+        "functionality": True,
+        "func_relaxed": True,
+    }
 
-        # check for functionality error
-        # match for "Full equivalence" in jaspert output string
-        full_equiv_match = re.findall(r"Full equivalence", jasper_out_str)
-        partial_equiv_match = re.findall(r"implies", jasper_out_str)
-        if not full_equiv_match:
-            if not partial_equiv_match:
-                return {
-                    "syntax": True,
-                    "functionality": False,
-                    "func_relaxed": False,
-                }
-            else:
-                return {
-                    "syntax": True,
-                    "functionality": False,
-                    "func_relaxed": True,
-                }
-        return {
-            "syntax": True,
-            "functionality": True,
-            "func_relaxed": True,
-        }
+def equality_check(task_data, work_dir):
 
-    def extract_assertion(sva, key_signal="tb_reset"):
-        sva = sva.strip().replace("\n", "")
-        sva = sva.split(f"{key_signal})")[-1].strip().split(");")[0].strip()
-        return sva
-    
     # 需要 asrt, ref_asrt, signal_list
     # Syntax + Equality
     
     # sva = task_data.get("sva", "")
+    problems = lint([task_data['asrt'], task_data['ref_asrt']], task_data['tb'], signal_names(task_data))
+    if problems:
+        return lint_result(problems, {"syntax": False, "functionality": False, "func_relaxed": False})
     sva = add_sva_to_tb_equal(
         task_data['tb'],
         task_data['asrt'], 
@@ -350,7 +515,8 @@ def equality_check(task_data, work_dir):
     ref_assertion_text = extract_assertion(task_data['ref_asrt'], task_data['key_signal'])
 
     if task_data.get("signal_list", None) is None:
-        task_data["signal_list"] = infer_signal_list(task_data, work_dir)
+        # A copy, in thread mode the caller's dict may be shared with other tasks
+        task_data = task_data | {"signal_list": infer_signal_list(task_data, work_dir)}
     signal_list_text = task_data["signal_list"]
     sva_path = os.path.join(work_dir, "sva.sva")
     with open(sva_path, "w") as f:
@@ -380,26 +546,33 @@ def equality_check(task_data, work_dir):
         "-allow_unsupported_OS",
     ]
     print("########## Running JasperGold with command:", " ".join(jg_command))
-    result = run_jaspergold(jg_command)
-    metrics = calculate_jg_metric_for_equal(result['report'])
+    stream = report_stream(Reports.EQUAL_VERDICT)
+    result = run_jaspergold(jg_command, stream)
+    metrics = calculate_jg_metric_for_equal(stream.matched_text())
     return metrics | result
 
+def generate_testbench(impl, work_dir):
+    impl_path = os.path.join(work_dir, "impl.v")
+    with open(impl_path, "w") as f:
+        f.write(impl)
+    top_name = Utils.auto_top(impl)
+    ports = Utils.extract_golden_ports(impl_path, top_name, Utils.config_global["time_limit"])
+    testbench = Utils.get_tb_code(
+        top_name,
+        *ports
+    )
+    clk, reset, reset_polarity = Utils.get_clk_and_rst_name(ports[-2], ports[-1])
+    return {"testbench": testbench, "top_name": top_name, "clk": clk, "reset": reset, "reset_polarity": reset_polarity}
+
 def testbench_generate(task_data, work_dir):
     try:
         impl = task_data["impl"]
-        impl_path = os.path.join(work_dir, "impl.v")
-        with open(impl_path, "w") as f:
-            f.write(impl)
-        top_name = Utils.auto_top(impl)
-        ports = Utils.extract_golden_ports(impl_path, top_name, Utils.config_global["time_limit"])
-        testbench = Utils.get_tb_code(
-            top_name,
-            *ports
-        )
-        clk, reset, reset_polarity = Utils.get_clk_and_rst_name(ports[-2], ports[-1])
+        # Design-to-SVA flows ask for the testbench of the same RTL over and over, a change
+        # of the generator gives a new version and old testbenches are ignored
+        result = Designs.memoize("testbench", impl, TESTBENCH_VERSION, lambda: generate_testbench(impl, work_dir))
     except Exception as err:
         return {"ok": False, "error": str(err)}
-    return {"ok": True, "testbench": testbench, "top_name": top_name, "clk": clk, "reset": reset, "reset_polarity": reset_polarity}
+    return {"ok": True} | result
 
 def yosys_parse(task_data, work_dir):
     impl = task_data["impl"]
@@ -408,31 +581,151 @@ def yosys_parse(task_data, work_dir):
 
 
 def majority_vote(task_data, work_dir):
+    # Sequential vote inside one worker, the server normally fans the comparisons out, see `Server.run_majority_vote()`
+    vote = MajorityVote(task_data["asrts"])
+    if task_data.get("signal_list", None) is None and len(vote.nodes) > 1:
+        task_data = task_data | {"signal_list": infer_signal_list(task_data, work_dir)}
+    while not vote.finished():
+        for a, b in vote.next_pairs(1):
+            result = equality_check(equal_task(task_data, vote.nodes[a], vote.nodes[b]), work_dir)
+            vote.record(a, b, result["ok"] and result["functionality"])
+    return vote.result()
+
+def equal_task(task_data, asrt, other):
+    """
+    Payload of the equality check of two assertions of a vote. Equivalence is symmetric, so the pair is
+    put in a fixed order and a repeated comparison hits the result cache whichever side it came from.
+    """
+    asrt, ref_asrt = sorted((asrt, other))
+    task = {key: value for key, value in task_data.items() if key != "asrts"}
+    return task | {"asrt": asrt, "ref_asrt": ref_asrt}
+
+def equal_multi_pairs(task_data):
+    """
+    Index pairs of `equality_check_multi()`, (i, None) for the pairs with `ref_asrt`.
+    Raises ValueError when `asrts` is not a list or a pair does not index it.
+    """
+    asrts = task_data.get("asrts") if isinstance(task_data, dict) else None
+    if not isinstance(asrts, list):
+        raise ValueError("equal_multi needs a list of asrts")
+    if task_data.get("ref_asrt") is not None:
+        return [(i, None) for i in range(len(asrts))]
+    if task_data.get("pairs") is None:
+        return [(i, j) for i in range(len(asrts)) for j in range(i + 1, len(asrts))]
+    if not isinstance(task_data["pairs"], list):
+        raise ValueError("pairs must be a list of [i, j] index pairs")
+    pairs = []
+    for pair in task_data["pairs"]:
+        try:
+            i, j = (int(index) for index in pair)
+        except (TypeError, ValueError):
+            raise ValueError(f"pairs must be a list of [i, j] index pairs, got {pair!r}")
+        if not (0 <= i < len(asrts) and 0 <= j < len(asrts)):
+            raise ValueError(f"Pair {pair!r} is out of range of the {len(asrts)} asrts")
+        pairs.append((i, j))
+    return pairs
+
+def equality_check_multi(task_data, work_dir):
+    """
+    Equivalence of many assertion pairs of one testbench in a single JasperGold run.
+    With `ref_asrt` every assertion of `asrts` is checked against it, otherwise the index pairs of `pairs`,
+    by default every pair of `asrts` (for voting). Pairs equivalent by construction skip JasperGold, see `match_without_tool()`.
+    The testbench is elaborated once with every checked assertion in it, only if that fails is each pair
+    elaborated on its own, like `verify_multi()`.
+    Returns one {asrt, ref_asrt, checked, syntax, functionality, func_relaxed} per pair, ref_asrt is None for
+    `ref_asrt`. Pairs the run did not reach, because it failed or timed out, are not checked and have no metrics.
+    """
     asrts = task_data["asrts"]
-    equivalence_classes = []
-    if task_data.get("signal_list", None) is None:
-        task_data["signal_list"] = infer_signal_list(task_data, work_dir)
-
-    for asrt in asrts:
-        found_class = False
-        for eq_class in equivalence_classes:
-            # Compare the current assertion with the first assertion in the equivalence class
-            task_data_ = task_data.copy()
-            if normalize(extract_sva(asrt)) == normalize(extract_sva(eq_class[0])):
-                # No need to conduct equality check when two asrt are the same under string matching
-                eq_class.append(asrt)
-                found_class = True
-                break
-            task_data_["asrt"] = asrt
-            task_data_["ref_asrt"] = eq_class[0]
-            result = equality_check(task_data_, work_dir)
-            if result["ok"] and result["functionality"]:
-                eq_class.append(asrt)
-                found_class = True
-                break
-        if not found_class:
-            # Create a new equivalence class if no match is found
-            equivalence_classes.append([asrt])
-
-    max_class = max(equivalence_classes, key=len, default=[])
-    return {"ok": True, "equivalence_classes": equivalence_classes, "vote_result": max_class[0]}
\ No newline at end of file
+    pairs = equal_multi_pairs(task_data)
+
+    def text(index):
+        return task_data["ref_asrt"] if index is None else asrts[index]
+
+    widths = []
+    def get_signal_widths():
+        # Looked up once per task, and only if a pair needs it
+        if not widths:
+            widths.append(signal_widths(task_data, work_dir))
+        return widths[0]
+
+    problems = {}
+    def lint_text(index):
+        if index not in problems:
+            problems[index] = lint([text(index)], task_data["tb"], signal_names(task_data))
+        return problems[index]
+
+    verdicts = [None] * len(pairs)
+    checked = []
+    for k, (i, j) in enumerate(pairs):
+        if match_without_tool(text(i), text(j), get_signal_widths) is not None:
+            verdicts[k] = {"checked": True, "syntax": True, "functionality": True, "func_relaxed": True}
+        elif lint_text(i) or lint_text(j):
+            # Fails elaboration for sure, like a syntax error reported by JasperGold
+            verdicts[k] = {"checked": True, "syntax": False, "functionality": False, "func_relaxed": False, "lint": lint_text(i) + lint_text(j)}
+        else:
+            checked.append(k)
+    result = {
+        "ok": True,
+        "report": f"JasperGold not run: {len(pairs) - len(checked)} pairs decided without it, "
+                  f"{sum('lint' in verdict for verdict in verdicts if verdict)} of them by the static checks.",
+    }
+    if checked:
+        if task_data.get("signal_list", None) is None:
+            task_data = task_data | {"signal_list": infer_signal_list(task_data, work_dir)}
+        pair_dir = os.path.join(work_dir, "pairs")
+        os.makedirs(pair_dir, exist_ok=True)
+        # Each assertion once, under a label of its own
+        indices = sorted({index for k in checked for index in pairs[k]}, key=lambda index: -1 if index is None else index)
+        shared = [label_assertion("reference" if index is None else f"asrt_{index}", text(index))[0] for index in indices]
+        sva_path = os.path.join(work_dir, "sva.sva")
+        with open(sva_path, "w") as f:
+            f.write(add_sva_to_tb_verify(task_data["tb"], "\n\n".join(shared)))
+        for n, k in enumerate(checked):
+            asrt, ref_asrt = text(pairs[k][0]), text(pairs[k][1])
+            files = {
+                "sva": add_sva_to_tb_equal(task_data["tb"], asrt, ref_asrt),
+                "lm": extract_assertion(asrt, task_data["key_signal"]),
+                "ref": extract_assertion(ref_asrt, task_data["key_signal"]),
+            }
+            for ext, content in files.items():
+                with open(os.path.join(pair_dir, f"pair_{n}.{ext}"), "w") as f:
+                    f.write(content)
+        tcl_file_path = "tcls/equality_multi_check.tcl"
+        tmp_jg_proj_dir = os.path.join(work_dir, "jg_proj")
+        jg_command = [
+            "jg",
+            "-fpv",
+            "-batch",
+            "-tcl",
+            tcl_file_path,
+            "-define",
+            "SVA_PATH",
+            sva_path,
+            "-define",
+            "PAIR_DIR",
+            pair_dir,
+            "-define",
+            "PAIR_COUNT",
+            str(len(checked)),
+            "-define",
+            "SIGNAL_LIST",
+            task_data["signal_list"],
+            "-proj",
+            tmp_jg_proj_dir,
+            "-allow_unsupported_OS",
+        ]
+        print("########## Running JasperGold with command:", " ".join(jg_command))
+        stream = report_stream(Reports.EQUAL_MULTI_VERDICT)
+        # The shared elaboration and each pair get the time limit of a single check
+        result = run_jaspergold(jg_command, stream, timeout=Utils.config_global['time_limit'] * (len(checked) + 1))
+        result["shared_elaboration"] = Reports.shared_elaboration(stream.matched_text())
+        outputs = Reports.split_pairs(stream.matched_text())
+        for n, k in enumerate(checked):
+            if n in outputs:
+                verdicts[k] = {"checked": True} | calculate_jg_metric_for_equal(outputs[n])
+            else:
+                # Not reached before the run failed or timed out, nothing is known about the pair
+                verdicts[k] = {"checked": False, "syntax": None, "functionality": None, "func_relaxed": None}
+    return result | {
+        "pairs": [{"asrt": i, "ref_asrt": j} | verdict for (i, j), verdict in zip(pairs, verdicts)],
+    }
@@ -0,0 +1,80 @@
+import time
+import uuid
+import asyncio
+
+class JobStore:
+    """
+    Keeps the future of every submitted job so that its result can be fetched later by job id.
+    Finished jobs are dropped `ttl` seconds after they complete.
+    """
+
+    def __init__(self, ttl):
+        self.ttl   = ttl
+        self._jobs = {}
+
+    def add(self, response_future, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        job = {"future": response_future, "created": time.time(), "finished": None}
+        response_future.add_done_callback(lambda _: job.update(finished=time.time()))
+        self._jobs[job_id] = job
+        return job_id
+
+    def detach(self, response_future):
+        """
+        Point the jobs of `response_future` at a new pending future and return their ids, so they stay
+        pending while their task is handed over to the next server run.
+        """
+        job_ids = [job_id for job_id, job in self._jobs.items() if job["future"] is response_future]
+        for job_id in job_ids:
+            self.add(asyncio.Future(), job_id=job_id)
+        return job_ids
+
+    def restore(self, job_id, result, finished):
+        response_future = asyncio.Future()
+        response_future.set_result(result)
+        self._jobs[job_id] = {"future": response_future, "created": finished, "finished": finished}
+
+    def finished_results(self):
+        # (job_id, result, finished) of every successfully finished job
+        return [
+            (job_id, job["future"].result(), job["finished"])
+            for job_id, job in self._jobs.items()
+            if job["future"].done() and not job["future"].cancelled() and job["future"].exception() is None
+        ]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def remove(self, job_id):
+        return self._jobs.pop(job_id, None) is not None
+
+    def expire(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished"] is not None and now - job["finished"] > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    async def wait(self, job_ids, timeout):
+        # Return as soon as any of the jobs is finished, or after `timeout` seconds
+        futures = [self._jobs[job_id]["future"] for job_id in job_ids if job_id in self._jobs]
+        if not futures or any(f.done() for f in futures) or timeout <= 0:
+            return
+        await asyncio.wait(futures, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+    def status(self, job_id, format_error):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {"job_id": job_id, "status": "unknown"}
+        response_future = job["future"]
+        if not response_future.done():
+            return {"job_id": job_id, "status": "pending"}
+        if response_future.exception() is not None:
+            return {"job_id": job_id, "status": "error", "result": format_error(response_future.exception())}
+        return {"job_id": job_id, "status": "done", "result": response_future.result()}
+
+    def __len__(self):
+        return len(self._jobs)
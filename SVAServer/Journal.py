@@ -0,0 +1,58 @@
+import os
+import json
+import time
+import sqlite3
+
+class TaskJournal:
+    """
+    On-disk journal that carries queued tasks and finished job results over a server restart.
+    Written while draining, replayed and emptied on the next startup.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path  = path
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, task_type TEXT NOT NULL, body TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, client_id TEXT NOT NULL, job_ids TEXT NOT NULL, spilled REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, result TEXT NOT NULL, finished REAL NOT NULL)"
+        )
+
+    def spill_tasks(self, tasks):
+        # tasks: [(body, task_type, priority, client_id, job_ids)], in the order they should run again
+        now = time.time()
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO tasks (task_type, body, priority, client_id, job_ids, spilled) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (task_type, json.dumps(body, ensure_ascii=False), priority, client_id, json.dumps(job_ids), now)
+                    for body, task_type, priority, client_id, job_ids in tasks
+                ],
+            )
+
+    def pending_tasks(self):
+        rows = self._conn.execute("SELECT seq, body, task_type, priority, client_id, job_ids FROM tasks ORDER BY seq").fetchall()
+        return [(seq, json.loads(body), task_type, priority, client_id, json.loads(job_ids)) for seq, body, task_type, priority, client_id, job_ids in rows]
+
+    def remove_task(self, seq):
+        self._conn.execute("DELETE FROM tasks WHERE seq = ?", (seq,))
+
+    def save_jobs(self, jobs):
+        # jobs: [(job_id, result, finished)]
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs (job_id, result, finished) VALUES (?, ?, ?)",
+                [(job_id, json.dumps(result, ensure_ascii=False), finished) for job_id, result, finished in jobs],
+            )
+
+    def pop_jobs(self):
+        rows = self._conn.execute("SELECT job_id, result, finished FROM jobs").fetchall()
+        self._conn.execute("DELETE FROM jobs")
+        return [(job_id, json.loads(result), finished) for job_id, result, finished in rows]
@@ -0,0 +1,152 @@
+import re
+
+# Static checks of generated SystemVerilog before it is handed to JasperGold. Only problems that fail the
+# elaboration for sure are reported, anything that may be valid is left to the tool:
+#   - markdown fences left over from the model output
+#   - unbalanced or mismatched brackets
+#   - binary operators without an operand
+# Names of an assertion that appear nowhere in the code it is placed in are only reported by `undeclared()`:
+# they may come from a bound module, a package or a define that the checks cannot see.
+
+# Bump when the checks change, results cached with the old checks are then ignored
+VERSION = 1
+
+TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|$))
+  | (?P<string>"(?:\\.|[^"\\\n])*"?)
+  | (?P<fence>```)
+  | (?P<macro>`[A-Za-z_]\w*)
+  | (?P<number>\d[\d_]*(?:\.\d+)?(?:\s*'[sS]?[bBoOdDhH]\s*[0-9a-fA-FxXzZ?_]+)?|'[sS]?[bBoOdDhH]\s*[0-9a-fA-FxXzZ?_]+|'[01xXzZ])
+  | (?P<name>\$?[A-Za-z_][\w$]*|\\\S+)
+  | (?P<op>&&&|\|->|\|=>|\#-\#|\#=\#|===|!==|\#\#|&&|\|\||==|!=|::|.)
+""", re.VERBOSE | re.DOTALL)
+
+BRACKETS = {"(": ")", "[": "]", "{": "}"}
+# Operators that need an operand on both sides
+BINARY_ONLY = {"|->", "|=>", "#-#", "#=#", "&&", "||", "==", "!=", "===", "!=="}
+OPENING = {"(", "[", "{", ",", ";"}
+CLOSING = {")", "]", "}", ",", ";"}
+
+# Keywords of IEEE 1800-2017, never names of signals
+KEYWORDS = set("""
+    accept_on alias always always_comb always_ff always_latch and assert assign assume automatic before begin bind
+    bins binsof bit break buf bufif0 bufif1 byte case casex casez cell chandle checker class clocking cmos config
+    const constraint context continue cover covergroup coverpoint cross deassign default defparam design disable
+    dist do edge else end endcase endchecker endclass endclocking endconfig endfunction endgenerate endgroup
+    endinterface endmodule endpackage endprimitive endprogram endproperty endspecify endsequence endtable endtask
+    enum event eventually expect export extends extern final first_match for force foreach forever fork forkjoin
+    function generate genvar global highz0 highz1 if iff ifnone ignore_bins illegal_bins implements implies import
+    incdir include initial inout input inside instance int integer interconnect interface intersect join join_any
+    join_none large let liblist library local localparam logic longint macromodule matches medium modport module
+    nand negedge nettype new nexttime nmos nor noshowcancelled not notif0 notif1 null or output package packed
+    parameter pmos posedge primitive priority program property protected pull0 pull1 pulldown pullup
+    pulsestyle_ondetect pulsestyle_onevent pure rand randc randcase randsequence rcmos real realtime ref reg
+    reject_on release repeat restrict return rnmos rpmos rtran rtranif0 rtranif1 s_always s_eventually s_nexttime
+    s_until s_until_with scalared sequence shortint shortreal showcancelled signed small soft solve specify
+    specparam static string strong strong0 strong1 struct super supply0 supply1 sync_accept_on sync_reject_on
+    table tagged task this throughout time timeprecision timeunit tran tranif0 tranif1 tri tri0 tri1 triand trior
+    trireg type typedef union unique unique0 unsigned until until_with untyped use uwire var vectored virtual void
+    wait wait_order wand weak weak0 weak1 while wildcard wire with within wor xnor xor
+""".split())
+# Keywords that declare names inside the checked text itself, its names are then not checked
+DECLARATIONS = {
+    "let", "int", "integer", "bit", "logic", "reg", "wire", "byte", "shortint", "longint", "genvar", "localparam",
+    "parameter", "function", "task", "typedef", "enum", "struct", "union", "clocking", "module", "interface",
+    "checker", "generate", "for", "foreach", "var", "real", "string",
+}
+# `property` and `sequence` after these are part of a statement, not a declaration
+DIRECTIVES = {"assert", "assume", "cover", "restrict", "expect"}
+
+def tokenize(text):
+    """
+    (kind, token, line) of every token, comments and whitespace are dropped.
+    Unknown characters become single character operators, so tokenizing never fails.
+    """
+    tokens, line = [], 1
+    for match in TOKEN.finditer(text):
+        if match.lastgroup not in ("space", "comment"):
+            tokens.append((match.lastgroup, match.group(), line))
+        line += match.group().count("\n")
+    return tokens
+
+def check_fences(tokens):
+    return [f"line {line}: leftover markdown fence" for kind, _, line in tokens if kind == "fence"]
+
+def check_brackets(tokens):
+    stack = []
+    for kind, token, line in tokens:
+        if kind != "op":
+            continue
+        if token in BRACKETS:
+            stack.append((token, line))
+        elif token in BRACKETS.values():
+            if not stack:
+                return [f"line {line}: unmatched {token!r}"]
+            opening, opening_line = stack.pop()
+            if BRACKETS[opening] != token:
+                return [f"line {line}: {token!r} closes {opening!r} of line {opening_line}"]
+    return [f"line {line}: unclosed {token!r}" for token, line in stack[:1]]
+
+def check_operands(tokens):
+    problems = []
+    ops = [token if kind == "op" else None for kind, token, _ in tokens]
+    for i, (kind, token, line) in enumerate(tokens):
+        if kind != "op" or (token not in BINARY_ONLY and token != "##"):
+            continue
+        before = ops[i - 1] if i > 0 else ";"
+        after = ops[i + 1] if i + 1 < len(ops) else ";"
+        # `##` also starts a sequence, it only needs an operand after it
+        if token != "##" and (before in OPENING or before in BINARY_ONLY):
+            problems.append(f"line {line}: {token!r} without a left operand")
+        elif after in CLOSING or after in BINARY_ONLY:
+            problems.append(f"line {line}: {token!r} without a right operand")
+    return problems
+
+def declared_names(tokens):
+    # Every name of the code an assertion is placed in, a superset of its declarations
+    return {token for kind, token, _ in tokens if kind == "name"}
+
+def check_names(tokens, known):
+    """
+    Names of an assertion that are not in `known`. Labels, members (`a.b`), package items (`p::a`),
+    macros and system functions are not checked, and neither is any text that declares names itself.
+    """
+    texts = [token for _, token, _ in tokens]
+    for i, token in enumerate(texts):
+        if token in DECLARATIONS or (token in ("property", "sequence") and (i == 0 or texts[i - 1] not in DIRECTIVES)):
+            return []
+    problems, reported = [], set()
+    for i, (kind, token, line) in enumerate(tokens):
+        if kind != "name" or token.startswith("$") or token in KEYWORDS or token in known or token in reported:
+            continue
+        before = texts[i - 1] if i > 0 else ";"
+        after = texts[i + 1] if i + 1 < len(texts) else ";"
+        if before in (".", "::") or after == "::" or (after == ":" and before in (";", ")", "begin", "end")):
+            continue
+        reported.add(token)
+        problems.append(f"line {line}: {token!r} is not declared")
+    return problems
+
+def lint(text):
+    """
+    Problems that make `text` fail for sure, [] if it may be valid.
+    """
+    if not text.strip():
+        return ["empty assertion"]
+    tokens = tokenize(text)
+    problems = check_fences(tokens)
+    if "`define" not in text:
+        # A macro body may open a bracket that its uses close
+        problems += check_brackets(tokens)
+    problems += check_operands(tokens)
+    return problems
+
+def undeclared(text, scope, names=()):
+    """
+    Names used by the assertions of `text` that appear neither in `scope`, the code they are placed in,
+    nor in `names` (e.g. the signal list). [] when `scope` imports or includes other files.
+    """
+    if re.search(r"\bimport\b|`include", scope):
+        return []
+    return check_names(tokenize(text), declared_names(tokenize(scope)) | set(names))
@@ -0,0 +1,78 @@
+import bisect
+from collections import defaultdict
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 180, 300)
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name      = name
+        self.help_text = help_text
+        self.values    = defaultdict(float)
+
+    def inc(self, amount=1, **labels):
+        self.values[tuple(sorted(labels.items()))] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{format_labels(labels)} {value}")
+        return lines
+
+class Gauge:
+    """
+    Gauge whose value is read from `callback` at scrape time, so nothing is updated on the hot path.
+    """
+
+    def __init__(self, name, help_text, callback):
+        self.name      = name
+        self.help_text = help_text
+        self.callback  = callback
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.callback()}"]
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name      = name
+        self.help_text = help_text
+        self.buckets   = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.values    = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        if key not in self.values:
+            self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        counts, _ = self.values[key]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.values[key][1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
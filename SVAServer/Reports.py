@@ -0,0 +1,177 @@
+import re
+
+# Verdict lines of each JasperGold script. Every metric function only looks at single lines, so it gives
+# the same result on the matched lines as on the whole report. A `final` match decides the verdict,
+# the rest of the run cannot change it.
+SYNTAX_VERDICT = {
+    "patterns": [r"\[ERROR \(VERI-\d+\)\]", r"ERROR: problem encountered"],
+    "final": [r"\[ERROR \(VERI-\d+\)\]", r"ERROR: problem encountered"],
+}
+VERIFY_VERDICT = {
+    # The scripts print a single `proofs:` line after the `properties:` and `times:` lines, after it only `report` runs.
+    # Only the printed statuses are final, not an echo of the `puts` command.
+    "patterns": [r"syntax error", r"\bproperties:", r"\btimes:", r"\bproofs:"],
+    "final": [r"syntax error", r"^proofs:[\w ]*$"],
+}
+EQUAL_VERDICT = {
+    # `implies` is printed for each direction of a partial equivalence and is not final
+    "patterns": [r"syntax error", r"Full equivalence", r"implies"],
+    "final": [r"syntax error", r"Full equivalence"],
+}
+EQUAL_MULTI_VERDICT = {
+    # The output of each pair is framed by markers, see `split_pairs()`
+    "patterns": [r"syntax error", r"Full equivalence", r"implies", r"^@@PAIR_(START|END) \d+$", r"^@@SHARED_ELABORATION [01]$"],
+    "final": [],
+}
+COVERAGE_VERDICT = {
+    # Nothing is final, the coverage numbers are printed last
+    "patterns": [r"syntax error", r"\bproperties:", r"\btimes:", r"\bproofs:", r"^(stimuli|coi)\|\w+\|"],
+    "final": [],
+    "sections": [
+        ("### UNDETECTABLE_START ###", "### UNDETECTABLE_END ###"),
+        ("### UNPROCESSED_START ###", "### UNPROCESSED_END ###"),
+    ],
+}
+
+TRUNCATED_MARKER = "\n... [{} bytes of report truncated] ...\n"
+# Longer lines are matched in pieces, so a tool printing without newlines cannot grow the buffer
+MAX_LINE_BYTES   = 1 << 16
+
+class ReportStream:
+    """
+    Reads the output of a tool as it is produced. Lines matching `patterns` and the lines of `sections`
+    (start marker to end marker) are kept for the metric functions, see `matched_text()`.
+    The report itself keeps at most `max_bytes`: the head and the tail, which hold the elaboration errors
+    and the summary.
+    `feed()` returns True once a `final` pattern matched and the tool can be stopped.
+    """
+
+    def __init__(self, patterns=(), final=(), max_bytes=None, sections=()):
+        self.patterns  = [re.compile(p) for p in patterns]
+        self.final     = [re.compile(p) for p in final]
+        self.sections  = dict(sections)
+        self._section  = None
+        self.max_bytes = max_bytes
+        self.matched   = []
+        self.done      = False
+        self._partial  = b""
+        self._head     = bytearray()
+        self._tail     = bytearray()
+        self._dropped  = 0
+
+    @classmethod
+    def for_verdict(cls, verdict, max_bytes=None):
+        return cls(verdict["patterns"], verdict["final"], max_bytes, verdict.get("sections", ()))
+
+    def feed(self, data: bytes):
+        self._keep(data)
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        if len(self._partial) > MAX_LINE_BYTES:
+            lines.append(self._partial)
+            self._partial = b""
+        for line in lines:
+            self._match(line.decode(errors="replace"))
+        return self.done
+
+    def close(self):
+        if self._partial:
+            self._match(self._partial.decode(errors="replace"))
+            self._partial = b""
+        return self.done
+
+    def _match(self, line):
+        marker = line.strip()
+        if self._section is not None or marker in self.sections:
+            self.matched.append(line)
+            if self._section is None:
+                self._section = self.sections[marker]
+            elif marker == self._section:
+                self._section = None
+            return
+        if any(p.search(line) for p in self.patterns):
+            self.matched.append(line)
+            if any(p.search(line) for p in self.final):
+                self.done = True
+
+    def _keep(self, data):
+        if self.max_bytes is None:
+            self._head += data
+            return
+        head_room = self.max_bytes // 2 - len(self._head)
+        if head_room > 0:
+            self._head += data[:head_room]
+            data = data[head_room:]
+        self._tail += data
+        excess = len(self._tail) - (self.max_bytes - len(self._head))
+        if excess > 0:
+            del self._tail[:excess]
+            self._dropped += excess
+
+    def matched_text(self):
+        return "\n".join(self.matched)
+
+    def report(self):
+        if not self._dropped:
+            return (self._head + self._tail).decode(errors="replace")
+        return (
+            self._head.decode(errors="replace")
+            + TRUNCATED_MARKER.format(self._dropped)
+            + self._tail.decode(errors="replace")
+        )
+
+def last_fields(text, label):
+    # Whitespace separated values of the last `<label>: ...` line, None if there is none
+    lines = re.findall(rf"\b{label}:([^\n]*)", text)
+    return lines[-1].split() if lines else None
+
+def split_tcl_list(text):
+    # Items of a TCL list, braced items may contain spaces
+    return [braced if braced else bare for braced, bare in re.findall(r"\{([^{}]*)\}|(\S+)", text)]
+
+def split_pairs(text):
+    # {pair index: matched lines of the pair} of `equality_multi_check.tcl`, only pairs that were finished
+    return {
+        int(index): body
+        for index, body in re.findall(r"^@@PAIR_START (\d+)$\n(.*?)^@@PAIR_END \1$", text, re.MULTILINE | re.DOTALL)
+    }
+
+def shared_elaboration(text):
+    # Whether `equality_multi_check.tcl` elaborated all candidates at once, None if it did not get that far
+    match = re.search(r"^@@SHARED_ELABORATION ([01])$", text, re.MULTILINE)
+    return match.group(1) == "1" if match else None
+
+def proof_seconds(item):
+    # First number of a `times:` item, e.g. `0.12` or `{time 0.12 s}`, None for `-`
+    number = re.search(r"\d+(?:\.\d+)?(?:[eE][-+]?\d+)?", item)
+    return float(number.group()) if number else None
+
+def parse_properties(text):
+    """
+    [{"name", "status", "time"}] of every assertion from the `properties:`, `proofs:` and `times:` lines of
+    a report, the time is the proof time in seconds. Names and times are None when the script did not print them.
+    """
+    statuses = last_fields(text, "proofs")
+    if statuses is None:
+        return []
+    names = last_fields(text, "properties")
+    if names is None or len(names) != len(statuses):
+        names = [None] * len(statuses)
+    times = re.findall(r"\btimes:([^\n]*)", text)
+    times = [proof_seconds(item) for item in split_tcl_list(times[-1])] if times else []
+    if len(times) != len(statuses):
+        times = [None] * len(statuses)
+    return [{"name": name, "status": status, "time": time} for name, status, time in zip(names, statuses, times)]
+
+def parse_coverage(text):
+    """
+    Coverage percentages per type and model from the `COVERAGE REPORT` table of `coverage_check.tcl`
+    (None for N/A), and the undetectable and unprocessed cover items.
+    """
+    coverage = {}
+    for cov_type, model, value in re.findall(r"^(stimuli|coi)\|(\w+)\|(\S+)$", text, re.MULTILINE):
+        coverage.setdefault(cov_type, {})[model] = float(value) if re.fullmatch(r"[0-9.]+", value) else None
+    for name in ("UNDETECTABLE", "UNPROCESSED"):
+        section = re.search(rf"### {name}_START ###\n(.*?)### {name}_END ###", text, re.DOTALL)
+        coverage[name.lower()] = split_tcl_list(section.group(1)) if section else []
+    return coverage
@@ -0,0 +1,428 @@
+import os
+import time
+import uuid
+import signal
+import asyncio
+import resource
+import selectors
+import threading
+import subprocess
+from typing import List
+
+# Set by `use_event_loop()` in asyncio execution mode, otherwise tools are started with `subprocess` in the caller
+event_loop      = None
+tool_semaphore  = None
+# Tool runs of the task executing on the current thread, see `start_recording()`
+recording       = threading.local()
+# Per-run limits, see `configure_limits()`
+memory_limit    = None
+cpu_limit       = None
+cgroup_root     = None
+PROC_SAMPLE_INTERVAL = 0.25
+REAP_POLL_INTERVAL   = 0.05
+# Files in the task's work dir: the cancel flag and one per running tool process, see `cancel_task()`
+CANCEL_FILE     = ".cancelled"
+PID_FILE_PREFIX = ".tool_pid_"
+
+class TaskCancelled(Exception):
+    """
+    The task was cancelled by the server, because its clients disconnected or its deadline passed.
+    """
+
+def use_event_loop(loop, max_subprocesses):
+    """
+    Start every tool with `asyncio.create_subprocess_exec` on `loop`, at most `max_subprocesses` at a time.
+    Task functions keep calling `run_command` from worker threads.
+    """
+    global event_loop, tool_semaphore
+    event_loop     = loop
+    tool_semaphore = asyncio.Semaphore(max_subprocesses)
+
+def configure_limits(memory_bytes=None, cpu_seconds=None, cgroup=None):
+    """
+    Limit every tool run to `memory_bytes` of memory and `cpu_seconds` of CPU time.
+    With `cgroup` (a delegated cgroup v2 directory) each run gets its own child cgroup, whose `memory.max`
+    covers the whole process tree and whose counters give exact peak memory and CPU usage.
+    Otherwise the limits are applied as rlimits on the tool process.
+    Must be called before the worker processes are forked.
+    """
+    global memory_limit, cpu_limit, cgroup_root
+    memory_limit = memory_bytes
+    cpu_limit    = cpu_seconds
+    cgroup_root  = cgroup
+    if cgroup_root is not None:
+        # Let the per-run child cgroups use the memory and cpu controllers
+        with open(os.path.join(cgroup_root, "cgroup.subtree_control"), "w") as f:
+            f.write("+memory +cpu")
+
+def apply_limits(pid, cpu=True):
+    """
+    Put the just started process `pid` under the configured limits, returns its cgroup directory if any.
+    Long-lived sessions pass `cpu=False` and get their CPU time limit per task, see `start_session_task()`.
+    """
+    if cpu and cpu_limit is not None:
+        resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_limit, cpu_limit))
+    if cgroup_root is not None:
+        cgroup = os.path.join(cgroup_root, f"run_{uuid.uuid4().hex}")
+        os.mkdir(cgroup)
+        if memory_limit is not None:
+            with open(os.path.join(cgroup, "memory.max"), "w") as f:
+                f.write(str(memory_limit))
+            with open(os.path.join(cgroup, "memory.swap.max"), "w") as f:
+                f.write("0")
+        with open(os.path.join(cgroup, "cgroup.procs"), "w") as f:
+            f.write(str(pid))
+        return cgroup
+    if memory_limit is not None:
+        resource.prlimit(pid, resource.RLIMIT_AS, (memory_limit, memory_limit))
+    return None
+
+def start_session_task(pid, peak_file=None):
+    """
+    Give the long-lived tool process `pid` the limits of its next task: `cpu_limit` seconds of CPU time on top
+    of what it used so far, and a peak memory counter that starts over. `peak_file` is the session's open
+    `memory.peak` of its cgroup, a cgroup resets the peak only for the file descriptor it is written to.
+    """
+    if cpu_limit is not None:
+        # RLIMIT_CPU counts the CPU time of the process itself, its reaped children are not included
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        used = (int(fields[11]) + int(fields[12])) // os.sysconf("SC_CLK_TCK")
+        _, hard = resource.prlimit(pid, resource.RLIMIT_CPU)
+        soft = used + cpu_limit
+        resource.prlimit(pid, resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    try:
+        if peak_file is not None:
+            peak_file.write("reset")
+            peak_file.flush()
+        else:
+            # Resets VmHWM, the peak RSS of `read_proc_usage()`
+            with open(f"/proc/{pid}/clear_refs", "w") as f:
+                f.write("5")
+    except OSError:
+        # Older kernels cannot reset the peak, the task then reports the peak of the session so far
+        pass
+
+def read_peak_file(peak_file):
+    peak_file.seek(0)
+    return int(peak_file.read())
+
+def read_cgroup_usage(cgroup):
+    usage = {"peak_rss_bytes": None, "cpu_seconds": None, "oom_killed": False, "source": "cgroup"}
+    try:
+        with open(os.path.join(cgroup, "memory.peak")) as f:
+            usage["peak_rss_bytes"] = int(f.read())
+    except (FileNotFoundError, ValueError):
+        pass
+    with open(os.path.join(cgroup, "cpu.stat")) as f:
+        for line in f:
+            key, value = line.split()
+            if key == "usage_usec":
+                usage["cpu_seconds"] = int(value) / 1e6
+    with open(os.path.join(cgroup, "memory.events")) as f:
+        for line in f:
+            key, value = line.split()
+            if key == "oom_kill":
+                usage["oom_killed"] = int(value) > 0
+    return usage
+
+def release_cgroup(cgroup):
+    usage = read_cgroup_usage(cgroup)
+    try:
+        os.rmdir(cgroup)
+    except OSError:
+        # Some process of the run is still alive, e.g. a daemon left behind by the tool
+        pass
+    return usage
+
+def read_proc_usage(pid):
+    """
+    Peak RSS and CPU time of `pid` and its reaped children from /proc. Both only grow, so the last
+    sample before the process exits is close to the final value.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            status = f.read()
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    peak_rss_bytes = None
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            peak_rss_bytes = int(line.split()[1]) * 1024
+    # Fields after the command name: utime, stime, cutime, cstime are fields 14-17
+    fields = stat.rsplit(")", 1)[1].split()
+    cpu_ticks = sum(int(x) for x in fields[11:15])
+    return {
+        "peak_rss_bytes": peak_rss_bytes,
+        "cpu_seconds": cpu_ticks / os.sysconf("SC_CLK_TCK"),
+        "oom_killed": False,
+        "source": "proc",
+    }
+
+def kill_process_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def cancel_task(work_dir):
+    """
+    Kill the tool processes of the task running in `work_dir` and refuse to start new ones.
+    Works from any process: the flag and the pid files live in the work dir.
+    """
+    with open(os.path.join(work_dir, CANCEL_FILE), "w"):
+        pass
+    for name in os.listdir(work_dir):
+        if name.startswith(PID_FILE_PREFIX):
+            kill_process_group(int(name[len(PID_FILE_PREFIX):]))
+
+def check_cancelled(work_dir):
+    if work_dir is not None and os.path.exists(os.path.join(work_dir, CANCEL_FILE)):
+        raise TaskCancelled("Task was cancelled")
+
+def track_process(work_dir, pid):
+    """
+    Make the tool process `pid` (a process group leader) killable by `cancel_task()`.
+    """
+    if work_dir is None:
+        return
+    with open(os.path.join(work_dir, f"{PID_FILE_PREFIX}{pid}"), "w"):
+        pass
+    # `cancel_task()` writes the flag before it lists the pid files, so one of both sides sees the other
+    if os.path.exists(os.path.join(work_dir, CANCEL_FILE)):
+        kill_process_group(pid)
+
+def untrack_process(work_dir, pid):
+    if work_dir is None:
+        return
+    try:
+        os.remove(os.path.join(work_dir, f"{PID_FILE_PREFIX}{pid}"))
+    except FileNotFoundError:
+        pass
+
+def current_work_dir():
+    return getattr(recording, "work_dir", None)
+
+def start_recording(work_dir=None):
+    # `work_dir` lets the server cancel the tools started by this thread, see `cancel_task()`
+    recording.runs = []
+    recording.work_dir = work_dir
+
+def stop_recording():
+    """
+    Return the tool runs since `start_recording()` as a list of
+    {tool, returncode, timed_out, stopped_early, duration, peak_rss_bytes, cpu_seconds, oom_killed}.
+    """
+    runs = getattr(recording, "runs", None) or []
+    recording.runs = None
+    recording.work_dir = None
+    return runs
+
+def record_run(command, returncode, timed_out, duration, usage, stopped=False):
+    runs = getattr(recording, "runs", None)
+    if runs is not None:
+        usage = usage or {}
+        runs.append({
+            "tool": os.path.basename(command[0]),
+            "returncode": returncode,
+            "timed_out": timed_out,
+            "stopped_early": stopped,
+            "duration": duration,
+            "peak_rss_bytes": usage.get("peak_rss_bytes"),
+            "cpu_seconds": usage.get("cpu_seconds"),
+            "oom_killed": usage.get("oom_killed", False),
+        })
+
+def summarize_runs(runs):
+    """
+    Resource usage of a whole task: the largest peak memory, the total CPU time and wall time of its tool runs.
+    """
+    peaks = [run["peak_rss_bytes"] for run in runs if run["peak_rss_bytes"] is not None]
+    cpus  = [run["cpu_seconds"] for run in runs if run["cpu_seconds"] is not None]
+    return {
+        "tool_runs": len(runs),
+        "tool_seconds": sum(run["duration"] for run in runs),
+        "peak_rss_bytes": max(peaks) if peaks else None,
+        "cpu_seconds": sum(cpus) if cpus else None,
+        "oom_killed": any(run["oom_killed"] for run in runs),
+    }
+
+def run_command(command: List[str], timeout: float, merge_stderr: bool = True, stream=None):
+    """
+    Run `command` and return (returncode, stdout, stderr), stderr is empty when `merge_stderr` is set.
+    With `stream` (a `Reports.ReportStream`) stdout is fed to it while the tool runs and the returned stdout
+    is its capped report. Once the stream has its verdict the tool is killed and returncode is None.
+    Raises `subprocess.TimeoutExpired` after `timeout` seconds, the whole process group is killed.
+    Raises `TaskCancelled` if the task was cancelled before the command started.
+    """
+    work_dir = current_work_dir()
+    check_cancelled(work_dir)
+    start = time.time()
+    returncode, timed_out, usage = None, False, None
+    try:
+        if event_loop is not None:
+            future = asyncio.run_coroutine_threadsafe(run_command_async(command, timeout, merge_stderr, work_dir, stream), event_loop)
+            returncode, stdout, stderr, usage = future.result()
+        else:
+            returncode, stdout, stderr, usage = run_command_sync(command, timeout, merge_stderr, work_dir, stream)
+        # A tool killed by `cancel_task()` has no meaningful output
+        check_cancelled(work_dir)
+        return returncode, stdout, stderr
+    except subprocess.TimeoutExpired as err:
+        timed_out = True
+        usage = getattr(err, "usage", None)
+        raise
+    finally:
+        record_run(command, returncode, timed_out, time.time() - start, usage, stopped=stream is not None and stream.done)
+
+def run_command_sync(command: List[str], timeout: float, merge_stderr: bool = True, work_dir=None, stream=None):
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        start_new_session=True,
+    )
+    cgroup = None
+    try:
+        cgroup = apply_limits(process.pid)
+        track_process(work_dir, process.pid)
+    except OSError:
+        kill_process_group(process.pid)
+        process.wait()
+        raise
+    chunks = {process.stdout: [], process.stderr: []}
+    deadline = time.time() + timeout
+    timed_out = stopped = False
+    with selectors.DefaultSelector() as selector:
+        for pipe in (process.stdout, process.stderr):
+            if pipe is not None:
+                selector.register(pipe, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                timed_out = True
+                kill_process_group(process.pid)
+                break
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fd, 65536)
+                if not data:
+                    selector.unregister(key.fileobj)
+                elif stream is not None and key.fileobj is process.stdout:
+                    stopped = stream.feed(data)
+                else:
+                    chunks[key.fileobj].append(data)
+            if stopped:
+                # The verdict is known, the rest of the report is not worth waiting for
+                kill_process_group(process.pid)
+                break
+    for pipe in (process.stdout, process.stderr):
+        if pipe is not None:
+            pipe.close()
+    # Reap the process ourselves to get its resource usage. It may have closed its pipes and still run,
+    # it gets until the deadline like the rest of the run
+    status, rusage = reap(process.pid, deadline)
+    if status is None:
+        timed_out = True
+        _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = None if stopped else os.waitstatus_to_exitcode(status)
+    untrack_process(work_dir, process.pid)
+    if cgroup is not None:
+        usage = release_cgroup(cgroup)
+    else:
+        usage = {
+            "peak_rss_bytes": rusage.ru_maxrss * 1024,
+            "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+            "oom_killed": False,
+            "source": "rusage",
+        }
+    if timed_out:
+        err = subprocess.TimeoutExpired(command, timeout)
+        err.usage = usage
+        raise err
+    if stream is not None:
+        stream.close()
+        stdout = stream.report()
+    else:
+        stdout = b"".join(chunks[process.stdout]).decode(errors="replace")
+    stderr = b"".join(chunks[process.stderr]).decode(errors="replace") if process.stderr is not None else ""
+    return process.returncode, stdout, stderr, usage
+
+def reap(pid, deadline):
+    """
+    `os.wait4()` that does not block past `deadline`: returns (status, rusage) of `pid`, or (None, None) once
+    the deadline has passed, its process group is killed then.
+    """
+    while True:
+        reaped, status, rusage = os.wait4(pid, os.WNOHANG)
+        if reaped:
+            return status, rusage
+        if time.time() >= deadline:
+            kill_process_group(pid)
+            return None, None
+        time.sleep(REAP_POLL_INTERVAL)
+
+async def sample_proc_usage(pid, usage):
+    # The child watcher reaps the process as soon as it exits, so rusage is not available in asyncio mode
+    while True:
+        sample = read_proc_usage(pid)
+        if sample is not None:
+            usage.update(sample)
+        await asyncio.sleep(PROC_SAMPLE_INTERVAL)
+
+async def read_stream(process, stream):
+    # Feed stdout to `stream` until the tool exits or the stream has its verdict, returns like `communicate()`
+    stderr = asyncio.ensure_future(process.stderr.read()) if process.stderr is not None else None
+    while True:
+        data = await process.stdout.read(65536)
+        if not data:
+            break
+        if stream.feed(data):
+            kill_process_group(process.pid)
+            break
+    await process.wait()
+    return b"", await stderr if stderr is not None else b""
+
+async def run_command_async(command: List[str], timeout: float, merge_stderr: bool = True, work_dir=None, stream=None):
+    async with tool_semaphore:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT if merge_stderr else asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        try:
+            cgroup = apply_limits(process.pid)
+            track_process(work_dir, process.pid)
+        except OSError:
+            kill_process_group(process.pid)
+            await process.wait()
+            raise
+        usage = {}
+        sampler = asyncio.create_task(sample_proc_usage(process.pid, usage)) if cgroup is None else None
+        try:
+            if stream is not None:
+                stdout, stderr = await asyncio.wait_for(read_stream(process, stream), timeout)
+            else:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            kill_process_group(process.pid)
+            await process.wait()
+            err = subprocess.TimeoutExpired(command, timeout)
+            err.usage = release_cgroup(cgroup) if cgroup is not None else usage
+            raise err
+        finally:
+            if sampler is not None:
+                sampler.cancel()
+            untrack_process(work_dir, process.pid)
+        if cgroup is not None:
+            usage = release_cgroup(cgroup)
+    if stream is not None:
+        stream.close()
+    return (
+        None if stream is not None and stream.done else process.returncode,
+        stream.report() if stream is not None else stdout.decode(errors="replace"),
+        stderr.decode(errors="replace") if stderr else "",
+        usage,
+    )
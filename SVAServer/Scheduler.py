@@ -0,0 +1,119 @@
+import heapq
+import asyncio
+import itertools
+from collections import defaultdict
+
+DEFAULT_CLIENT = "anonymous"
+
+class FairScheduler:
+    """
+    Drop-in replacement of `asyncio.Queue` for the task queue.
+    Items with a higher priority are always served first. Within one priority, clients share the
+    workers by weighted fair queuing: every item gets a virtual finish tag
+    `max(virtual_time, last_tag[client]) + 1 / weight`, and the smallest tag is served next,
+    so a client flooding the queue only delays its own items.
+    """
+
+    def __init__(self, maxsize, client_weights=None):
+        self.maxsize         = maxsize
+        self.client_weights  = client_weights or {}
+        self._heap           = []
+        self._seq            = itertools.count()
+        self._virtual_time   = defaultdict(float)
+        self._last_tag       = {}
+        self._queued         = defaultdict(lambda: defaultdict(int))
+        self._lock           = asyncio.Lock()
+        self._not_empty      = asyncio.Condition(self._lock)
+        self._not_full       = asyncio.Condition(self._lock)
+
+    def qsize(self):
+        return len(self._heap)
+
+    def full(self):
+        return self.maxsize > 0 and len(self._heap) >= self.maxsize
+
+    def empty(self):
+        return not self._heap
+
+    def weight(self, client_id):
+        return float(self.client_weights.get(client_id, 1.0))
+
+    async def put(self, item, priority=0, client_id=DEFAULT_CLIENT):
+        async with self._not_full:
+            await self._not_full.wait_for(lambda: not self.full())
+            start = max(self._virtual_time[priority], self._last_tag.get((priority, client_id), 0.0))
+            tag = start + 1.0 / self.weight(client_id)
+            self._last_tag[(priority, client_id)] = tag
+            # heapq pops the smallest entry: negate priority so that higher priorities come first
+            heapq.heappush(self._heap, (-priority, tag, next(self._seq), client_id, item))
+            self._queued[client_id][priority] += 1
+            self._not_empty.notify()
+
+    async def get(self):
+        async with self._not_empty:
+            await self._not_empty.wait_for(lambda: self._heap)
+            neg_priority, tag, _, client_id, item = heapq.heappop(self._heap)
+            self._virtual_time[-neg_priority] = tag
+            self._queued[client_id][-neg_priority] -= 1
+            if not self._queued[client_id][-neg_priority]:
+                # Nothing left from this client: its last tag is behind the virtual time and can be forgotten
+                del self._queued[client_id][-neg_priority]
+                del self._last_tag[(-neg_priority, client_id)]
+                if not self._queued[client_id]:
+                    del self._queued[client_id]
+            self._not_full.notify()
+            return item
+
+    async def drain(self):
+        """
+        Remove every queued item, returns [(priority, client_id, item)] in the order they would have been served.
+        """
+        async with self._not_full:
+            entries = [heapq.heappop(self._heap) for _ in range(len(self._heap))]
+            self._last_tag.clear()
+            self._queued.clear()
+            self._not_full.notify_all()
+        return [(-neg_priority, client_id, item) for neg_priority, _, _, client_id, item in entries]
+
+    def snapshot(self):
+        return {
+            "size": len(self._heap),
+            "maxsize": self.maxsize,
+            "clients": {
+                client_id: {
+                    "weight": self.weight(client_id),
+                    "queued": sum(by_priority.values()),
+                    "by_priority": dict(by_priority),
+                }
+                for client_id, by_priority in self._queued.items()
+            },
+        }
+
+class DrainEstimator:
+    """
+    Estimates how long the queued tasks need to drain from an exponentially weighted moving average
+    of the recent service time of each endpoint.
+    """
+
+    def __init__(self, num_workers, alpha=0.1, default_service_time=10.0):
+        self.num_workers          = num_workers
+        self.alpha                = alpha
+        self.default_service_time = default_service_time
+        self.service_time         = {}
+        self.queued               = defaultdict(int)
+
+    def enqueued(self, route):
+        self.queued[route] += 1
+
+    def dequeued(self, route):
+        self.queued[route] -= 1
+
+    def observe(self, route, seconds):
+        if route not in self.service_time:
+            self.service_time[route] = seconds
+        else:
+            self.service_time[route] += self.alpha * (seconds - self.service_time[route])
+
+    def drain_time(self):
+        work = sum(count * self.service_time.get(route, self.default_service_time) for route, count in self.queued.items())
+        return work / max(self.num_workers, 1)
@@ -1,28 +1,44 @@
 import uvicorn
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, aclosing
 import concurrent.futures
-import resource
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from Executor import syntax_check, coverage_check, equality_check, equality_check_opt, correctness_verify, testbench_generate, yosys_parse, correctness_verify_impl_only, majority_vote
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from Executor import syntax_check, coverage_check, equality_check, equality_check_opt, correctness_verify, testbench_generate, yosys_parse, correctness_verify_impl_only, majority_vote, signal_list_task, equal_task, equality_check_multi, equal_multi_pairs
 import asyncio
 import argparse
 import yaml
 import os
-import uuid
 import traceback
-from datetime import datetime
-import shutil
+import json
+import math
+import time
+import signal
 import Utils
+import Cache
+import Runner
+import Scheduler
+import Jobs
+import Metrics
+import WorkDirs
+import Sessions
+import Journal
+import Vote
+import Designs
+import Lint
+from Tasks import TASK_TYPES
 
-def process_request(task):
-    # resource.setrlimit(
-    #     resource.RLIMIT_AS,
-    #     (MEMORY_LIMIT, MEMORY_LIMIT)
-    # )
+# Run by the server itself on top of other tasks instead of in a worker, see `run_majority_vote()`
+ORCHESTRATED_TASK_TYPES = ("/mvote",)
+
+class DrainingError(Exception):
+    """
+    The server is draining for a restart, the task is kept in the journal and runs again after the restart.
+    """
+
+def process_request(task, work_dir):
+    # Memory and CPU limits are applied to each tool run by Runner, see `Runner.configure_limits()`
     task_data, task_type = task
-    work_dir = os.path.join(os.getcwd(), 'logs', f"task_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}")
-    os.makedirs(work_dir, exist_ok=True)
+    Runner.start_recording(work_dir)
     result = None
     if task_type == "/syntax":
         result = syntax_check(task_data, work_dir)
@@ -36,74 +52,671 @@ def process_request(task):
         result = equality_check(task_data, work_dir)
     elif task_type == "/equal_opt":
         result = equality_check_opt(task_data, work_dir)
+    elif task_type == "/equal_multi":
+        result = equality_check_multi(task_data, work_dir)
     elif task_type == "/testbench":
         result = testbench_generate(task_data, work_dir) 
     elif task_type == "/svparse":
         result = yosys_parse(task_data, work_dir) 
     elif task_type == "/mvote":
-        result = majority_vote(task_data, work_dir) 
-    shutil.rmtree(work_dir, ignore_errors=True)
-    return result
+        result = majority_vote(task_data, work_dir)
+    elif task_type == "/signal_list":
+        # Internal, shared by the comparisons of a vote
+        result = signal_list_task(task_data, work_dir)
+    tool_runs = Runner.stop_recording()
+    if isinstance(result, dict) and tool_runs:
+        result["resources"] = Runner.summarize_runs(tool_runs)
+    return result, tool_runs
 
 async def worker():
+    global active_workers
     while True:
-        task, response_future = await task_queue.get()
+        entry = await task_queue.get()
+        task_type = entry["task"][1]
+        drain_estimator.dequeued(task_type)
+        if entry["cancelled"]:
+            # Nobody waits for it any more, see `release_task()`
+            continue
+        if draining:
+            # Put into the queue after the drain started
+            spill_entries([entry])
+            continue
+        started = time.time()
+        QUEUE_SECONDS.observe(started - entry["enqueued"], route=task_type)
 
+        active_workers += 1
+        work_dir = work_dir_pool.acquire()
+        entry["work_dir"] = work_dir
         try:
             loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(executor, process_request, task)
-            response_future.set_result(result)
+            result, tool_runs = await loop.run_in_executor(executor, process_request, entry["task"], work_dir)
+            record_task_metrics(task_type, result, tool_runs)
+            result = store_report(result)
+            # Only successful runs are cached, timeouts, tool errors and cancelled runs are retried next time
+            if entry["cache_key"] is not None and not entry["cancelled"] and isinstance(result, dict) and result.get("ok"):
+                result_cache.put(entry["cache_key"], result)
+            if not entry["future"].done():
+                entry["future"].set_result(result)
         except Exception as e:
-            response_future.set_exception(e)
+            if not entry["cancelled"]:
+                TASK_ERRORS.inc(route=task_type)
+            if not entry["future"].done():
+                entry["future"].set_exception(e)
         finally:
-            task_queue.task_done()
+            entry["work_dir"] = None
+            work_dir_pool.release(work_dir)
+            active_workers -= 1
+            EXECUTION_SECONDS.observe(time.time() - started, route=task_type)
+            drain_estimator.observe(task_type, time.time() - started)
+
+def store_report(result):
+    """
+    Move the raw tool report of `result` to the report store, the result keeps its `report_id`.
+    Clients get the report back with `X-Include-Report` or from `GET /reports/{report_id}`.
+    """
+    if report_store is None or not isinstance(result, dict) or not isinstance(result.get("report"), str):
+        return result
+    report = result.pop("report")
+    report_id = Cache.make_key("report", report)
+    report_store.put(report_id, report)
+    return result | {"report_id": report_id, "report_bytes": len(report.encode())}
+
+def attach_report(result, include_report):
+    if not include_report or report_store is None or not isinstance(result, dict) or "report_id" not in result:
+        return result
+    return result | {"report": report_store.get(result["report_id"])}
+
+def get_include_report(request: Request, item=None):
+    # The item's "include_report" field, else the X-Include-Report header
+    if item is not None and "include_report" in item:
+        return bool(item["include_report"])
+    return request.headers.get("X-Include-Report", "").lower() in ("1", "true", "yes")
+
+def record_task_metrics(task_type, result, tool_runs):
+    for run in tool_runs:
+        TOOL_RUNS.inc(tool=run["tool"], returncode=run["returncode"])
+        TOOL_SECONDS.observe(run["duration"], tool=run["tool"])
+        if run["peak_rss_bytes"] is not None:
+            TOOL_PEAK_RSS.observe(run["peak_rss_bytes"], tool=run["tool"])
+        if run["cpu_seconds"] is not None:
+            TOOL_CPU_SECONDS.inc(run["cpu_seconds"], tool=run["tool"])
+        if run["oom_killed"]:
+            TOOL_OOM_KILLS.inc(tool=run["tool"])
+        if run["timed_out"]:
+            TOOL_TIMEOUTS.inc(tool=run["tool"])
+        if run["stopped_early"]:
+            TOOL_EARLY_STOPS.inc(tool=run["tool"])
+    if isinstance(result, dict) and isinstance(result.get("report"), str):
+        # The report as the task returns it, at most report_max_bytes of the tool output
+        REPORT_BYTES.observe(len(result["report"].encode()), route=task_type)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if EXECUTION_MODE == "asyncio":
+        Runner.use_event_loop(asyncio.get_running_loop(), MAX_SUBPROCESSES)
     for _ in range(MAX_CONCURRENT_TASKS):
         asyncio.create_task(worker())
+    asyncio.create_task(expire_jobs())
+    asyncio.create_task(replay_journal())
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, lambda: asyncio.create_task(drain()))
     yield
+    # Also reached on a plain SIGTERM/SIGINT: keep what is still queued and the results of finished jobs
+    await drain(exit_after=False)
+    journal.save_jobs(job_store.finished_results())
     executor.shutdown(wait=True)
+    # Sessions of process workers exit when their stdin is closed with the worker
+    Sessions.close()
+    work_dir_pool.close()
 
 app = FastAPI(lifespan=lifespan)
 
+def queue_full_response():
+    # 429 with the estimated time until the queue has drained, so clients spread their retries
+    REJECTED.inc()
+    retry_after = max(1, round(drain_estimator.drain_time() * (1 - RETRY_AFTER_HEADROOM)))
+    return JSONResponse(
+        content={"error": "Task queue is full, please try again later", "retry_after": retry_after},
+        status_code=429,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+def draining_response():
+    return JSONResponse(
+        content={"error": "Server is restarting, please try again later", "retry_after": DRAIN_RETRY_AFTER},
+        status_code=503,
+        headers={"Retry-After": str(DRAIN_RETRY_AFTER)},
+    )
+
+def get_schedule_info(request: Request, task_type, priority=None):
+    # Priority: explicit value > X-Priority header > per-endpoint default, larger runs first
+    if priority is None:
+        priority = request.headers.get("X-Priority")
+    if priority is None:
+        priority = ENDPOINT_PRIORITY.get(task_type, 0)
+    client_id = request.headers.get("X-Client-Id") or (request.client.host if request.client else Scheduler.DEFAULT_CLIENT)
+    try:
+        return int(priority), client_id
+    except (TypeError, ValueError):
+        raise ValueError(f"Priority must be an integer, got {priority!r}")
+
+async def submit_task(body, task_type, priority=0, client_id=Scheduler.DEFAULT_CLIENT, idempotency_key=None):
+    if idempotency_key is not None:
+        job = job_store.get(idempotency_job_id(idempotency_key))
+        # A cancelled task is started again: its first client gave up, this retry still wants the result
+        if job is not None and not is_cancelled(job["future"]):
+            # Retry of a request that was already submitted: attach to the original task
+            IDEMPOTENT_REPLAYS.inc(route=task_type)
+            return job["future"]
+    response_future = await submit_task_once(body, task_type, priority, client_id)
+    if idempotency_key is not None:
+        job_store.add(response_future, job_id=idempotency_job_id(idempotency_key))
+    return response_future
+
+async def submit_task_once(body, task_type, priority, client_id):
+    task_key = Cache.make_key(task_type, body, [TCL_VERSION, LINT_VERSION])
+    if result_cache is not None:
+        result = result_cache.get(task_key)
+        if result is not None:
+            # Cache hit: answer without queueing or launching any tool
+            CACHE_HITS.inc(route=task_type)
+            response_future = asyncio.Future()
+            response_future.set_result(result)
+            return response_future
+    if task_key in inflight_tasks:
+        # The same task is already queued or running, share its result
+        COALESCED.inc(route=task_type)
+        return inflight_tasks[task_key]
+    response_future = asyncio.Future()
+    entry = {
+        "task": (body, task_type),
+        "future": response_future,
+        "cache_key": task_key if result_cache is not None else None,
+        "enqueued": time.time(),
+        "priority": priority,
+        "client_id": client_id,
+        # Number of waiters, set while running and whether it was cancelled, see `release_task()`
+        "holders": 0,
+        "work_dir": None,
+        "cancelled": False,
+    }
+    inflight_tasks[task_key] = response_future
+    task_entries[response_future] = entry
+    response_future.add_done_callback(lambda _: forget_task(task_key, response_future))
+    if task_type in ORCHESTRATED_TASK_TYPES and MVOTE_PARALLELISM > 0:
+        asyncio.create_task(run_majority_vote(entry))
+        return response_future
+    drain_estimator.enqueued(task_type)
+    try:
+        await task_queue.put(entry, priority, client_id)
+    except BaseException:
+        forget_task(task_key, response_future)
+        drain_estimator.dequeued(task_type)
+        raise
+    return response_future
+
+async def run_majority_vote(entry):
+    """
+    /mvote without occupying a worker: the equality checks between class representatives are queued as
+    /equal tasks, up to `mvote_parallelism` at a time, so they run on all workers and hit the result cache.
+    Remaining checks are cancelled once a class holds a strict majority.
+    """
+    body, task_type = entry["task"]
+    response_future = entry["future"]
+    vote = Vote.MajorityVote(body["asrts"])
+    running = {}
+    reason = "majority found"
+    try:
+        if body.get("signal_list") is None and len(vote.nodes) > 1:
+            body = body | {"signal_list": await run_subtask(entry, {"tb": body["tb"]}, "/signal_list", "signal_list")}
+        while not response_future.done() and not vote.finished():
+            for a, b in vote.next_pairs(MVOTE_PARALLELISM - len(running)):
+                subtask = await submit_task_once(equal_task(body, vote.nodes[a], vote.nodes[b]), "/equal", entry["priority"], entry["client_id"])
+                hold_task(subtask)
+                running[subtask] = (a, b)
+            # The vote itself may be cancelled while its checks run, see `release_task()`
+            done, _ = await asyncio.wait([response_future, *running], return_when=asyncio.FIRST_COMPLETED)
+            for subtask in done:
+                if subtask in running:
+                    a, b = running.pop(subtask)
+                    result = subtask.result()
+                    vote.record(a, b, result["ok"] and result["functionality"])
+        if not response_future.done():
+            result = vote.result()
+            if entry["cache_key"] is not None:
+                result_cache.put(entry["cache_key"], result)
+            response_future.set_result(result)
+    except DrainingError:
+        # Its checks were journaled, journal the vote instead so that it starts over after the restart
+        reason = "server draining"
+        spill_entries([entry])
+    except Exception as e:
+        reason = "vote failed"
+        if not entry["cancelled"]:
+            TASK_ERRORS.inc(route=task_type)
+        if not response_future.done():
+            response_future.set_exception(e)
+    finally:
+        if entry["cancelled"]:
+            reason = "vote cancelled"
+        for subtask in running:
+            release_task(subtask, reason)
+
+async def run_subtask(entry, body, task_type, field):
+    subtask = await submit_task_once(body, task_type, entry["priority"], entry["client_id"])
+    hold_task(subtask)
+    try:
+        await asyncio.wait([entry["future"], subtask], return_when=asyncio.FIRST_COMPLETED)
+        if not subtask.done():
+            raise Runner.TaskCancelled("Task was cancelled")
+        return subtask.result()[field]
+    finally:
+        release_task(subtask, "vote cancelled")
+
+def forget_task(task_key, response_future):
+    # A cancelled task may already have been replaced by a new one with the same key
+    if inflight_tasks.get(task_key) is response_future:
+        del inflight_tasks[task_key]
+    task_entries.pop(response_future, None)
+
+def is_cancelled(response_future):
+    return response_future.done() and isinstance(response_future.exception(), Runner.TaskCancelled)
+
+def hold_task(response_future):
+    entry = task_entries.get(response_future)
+    if entry is not None:
+        entry["holders"] += 1
+
+def release_task(response_future, reason):
+    """
+    Drop one waiter of a task. Once nobody waits for it, the task is cancelled: a queued one is skipped and
+    the tools of a running one are killed, so its worker is free again right away.
+    """
+    entry = task_entries.get(response_future)
+    if entry is None or response_future.done():
+        return
+    entry["holders"] -= 1
+    if entry["holders"] > 0:
+        return
+    entry["cancelled"] = True
+    TASKS_CANCELLED.inc(route=entry["task"][1], state="running" if entry["work_dir"] is not None else "queued", reason=reason)
+    if entry["work_dir"] is not None:
+        Runner.cancel_task(entry["work_dir"])
+    response_future.set_exception(Runner.TaskCancelled(f"Task was cancelled: {reason}"))
+
+def get_deadline(request: Request, item=None):
+    # Seconds the client is willing to wait, from the item's "deadline" field or the X-Deadline header
+    seconds = item.get("deadline") if item is not None else None
+    if seconds is None:
+        seconds = request.headers.get("X-Deadline")
+    if seconds is None:
+        return None
+    try:
+        value = float(seconds)
+    except (TypeError, ValueError):
+        value = math.nan
+    if not math.isfinite(value):
+        raise ValueError(f"Deadline must be a number of seconds, got {seconds!r}")
+    return time.time() + value
+
+async def iter_tasks(request: Request, response_futures, deadlines):
+    """
+    Yield (index, expired) for each task once it is done or past its deadline, stop early if the client
+    disconnects. This request stops waiting for the unfinished tasks, which are cancelled if no other
+    request or job waits for them.
+    """
+    for response_future in response_futures:
+        hold_task(response_future)
+    waiting = set(range(len(response_futures)))
+    try:
+        while waiting:
+            now = time.time()
+            for i in sorted(waiting):
+                if response_futures[i].done():
+                    waiting.discard(i)
+                    yield i, False
+                elif deadlines[i] is not None and deadlines[i] <= now:
+                    waiting.discard(i)
+                    release_task(response_futures[i], "deadline exceeded")
+                    yield i, True
+            if not waiting:
+                return
+            timeout = min([DISCONNECT_POLL_INTERVAL] + [deadlines[i] - now for i in waiting if deadlines[i] is not None])
+            await asyncio.wait([response_futures[i] for i in waiting], timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+            if await request.is_disconnected():
+                return
+    finally:
+        for i in waiting:
+            release_task(response_futures[i], "client disconnected")
+
+async def wait_tasks(request: Request, response_futures, deadlines):
+    # Returns (disconnected, indices of the tasks past their deadline)
+    finished, expired = 0, set()
+    async with aclosing(iter_tasks(request, response_futures, deadlines)) as results:
+        async for index, is_expired in results:
+            finished += 1
+            if is_expired:
+                expired.add(index)
+    return finished < len(response_futures), expired
+
+def disconnected_response():
+    # Nobody reads it, 499 is what proxies log for requests closed by the client
+    return JSONResponse(content={"error": "Client disconnected"}, status_code=499)
+
+def hold_job(job_id, response_future, deadline):
+    # A job keeps its task alive until the job is deleted or its deadline passes
+    if response_future.done() or job_id in job_holds:
+        return
+    hold_task(response_future)
+    job_holds[job_id] = response_future
+    response_future.add_done_callback(lambda _: job_holds.pop(job_id, None) if job_holds.get(job_id) is response_future else None)
+    if deadline is not None:
+        asyncio.get_running_loop().call_later(max(0, deadline - time.time()), release_job, job_id, "deadline exceeded")
+
+def release_job(job_id, reason):
+    response_future = job_holds.pop(job_id, None)
+    if response_future is not None:
+        release_task(response_future, reason)
+
+def collect_result(response_future, expired, include_report=False):
+    # Failed items carry "retryable": the client sends them again (spilled by a drain) or gives up on them
+    if expired:
+        return {"error": "Deadline exceeded before the task finished", "retryable": False}
+    if isinstance(response_future.exception(), DrainingError):
+        return {"error": str(response_future.exception()), "retryable": True, "retry_after": DRAIN_RETRY_AFTER}
+    if response_future.exception() is not None:
+        return format_task_error(response_future.exception()) | {"retryable": False}
+    return attach_report(response_future.result(), include_report)
+
+def spilled(response_future, expired):
+    return not expired and response_future.done() and isinstance(response_future.exception(), DrainingError)
+
+def idempotency_job_id(idempotency_key):
+    return f"idem-{idempotency_key}"
+
+def get_idempotency_key(request: Request, item=None, index=None):
+    # Per item key in a batch, else the Idempotency-Key header (suffixed with the item index for batches)
+    if item is not None and item.get("idempotency_key"):
+        return str(item["idempotency_key"])
+    key = request.headers.get("Idempotency-Key")
+    if key and index is not None:
+        return f"{key}:{index}"
+    return key or None
+
+def spill_entries(entries):
+    """
+    Write queued entries to the journal and fail their waiters with `DrainingError`.
+    Their jobs stay pending and are picked up again by `replay_journal()` after the restart.
+    """
+    entries = [entry for entry in entries if not entry["cancelled"]]
+    if not entries:
+        return
+    journal.spill_tasks([
+        (*entry["task"], entry["priority"], entry["client_id"], job_store.detach(entry["future"]))
+        for entry in entries
+    ])
+    for entry in entries:
+        SPILLED.inc(route=entry["task"][1])
+        if not entry["future"].done():
+            entry["future"].set_exception(DrainingError("Server is restarting, the task will run after the restart"))
+
+async def begin_drain():
+    global draining
+    draining = True
+    entries = [entry for _, _, entry in await task_queue.drain()]
+    for entry in entries:
+        drain_estimator.dequeued(entry["task"][1])
+    spill_entries(entries)
+    return len(entries)
+
+async def drain(exit_after=None):
+    """
+    Stop accepting tasks, spill the queued ones to the journal and wait up to `drain_timeout` seconds for the
+    running ones. Then exit through uvicorn's graceful shutdown unless `exit_after` is False.
+    """
+    if exit_after is None:
+        exit_after = DRAIN_EXIT
+    await begin_drain()
+    deadline = time.time() + DRAIN_TIMEOUT
+    while active_workers > 0 and time.time() < deadline:
+        await asyncio.sleep(0.1)
+    if exit_after:
+        os.kill(os.getpid(), signal.SIGTERM)
+
+async def replay_journal():
+    # Finished job results and queued tasks handed over by the previous run, see `drain()`
+    for job_id, result, finished in journal.pop_jobs():
+        job_store.restore(job_id, result, finished)
+    for seq, body, task_type, priority, client_id, job_ids in journal.pending_tasks():
+        response_future = await submit_task_once(body, task_type, priority, client_id)
+        for job_id in job_ids:
+            job_store.add(response_future, job_id=job_id)
+        journal.remove_task(seq)
+        REPLAYED.inc(route=task_type)
+
+@app.post("/admin/drain")
+async def handle_drain():
+    # Returns once the queue is spilled, running tasks are finished in the background
+    if draining:
+        return {"draining": True, "spilled": 0, "running": active_workers}
+    spilled = await begin_drain()
+    asyncio.create_task(drain())
+    return {"draining": True, "spilled": spilled, "running": active_workers}
+
+@app.get("/reports/{report_id}")
+async def handle_get_report(report_id: str):
+    report = report_store.get(report_id) if report_store is not None else None
+    if report is None:
+        return JSONResponse(content={"error": f"Unknown or evicted report: {report_id}"}, status_code=404)
+    return PlainTextResponse(report)
+
+@app.get("/metrics")
+async def handle_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/status")
+async def handle_status():
+    # Load summary polled by the coordinator, see Coordinator.py
+    return {
+        "queued": task_queue.qsize(),
+        "queue_max_size": QUEUE_MAX_SIZE,
+        "active_workers": active_workers,
+        "max_workers": MAX_CONCURRENT_TASKS,
+        "drain_seconds": drain_estimator.drain_time(),
+        "draining": draining,
+    }
+
+@app.get("/queue")
+async def handle_queue_state():
+    return task_queue.snapshot()
+
+@app.get("/cache")
+async def handle_cache_stats():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True} | result_cache.stats()
+
 @app.post("/syntax")
 @app.post("/cov")
 @app.post("/verify")
 @app.post("/equal")
 @app.post("/equal_opt")
+@app.post("/equal_multi")
 @app.post("/testbench")
 @app.post("/verify_impl_only")
 @app.post("/svparse")
 @app.post("/mvote")
 async def handle_request(request: Request):
+    if draining:
+        return draining_response()
     if task_queue.full():
-        return JSONResponse(content={"error": "Task queue is full, please try again later"}, status_code=503)
+        return queue_full_response()
 
     body = await request.json()
     task_type = request.url.path
+    try:
+        check_payload(task_type, body)
+        schedule_info, deadline = get_schedule_info(request, task_type), get_deadline(request)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
 
-    response_future = asyncio.Future()
-    await task_queue.put(((body, task_type), response_future))
+    response_future = await submit_task(body, task_type, *schedule_info, get_idempotency_key(request))
 
+    # The future may be shared with coalesced requests, waiting never cancels it directly, see `release_task()`
+    disconnected, expired = await wait_tasks(request, [response_future], [deadline])
+    if disconnected:
+        return disconnected_response()
+    if expired:
+        return JSONResponse(content={"error": "Deadline exceeded before the task finished"}, status_code=504)
     try:
-        results = await response_future
-        return results
-        # else:
-        #     futures = []
-        #     for code in code_list:
-        #         response_future = asyncio.Future()
-        #         await task_queue.put((code, response_future))
-        #         futures.append(response_future)
-        #     results = []
-        #     for future in futures:
-        #         result = await future 
-        #         results.append(result)
-        #     return results
+        return attach_report(response_future.result(), get_include_report(request))
+    except DrainingError:
+        return draining_response()
     except Exception as e:
         tb = traceback.format_exc()
         return JSONResponse(content={"error": str(e), "traceback": tb}, status_code=500)
 
+def format_task_error(err):
+    return {"error": str(err), "traceback": "".join(traceback.format_exception(err))}
+
+async def parse_batch(request: Request):
+    # Body: [{"endpoint": "/equal", "payload": {...}, "priority": 0, "idempotency_key": "...", "deadline": 60,
+    # "include_report": false}, ...], priority, idempotency_key, deadline (seconds) and include_report are optional
+    items = await request.json()
+    if not isinstance(items, list):
+        raise ValueError("Batch body must be a list of {endpoint, payload} items")
+    return parse_task_items(request, items)
+
+def check_payload(task_type, body):
+    # Payloads the task would fail on are answered with 400 before they are queued
+    if task_type == "/equal_multi":
+        equal_multi_pairs(body)
+
+def parse_task_items(request: Request, items):
+    # Returns the arguments of `submit_task()`, the deadline and whether to inline the report of each item
+    tasks, deadlines, include_reports = [], [], []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or "payload" not in item:
+            raise ValueError(f"Batch item {i} must be a {{endpoint, payload}} object")
+        task_type = "/" + item.get("endpoint", "").lstrip("/")
+        if task_type not in TASK_TYPES:
+            raise ValueError(f"Unknown endpoint in batch item {i}: {item.get('endpoint')}")
+        try:
+            check_payload(task_type, item["payload"])
+        except ValueError as e:
+            raise ValueError(f"Batch item {i}: {e}")
+        tasks.append((
+            item["payload"],
+            task_type,
+            *get_schedule_info(request, task_type, item.get("priority")),
+            get_idempotency_key(request, item, i if len(items) > 1 else None),
+        ))
+        deadlines.append(get_deadline(request, item))
+        include_reports.append(get_include_report(request, item))
+    return tasks, deadlines, include_reports
+
+@app.post("/batch")
+async def handle_batch(request: Request):
+    # Results are returned in the same order as the batch items
+    if draining:
+        return draining_response()
+    if task_queue.full():
+        return queue_full_response()
+    try:
+        tasks, deadlines, include_reports = await parse_batch(request)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    response_futures = [await submit_task(*task) for task in tasks]
+    disconnected, expired = await wait_tasks(request, response_futures, deadlines)
+    if disconnected:
+        return disconnected_response()
+    # Items spilled by a drain run after the restart, the whole batch is retried then. The others are
+    # answered from the result cache or attached to through their idempotency keys.
+    if any(spilled(response_future, i in expired) for i, response_future in enumerate(response_futures)):
+        return draining_response()
+    return [collect_result(response_future, i in expired, include_reports[i]) for i, response_future in enumerate(response_futures)]
+
+@app.post("/batch/stream")
+async def handle_batch_stream(request: Request):
+    # Same body as /batch, but each result is sent as one NDJSON line {"index": i, "result": {...}} once it is done.
+    # Items spilled by a drain are sent as {"error", "retryable": true} since the status is already sent.
+    if draining:
+        return draining_response()
+    if task_queue.full():
+        return queue_full_response()
+    try:
+        tasks, deadlines, include_reports = await parse_batch(request)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    response_futures = [await submit_task(*task) for task in tasks]
+
+    async def stream_results():
+        async with aclosing(iter_tasks(request, response_futures, deadlines)) as results:
+            async for index, expired in results:
+                result = collect_result(response_futures[index], expired, include_reports[index])
+                yield json.dumps({"index": index, "result": result}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/jobs")
+async def handle_submit_jobs(request: Request):
+    # Body: one {endpoint, payload} item or a list of them, returns the job ids without waiting for the results
+    if draining:
+        return draining_response()
+    if task_queue.full():
+        return queue_full_response()
+    body = await request.json()
+    try:
+        # Reports of jobs are inlined when they are fetched, see `handle_get_job()`
+        tasks, deadlines, _ = parse_task_items(request, [body] if isinstance(body, dict) else body)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    job_ids = []
+    for task, deadline in zip(tasks, deadlines):
+        response_future = await submit_task(*task)
+        idempotency_key = task[-1]
+        # With an idempotency key the job id is derived from it, so a retried submission returns the same id
+        job_id = idempotency_job_id(idempotency_key) if idempotency_key is not None else job_store.add(response_future)
+        hold_job(job_id, response_future, deadline)
+        job_ids.append(job_id)
+    if isinstance(body, dict):
+        return {"job_id": job_ids[0]}
+    return {"job_ids": job_ids}
+
+@app.post("/jobs/poll")
+async def handle_poll_jobs(request: Request):
+    # Body: {"job_ids": [...], "wait": seconds, "include_report": false},
+    # waits until any job is finished or `wait` seconds passed
+    body = await request.json()
+    job_ids = body.get("job_ids", [])
+    await job_store.wait(job_ids, min(float(body.get("wait", 0)), JOB_MAX_WAIT))
+    return {"jobs": [job_status(job_id, get_include_report(request, body)) for job_id in job_ids]}
+
+def job_status(job_id, include_report):
+    status = job_store.status(job_id, format_task_error)
+    if status["status"] == "done":
+        status["result"] = attach_report(status["result"], include_report)
+    return status
+
+@app.get("/jobs/{job_id}")
+async def handle_get_job(request: Request, job_id: str, wait: float = 0, include_report: bool = False):
+    if job_store.get(job_id) is None:
+        return JSONResponse(content={"error": f"Unknown or expired job: {job_id}"}, status_code=404)
+    await job_store.wait([job_id], min(wait, JOB_MAX_WAIT))
+    return job_status(job_id, include_report or get_include_report(request))
+
+@app.delete("/jobs/{job_id}")
+async def handle_delete_job(job_id: str):
+    # Its task is cancelled too unless someone else waits for it
+    release_job(job_id, "job deleted")
+    return {"deleted": job_store.remove(job_id)}
+
+async def expire_jobs():
+    while True:
+        await asyncio.sleep(JOB_EXPIRE_INTERVAL)
+        job_store.expire()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -113,17 +726,155 @@ if __name__ == "__main__":
         required=True,
         help="Config file path",
     )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=None,
+        help="Port to listen on, overrides the config so that several servers can share one config",
+    )
     args = parser.parse_args()
     with open(args.config) as f:
         config = yaml.safe_load(f)
     config = config['verifier']
+    if args.port is not None:
+        config['port'] = args.port
     Utils.config_global = config
 
     MAX_CONCURRENT_TASKS = config['max_workers']
     QUEUE_MAX_SIZE       = config['queue_max_size']
-    MEMORY_LIMIT         = config['memory_limit'] * (1000 ** 3)
+    MEMORY_LIMIT         = config['memory_limit'] * (1000 ** 3) if config.get('memory_limit') else None
     TIME_LIMIT           = config['time_limit']
+    Runner.configure_limits(
+        memory_bytes = MEMORY_LIMIT,
+        cpu_seconds  = config.get('cpu_limit', None),
+        cgroup       = config.get('cgroup_root', None),
+    )
+
+    TCL_VERSION          = Cache.get_tcl_version()
+    # The static checks decide some results without JasperGold, see Lint.py
+    LINT_VERSION         = Lint.VERSION if config.get('static_lint', True) else None
+    result_cache         = None
+    if config.get('result_cache', True):
+        result_cache = Cache.ResultCache(
+            path        = config.get('cache_path', 'cache/results.db'),
+            max_entries = config.get('cache_max_entries', 1000000),
+            max_bytes   = config.get('cache_max_size', 10) * (1000 ** 3),
+        )
+
+    # Declarations of every testbench and testbenches of RTL designs found with Yosys, shared by the worker processes
+    if config.get('design_cache', True):
+        Designs.configure(
+            path        = config.get('design_cache_path', 'cache/designs.db'),
+            max_entries = config.get('design_cache_max_entries', 100000),
+            max_bytes   = config.get('design_cache_max_size', 1) * (1000 ** 3),
+        )
+
+    # Raw reports are kept apart from the results, which only carry a report_id, see `store_report()`
+    report_store         = None
+    if config.get('report_store', True):
+        report_store = Cache.ResultCache(
+            path        = config.get('report_store_path', 'cache/reports.db'),
+            max_entries = config.get('report_store_max_entries', 1000000),
+            max_bytes   = config.get('report_store_max_size', 5) * (1000 ** 3),
+        )
+
+    # process: every task runs in a worker process of a process pool
+    # asyncio: tasks run on threads and EDA tools are started from the event loop, no extra Python processes
+    EXECUTION_MODE       = config.get('execution_mode', 'process')
+    MAX_SUBPROCESSES     = config.get('max_subprocesses', MAX_CONCURRENT_TASKS)
+    # Threads of asyncio mode, each one holds a task until its tools are done, so fewer threads than
+    # max_workers also bound the number of running tasks
+    MAX_THREADS          = config.get('max_threads', MAX_CONCURRENT_TASKS)
+
+    # Feed JasperGold tasks to long-lived `jg` sessions over stdin instead of starting `jg -batch` for each task
+    if config.get('jg_session_pool', False):
+        Sessions.configure(
+            command         = config.get('jg_session_command', ['jg', '-fpv', '-no_gui', '-allow_unsupported_OS']),
+            # A worker process runs one task at a time and has a pool of its own, so process mode runs up to
+            # max_workers sessions in total. In asyncio mode the worker threads share one pool.
+            size            = 1 if EXECUTION_MODE == 'process' else MAX_SUBPROCESSES,
+            max_tasks       = config.get('jg_session_max_tasks', 100),
+            proj_root       = config.get('jg_session_root', os.path.join(os.getcwd(), 'logs', 'sessions')),
+            startup_timeout = config.get('jg_session_startup_timeout', 300),
+        )
+
+    # Feed Yosys tasks (/svparse, /testbench, signal list inference) to long-lived `yosys` shells over stdin
+    if config.get('yosys_session_pool', False):
+        Sessions.configure_yosys(
+            command         = config.get('yosys_session_command', ['yosys', '-Q']),
+            size            = 1 if EXECUTION_MODE == 'process' else MAX_SUBPROCESSES,
+            max_tasks       = config.get('yosys_session_max_tasks', 1000),
+            proj_root       = os.path.join(config.get('jg_session_root', os.path.join(os.getcwd(), 'logs', 'sessions')), 'yosys'),
+            startup_timeout = config.get('yosys_session_startup_timeout', 60),
+        )
+
+    ENDPOINT_PRIORITY    = config.get('endpoint_priority', {})
+
+    JOB_MAX_WAIT         = config.get('job_max_wait', 60)
+    JOB_EXPIRE_INTERVAL  = 60
+    # Idempotency keys are kept as jobs, so a retry finds the original task until job_ttl after it finished
+    job_store            = Jobs.JobStore(ttl=config.get('job_ttl', 3600))
+    # Task key -> future of the queued or running task, identical requests share one execution
+    inflight_tasks       = {}
+    # Future -> queue entry of every queued or running task, and the jobs that keep their task alive
+    task_entries         = {}
+    job_holds            = {}
+    # How often a waiting request checks whether its client is still connected
+    DISCONNECT_POLL_INTERVAL = config.get('disconnect_poll_interval', 1.0)
+
+    # Drain on SIGUSR1 or POST /admin/drain: queued tasks and finished job results are kept in the journal
+    # and picked up by the next run, which should use the same journal_path
+    draining             = False
+    journal              = Journal.TaskJournal(config.get('journal_path', f"cache/journal_{config['port']}.db"))
+    DRAIN_TIMEOUT        = config.get('drain_timeout', 600)
+    DRAIN_EXIT           = config.get('drain_exit', True)
+    DRAIN_RETRY_AFTER    = config.get('drain_retry_after', 30)
+
+    active_workers       = 0
+    metrics_registry     = Metrics.Registry()
+    QUEUE_SECONDS        = metrics_registry.add(Metrics.Histogram("sva_task_queue_seconds", "Time tasks wait in the queue"))
+    EXECUTION_SECONDS    = metrics_registry.add(Metrics.Histogram("sva_task_execution_seconds", "Time tasks spend in a worker"))
+    TOOL_SECONDS         = metrics_registry.add(Metrics.Histogram("sva_tool_seconds", "Wall time of each EDA tool run"))
+    TOOL_PEAK_RSS        = metrics_registry.add(Metrics.Histogram("sva_tool_peak_rss_bytes", "Peak memory of each EDA tool run", buckets=[2 ** i * (1 << 20) for i in range(4, 16)]))
+    TOOL_CPU_SECONDS     = metrics_registry.add(Metrics.Counter("sva_tool_cpu_seconds_total", "CPU time used by EDA tools"))
+    TOOL_OOM_KILLS       = metrics_registry.add(Metrics.Counter("sva_tool_oom_kills_total", "EDA tool runs killed by the cgroup memory limit"))
+    TOOL_RUNS            = metrics_registry.add(Metrics.Counter("sva_tool_runs_total", "EDA tool runs by exit code, returncode is None when the tool did not exit by itself"))
+    TOOL_TIMEOUTS        = metrics_registry.add(Metrics.Counter("sva_tool_timeouts_total", "EDA tool runs killed after time_limit"))
+    TOOL_EARLY_STOPS     = metrics_registry.add(Metrics.Counter("sva_tool_early_stops_total", "EDA tool runs stopped as soon as their verdict was in the report"))
+    TASK_ERRORS          = metrics_registry.add(Metrics.Counter("sva_task_errors_total", "Tasks that raised an exception"))
+    REPORT_BYTES         = metrics_registry.add(Metrics.Histogram("sva_report_bytes", "Bytes of the tool report returned by each task, its head and tail up to report_max_bytes", buckets=[2 ** i * 1024 for i in range(0, 15)]))
+    CACHE_HITS           = metrics_registry.add(Metrics.Counter("sva_cache_hits_total", "Tasks answered from the result cache"))
+    COALESCED            = metrics_registry.add(Metrics.Counter("sva_coalesced_total", "Tasks attached to an identical task already queued or running"))
+    IDEMPOTENT_REPLAYS   = metrics_registry.add(Metrics.Counter("sva_idempotent_replays_total", "Retried requests attached to the task of their idempotency key"))
+    SPILLED              = metrics_registry.add(Metrics.Counter("sva_spilled_total", "Queued tasks written to the journal while draining"))
+    REPLAYED             = metrics_registry.add(Metrics.Counter("sva_replayed_total", "Tasks replayed from the journal at startup"))
+    TASKS_CANCELLED      = metrics_registry.add(Metrics.Counter("sva_tasks_cancelled_total", "Tasks cancelled because their clients disconnected, their deadline passed or their job was deleted"))
+    REJECTED             = metrics_registry.add(Metrics.Counter("sva_rejected_total", "Requests rejected because the task queue is full"))
+    metrics_registry.add(Metrics.Gauge("sva_drain_seconds", "Estimated time until the queued tasks are done", lambda: drain_estimator.drain_time()))
+    metrics_registry.add(Metrics.Gauge("sva_queue_depth", "Tasks waiting in the queue", lambda: task_queue.qsize()))
+    metrics_registry.add(Metrics.Gauge("sva_active_workers", "Tasks being executed", lambda: active_workers))
+    metrics_registry.add(Metrics.Gauge("sva_max_workers", "Configured max_workers", lambda: MAX_CONCURRENT_TASKS))
+    metrics_registry.add(Metrics.Gauge("sva_draining", "1 while the server is draining for a restart", lambda: int(draining)))
+    metrics_registry.add(Metrics.Gauge("sva_jobs", "Jobs kept in the job store", lambda: len(job_store)))
+
+    # Equality checks of one /mvote queued at the same time, 0 runs the whole vote in one worker
+    MVOTE_PARALLELISM    = config.get('mvote_parallelism', MAX_CONCURRENT_TASKS)
+
+    # Put work_dir_root on a tmpfs such as /dev/shm to keep the per-task files off slow (e.g. NFS) disks
+    work_dir_pool        = WorkDirs.WorkDirPool(
+        root = config.get('work_dir_root', os.path.join(os.getcwd(), 'logs')),
+        size = config.get('work_dir_pool_size', MAX_CONCURRENT_TASKS * 2),
+    )
+
+    # Retry-After is the estimated drain time minus this fraction, so the queue refills just before it runs dry
+    RETRY_AFTER_HEADROOM = 0.2
+    drain_estimator      = Scheduler.DrainEstimator(num_workers=MAX_CONCURRENT_TASKS)
 
-    task_queue = asyncio.Queue(maxsize=QUEUE_MAX_SIZE)
-    executor = concurrent.futures.ProcessPoolExecutor(max_workers=MAX_CONCURRENT_TASKS)
+    task_queue = Scheduler.FairScheduler(maxsize=QUEUE_MAX_SIZE, client_weights=config.get('client_weights', {}))
+    if EXECUTION_MODE == "asyncio":
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS)
+    elif EXECUTION_MODE == "process":
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=MAX_CONCURRENT_TASKS)
+    else:
+        raise ValueError(f"Unknown execution_mode: {EXECUTION_MODE}")
     uvicorn.run(app, host=config['host'], port=config['port'])
@@ -0,0 +1,403 @@
+import os
+import re
+import time
+import uuid
+import queue
+import shutil
+import selectors
+import threading
+import subprocess
+from typing import List
+import Runner
+
+# Printed after each task, followed by a per-task token and the `catch` code of the task script
+DONE_MARKER = "@@SVA_SESSION_DONE"
+
+# Set by `configure()` and `configure_yosys()`, the pools themselves are created lazily in the process that runs the tasks
+pool_configs = {}
+pools        = {}
+pool_lock    = threading.Lock()
+
+class SessionError(Exception):
+    """
+    The tool session exited or stopped answering in the middle of a task, `output` is what it printed so far.
+    """
+
+    def __init__(self, message, output=""):
+        super().__init__(message)
+        self.output = output
+
+def tcl_quote(value):
+    # Double quoted TCL word with every substitution escaped, the value reaches the script verbatim
+    escaped = str(value)
+    for char in ("\\", '"', "$", "[", "]"):
+        escaped = escaped.replace(char, "\\" + char)
+    return '"' + escaped.replace("\n", "\\n") + '"'
+
+def parse_jg_command(jg_command: List[str]):
+    """
+    Return (tcl script, {name: value}) of a `jg -batch -tcl <script> -define <name> <value> ...` command.
+    """
+    tcl_path, defines = None, {}
+    i = 0
+    while i < len(jg_command):
+        if jg_command[i] == "-tcl":
+            tcl_path = jg_command[i + 1]
+            i += 2
+        elif jg_command[i] == "-define":
+            defines[jg_command[i + 1]] = jg_command[i + 2]
+            i += 3
+        else:
+            i += 1
+    return tcl_path, defines
+
+class TclSession:
+    """
+    One long-lived interactive tool process that reads TCL commands from stdin.
+    Used by one thread at a time.
+    """
+
+    def __init__(self, command, proj_dir, startup_timeout):
+        self.command  = command
+        self.proj_dir = proj_dir
+        self.tasks    = 0
+        self._buffer  = b""
+        os.makedirs(proj_dir, exist_ok=True)
+        self.process  = subprocess.Popen(
+            self._arguments(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        self.cgroup   = None
+        self._peak    = None
+        try:
+            # CPU time accumulates over the tasks of a session, its limit is set per task, see `start_task()`
+            self.cgroup = Runner.apply_limits(self.process.pid, cpu=False)
+            if self.cgroup is not None:
+                self._peak = self._open_peak()
+            # Wait until startup, license checkout and TCL init are done
+            self._send([])
+            self._read_until_done(uuid.uuid4().hex, startup_timeout, ready_check=True)
+        except BaseException:
+            self.kill()
+            raise
+
+    def _arguments(self):
+        return self.command + ["-proj", self.proj_dir]
+
+    def _marker(self, text):
+        # Command printing DONE_MARKER and `text`, the echo of the command itself must not match the marker
+        return f'puts "{DONE_MARKER} {text}"'
+
+    def _open_peak(self):
+        try:
+            return open(os.path.join(self.cgroup, "memory.peak"), "r+")
+        except OSError:
+            # Not writable before Linux 6.12, the peak of the cgroup is read instead
+            return None
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def start_task(self):
+        # The CPU time limit and the peak memory of the next task start from the current usage
+        Runner.start_session_task(self.process.pid, self._peak)
+
+    def usage(self):
+        if self.cgroup is not None:
+            usage = Runner.read_cgroup_usage(self.cgroup)
+            if self._peak is not None:
+                usage["peak_rss_bytes"] = Runner.read_peak_file(self._peak)
+            return usage
+        return Runner.read_proc_usage(self.process.pid) or {}
+
+    def run(self, tcl_path, defines, timeout, stream=None):
+        """
+        Run `tcl_path` with `defines` set as TCL variables, then `clear -all`.
+        Returns (catch code of the script, output of the task). With `stream` the output is fed to it
+        and its capped report is returned, the session is not stopped early, that would cost a restart.
+        """
+        token = uuid.uuid4().hex
+        names = list(defines) + ["__sva_rc", "__sva_err"]
+        lines = [f"set {name} {tcl_quote(value)}" for name, value in defines.items()]
+        lines += [
+            f"set __sva_rc [catch {{source {tcl_path}}} __sva_err]",
+            'if {$__sva_rc} {puts "ERROR: $__sva_err"}',
+            f'puts "{DONE_MARKER} {token} $__sva_rc"',
+            f"unset -nocomplain {' '.join(names)}",
+            "clear -all",
+        ]
+        self.tasks += 1
+        self._send(lines)
+        return self._read_until_done(token, timeout, stream=stream)
+
+    def _send(self, lines):
+        # A ready marker is appended to every batch of commands, see `_read_until_done()`
+        lines = lines + [self._marker("ready")]
+        try:
+            self.process.stdin.write(("\n".join(lines) + "\n").encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as err:
+            raise SessionError(f"Session {self.process.pid} is gone: {err}")
+
+    def _read_until_done(self, token, timeout, ready_check=False, stream=None):
+        """
+        Collect output until the ready marker after the commands of the task, the result marker of `token`
+        comes before it. Raises `subprocess.TimeoutExpired` after `timeout` seconds, the caller kills the session.
+        """
+        deadline = time.time() + timeout
+        output = []
+        returncode = 0 if ready_check else None
+        fd = self.process.stdout.fileno()
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while True:
+                while b"\n" in self._buffer:
+                    line, self._buffer = self._buffer.split(b"\n", 1)
+                    text = line.decode(errors="replace")
+                    if DONE_MARKER in text:
+                        # The marker may follow a console prompt
+                        fields = text[text.index(DONE_MARKER):].split()
+                        if fields[1:2] == ["ready"]:
+                            if returncode is None:
+                                raise SessionError(f"Session {self.process.pid} finished a task without its result marker")
+                            if stream is not None:
+                                stream.close()
+                                return returncode, stream.report()
+                            return returncode, "".join(output)
+                        if fields[1:2] == [token]:
+                            returncode = int(fields[2]) if len(fields) > 2 and fields[2].isdigit() else 1
+                        continue
+                    if stream is not None:
+                        stream.feed(line + b"\n")
+                    elif not ready_check:
+                        output.append(text + "\n")
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.command, timeout, output="".join(output))
+                if not selector.select(remaining):
+                    continue
+                data = os.read(fd, 65536)
+                if not data:
+                    raise SessionError(f"Session {self.process.pid} exited with code {self.process.wait()}", "".join(output))
+                self._buffer += data
+
+    def kill(self):
+        Runner.kill_process_group(self.process.pid)
+        self.process.wait()
+        self._cleanup()
+
+    def close(self, grace=5):
+        try:
+            self.process.stdin.write(b"exit\n")
+            self.process.stdin.close()
+            self.process.wait(grace)
+        except (OSError, subprocess.TimeoutExpired):
+            Runner.kill_process_group(self.process.pid)
+            self.process.wait()
+        self._cleanup()
+
+    def _cleanup(self):
+        if self._peak is not None:
+            self._peak.close()
+            self._peak = None
+        if self.cgroup is not None:
+            Runner.release_cgroup(self.cgroup)
+            self.cgroup = None
+        shutil.rmtree(self.proj_dir, ignore_errors=True)
+
+class YosysSession(TclSession):
+    """
+    One long-lived interactive `yosys` shell that reads commands from stdin. The design is cleared after
+    every task. Yosys exits on most errors, e.g. a syntax error while reading a file, then the task
+    gets the exit code and the pool replaces the session.
+    """
+
+    def _arguments(self):
+        return self.command
+
+    def _marker(self, text):
+        # `log` drops the quotes around its message, the echo of the command keeps them
+        return f'log "{DONE_MARKER} {text}"'
+
+    def run(self, commands, timeout):
+        """
+        Run the Yosys `commands`, returns (exit code of the task, its log). A command error that does not
+        end the shell still makes the exit code 1.
+        """
+        token = uuid.uuid4().hex
+        lines = list(commands) + [self._marker(f"{token} 0"), "design -reset", "verilog_defines -reset"]
+        self.tasks += 1
+        self._send(lines)
+        try:
+            returncode, output = self._read_until_done(token, timeout)
+        except SessionError as err:
+            if self.alive():
+                raise
+            return self.process.wait(), err.output
+        if re.search(r"\bERROR:", output):
+            returncode = 1
+        return returncode, output
+
+class SessionPool:
+    """
+    At most `size` tool sessions run tasks at the same time. A session is recycled after `max_tasks` tasks
+    or when the tool itself fails (it exits, stops answering or breaks the marker protocol), and killed on
+    timeout. A script that fails, e.g. on a syntax error of a candidate, keeps its session: `clear -all`
+    resets it like any other task. Retired sessions are replaced on a background thread, so the startup
+    cost stays off the request path.
+    """
+
+    def __init__(self, command, size, max_tasks, proj_root, startup_timeout, session_class=TclSession):
+        self.session_class   = session_class
+        self.command         = command
+        self.max_tasks       = max_tasks
+        self.proj_root       = os.path.abspath(proj_root)
+        self.startup_timeout = startup_timeout
+        self._idle           = queue.LifoQueue()
+        self._slots          = threading.BoundedSemaphore(size)
+        self._count          = 0
+        self._pending        = 0
+        self._lock           = threading.Lock()
+
+    def _spawn(self):
+        with self._lock:
+            name = f"session_{os.getpid()}_{self._count:05d}"
+            self._count += 1
+        return self.session_class(self.command, os.path.join(self.proj_root, name), self.startup_timeout)
+
+    def _replace(self):
+        with self._lock:
+            self._pending += 1
+
+        def spawn():
+            session = None
+            try:
+                session = self._spawn()
+            except Exception as err:
+                # A waiting task gets None and starts a session itself, which reports the error
+                print(f"Failed to start a tool session: {err}")
+            self._idle.put(session)
+            with self._lock:
+                self._pending -= 1
+        threading.Thread(target=spawn, daemon=True).start()
+
+    def _acquire(self):
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            # Waiting for a replacement that is already starting is never slower than starting another one
+            session = self._idle.get() if self._pending else None
+        if session is not None and not session.alive():
+            # Killed while idle, e.g. by the cancellation of the task that used it last
+            session.kill()
+            session = None
+        return session if session is not None else self._spawn()
+
+    def run(self, *args, **kwargs):
+        # Arguments of `run()` of the session class, which returns (exit code, report)
+        work_dir = Runner.current_work_dir()
+        Runner.check_cancelled(work_dir)
+        with self._slots:
+            session = self._acquire()
+            start, before = time.time(), {}
+            returncode, timed_out, usage = None, False, {}
+            # Cancelling the task kills the whole session, which is then replaced
+            Runner.track_process(work_dir, session.process.pid)
+            try:
+                # Usage of the task is the difference to the usage of the session before it
+                session.start_task()
+                before = session.usage()
+                returncode, report = session.run(*args, **kwargs)
+                usage = session.usage()
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                session.kill()
+                self._replace()
+                raise
+            except Exception:
+                session.kill()
+                self._replace()
+                raise
+            finally:
+                Runner.untrack_process(work_dir, session.process.pid)
+                if before.get("cpu_seconds") is not None and usage.get("cpu_seconds") is not None:
+                    usage = usage | {"cpu_seconds": usage["cpu_seconds"] - before["cpu_seconds"]}
+                Runner.record_run(session.command, returncode, timed_out, time.time() - start, usage)
+            if session.tasks >= self.max_tasks or not session.alive():
+                session.close()
+                self._replace()
+            else:
+                self._idle.put(session)
+            return returncode, report
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if session is not None:
+                session.close()
+
+def configure(command, size, max_tasks, proj_root, startup_timeout):
+    """
+    Run JasperGold tasks in long-lived sessions started with `command`, see `run_jaspergold()`.
+    Must be called before the worker processes are forked, each process then starts its own pool of up to
+    `size` sessions: `size` bounds the sessions of one process, not those of all workers together.
+    """
+    pool_configs["jg"] = {
+        "command": command,
+        "size": size,
+        "max_tasks": max_tasks,
+        "proj_root": proj_root,
+        "startup_timeout": startup_timeout,
+    }
+
+def configure_yosys(command, size, max_tasks, proj_root, startup_timeout):
+    """
+    Run Yosys tasks in long-lived `yosys` shells started with `command`, see `run_yosys()`.
+    Must be called before the worker processes are forked.
+    """
+    pool_configs["yosys"] = {
+        "command": command,
+        "size": size,
+        "max_tasks": max_tasks,
+        "proj_root": proj_root,
+        "startup_timeout": startup_timeout,
+        "session_class": YosysSession,
+    }
+
+def enabled(tool="jg"):
+    return tool in pool_configs
+
+def get_pool(tool="jg"):
+    with pool_lock:
+        # A pool inherited through fork belongs to the parent process, its sessions cannot be shared
+        pid, pool = pools.get(tool, (None, None))
+        if pool is None or pid != os.getpid():
+            pool = SessionPool(**pool_configs[tool])
+            pools[tool] = (os.getpid(), pool)
+        return pool
+
+def run_jaspergold(jg_command: List[str], timeout: float, stream=None):
+    """
+    Run the `-tcl` script of `jg_command` with its `-define` variables in a pooled session,
+    returns (catch code of the script, report). Raises `subprocess.TimeoutExpired` like `Runner.run_command`.
+    """
+    tcl_path, defines = parse_jg_command(jg_command)
+    return get_pool("jg").run(tcl_path, defines, timeout, stream)
+
+def run_yosys(commands: List[str], timeout: float):
+    """
+    Run the Yosys `commands` in a pooled shell, returns (exit code, log).
+    Raises `subprocess.TimeoutExpired` like `Runner.run_command`.
+    """
+    return get_pool("yosys").run(commands, timeout)
+
+def close():
+    for pid, pool in pools.values():
+        if pid == os.getpid():
+            pool.close()
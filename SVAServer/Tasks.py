@@ -0,0 +1,14 @@
+# Task endpoints of a verifier server, also the endpoints allowed in batch and job items.
+# Kept out of Server.py so that the coordinator can check items without importing the server.
+TASK_TYPES = (
+    "/syntax",
+    "/cov",
+    "/verify",
+    "/equal",
+    "/equal_opt",
+    "/equal_multi",
+    "/testbench",
+    "/verify_impl_only",
+    "/svparse",
+    "/mvote",
+)
@@ -3,11 +3,40 @@ import re
 from typing import List, Set, Tuple
 import subprocess
 import json
+import hashlib
 import networkx as nx
 import time
+import Runner
+import Sessions
 
 config_global = None
 
+def get_generator_version():
+    """
+    Hash of this module, which holds the testbench generator, so that editing it invalidates the
+    testbenches it produced, see `Executor.testbench_generate()`.
+    """
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def run_yosys_script(commands: List[str], work_dir: str, timeout: float):
+    """
+    Run the Yosys `commands` in a pooled `yosys` shell if enabled (see `Sessions.configure_yosys()`),
+    else as a script of a new `yosys` process. Returns (exit code, log); results are written to files.
+    """
+    if Sessions.enabled("yosys"):
+        return Sessions.run_yosys(commands, timeout)
+    script_path = os.path.join(work_dir, "script.ys")
+    with open(script_path, "w") as f:
+        f.write("\n".join(commands) + "\n")
+    returncode, stdout, stderr = Runner.run_command(["yosys", script_path], timeout=timeout, merge_stderr=False)
+    return returncode, stdout + stderr
+
+def yosys_error(log: str):
+    # Error lines of a Yosys log, the whole log if there are none
+    errors = re.findall(r"\bERROR:.*", log)
+    return "\n".join(errors) if errors else log
+
 def extract_signal_names(module_interface: str) -> Set[str]:
     """
     Extract signal names from the module interface.
@@ -31,6 +60,27 @@ def extract_signal_names(module_interface: str) -> Set[str]:
 
     return signal_names
 
+# Net or variable declaration: keywords, packed dimensions, then the names with their unpacked dimensions
+DECLARATION = re.compile(r"""
+    \b(?:input|output|inout|wire|reg|logic|bit)\b
+    (?:\s+(?:wire|reg|logic|bit|signed|unsigned)\b)*
+    \s*(?P<packed>(?:\[[^\[\]]*\]\s*)*)
+    (?P<names>[A-Za-z_]\w*\s*(?:\[[^\[\]]*\]\s*)*
+        (?:,\s*(?!(?:input|output|inout)\b)[A-Za-z_]\w*\s*(?:\[[^\[\]]*\]\s*)*)*)
+""", re.VERBOSE)
+
+def vector_names(code: str) -> Set[str]:
+    """
+    Names declared with exactly one packed dimension and no unpacked one, e.g. `a` of `logic [7:0] a;`,
+    so that a single index of them selects one bit. A name declared in any other way is left out.
+    """
+    one_dimensional = {}
+    for declaration in DECLARATION.finditer(code):
+        packed = declaration.group("packed").count("[")
+        for name, unpacked in re.findall(r"([A-Za-z_]\w*)\s*((?:\[[^\[\]]*\]\s*)*)", declaration.group("names")):
+            one_dimensional[name] = one_dimensional.get(name, True) and packed == 1 and not unpacked
+    return {name for name, is_vector in one_dimensional.items() if is_vector}
+
 def add_sva_to_impl_verify(impl: str, asrt: str, top_name: str, reset: str, reset_polarity: bool | None) -> str:
     """
     1. Add `tb_reset` as the real reset signal.
@@ -185,22 +235,22 @@ def extract_golden_ports(golden_path, golden_top, timeout=60):
     reset_port_polarity_sync: 复位端口名、高低电平有效、同步/异步复位
     """
     golden_top = golden_top.lstrip("\\")
-    yosys_script = f"read_verilog {golden_path}; prep -top {golden_top} -flatten; opt_dff -nodffe; json -compat-int; exec -- echo 'Happy new year~';"
-    yosys_result = subprocess.run(
-        ["yosys", "-p", yosys_script],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        timeout=timeout,
+    work_dir = os.path.dirname(os.path.abspath(golden_path))
+    json_path = os.path.join(work_dir, "ports.json")
+    returncode, yosys_log = run_yosys_script(
+        [
+            f"read_verilog {golden_path}",
+            f"prep -top {golden_top} -flatten",
+            "opt_dff -nodffe",
+            f"write_json -compat-int {json_path}",
+        ],
+        work_dir,
+        timeout,
     )
-    if yosys_result.stderr:
-        raise Exception(yosys_result.stderr.decode("utf-8"))
-    yosys_output = yosys_result.stdout.decode("utf-8")
-    yosys_json_text = re.search(
-        r'(\{\n\s+"creator":[\s\S]*\})\n+[\d]+\. Executing command',
-        yosys_output,
-        re.DOTALL,
-    ).group(1)
-    yosys_json = json.loads(yosys_json_text)
+    if returncode != 0:
+        raise Exception(yosys_error(yosys_log))
+    with open(json_path) as f:
+        yosys_json = json.load(f)
     ports_ids_dict = {}
     input_port_width = set()
     output_port_width = set()
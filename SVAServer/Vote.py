@@ -0,0 +1,135 @@
+import re
+import Canonical
+
+def extract_sva(sva):
+    if ":" not in sva or sva.startswith("property"):
+        return sva
+    return sva.split(":", 1)[1].strip()
+
+def normalize(sva):
+    return re.sub(r'\s+', '', sva)
+
+def assertion_key(sva, one_bit_signals=frozenset(), vectors=frozenset()):
+    """
+    Assertions with the same key are equivalent without asking the formal tool: the canonical form,
+    see `Canonical.canonical()`, or the text without label and whitespace if it cannot be parsed.
+    """
+    return Canonical.canonical(sva, one_bit_signals, vectors) or normalize(extract_sva(sva))
+
+class UnionFind:
+    """
+    Disjoint sets over 0..n-1 with a weight per set. The smallest index of a set is its root,
+    so classes keep the order in which their first member appeared.
+    """
+
+    def __init__(self, weights):
+        self.parent = list(range(len(weights)))
+        self.weight = list(weights)
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        a, b = min(a, b), max(a, b)
+        self.parent[b] = a
+        self.weight[a] += self.weight[b]
+        return a
+
+class MajorityVote:
+    """
+    Groups assertions into classes of equivalent ones with as few equality checks as possible.
+    Assertions with the same canonical form are one node. `next_pairs()` hands out comparisons
+    between class representatives, each class in at most one running comparison, and `record()`
+    merges the classes of equivalent pairs. Equivalence is symmetric and transitive, so two classes
+    are compared at most once. The vote is over as soon as one class holds a strict majority.
+    """
+
+    def __init__(self, asrts):
+        self.asrts   = list(asrts)
+        self.nodes   = []
+        self.members = []
+        index = {}
+        for i, asrt in enumerate(self.asrts):
+            key = assertion_key(asrt)
+            if key not in index:
+                index[key] = len(self.nodes)
+                self.nodes.append(asrt)
+                self.members.append([])
+            self.members[index[key]].append(i)
+        self.classes     = UnionFind([len(members) for members in self.members])
+        self.different   = set()
+        self.busy        = set()
+        self.comparisons = 0
+
+    def roots(self):
+        return [node for node in range(len(self.nodes)) if self.classes.find(node) == node]
+
+    def majority(self):
+        # Root of the class holding more than half of the assertions, if any
+        for root in self.roots():
+            if 2 * self.classes.weight[root] > len(self.asrts):
+                return root
+        return None
+
+    def next_pairs(self, limit):
+        """
+        Up to `limit` new (a, b) node pairs to compare, heaviest classes first since they decide the vote.
+        """
+        pairs = []
+        roots = sorted(self.roots(), key=lambda root: -self.classes.weight[root])
+        for i, a in enumerate(roots):
+            for b in roots[i + 1:]:
+                if len(pairs) >= limit:
+                    return pairs
+                if a in self.busy or b in self.busy or frozenset((a, b)) in self.different:
+                    continue
+                self.busy.update((a, b))
+                pairs.append((a, b))
+        return pairs
+
+    def record(self, a, b, equivalent):
+        self.busy.difference_update((a, b))
+        self.comparisons += 1
+        if equivalent:
+            self.classes.union(a, b)
+            # Classes known to differ from a or b now differ from the merged class
+            self.different = {frozenset(self.classes.find(x) for x in pair) for pair in self.different}
+        else:
+            self.different.add(frozenset((self.classes.find(a), self.classes.find(b))))
+
+    def finished(self):
+        if self.majority() is not None:
+            return True
+        return not self.busy and not self.next_pairs_available()
+
+    def next_pairs_available(self):
+        roots = self.roots()
+        return any(
+            frozenset((a, b)) not in self.different
+            for i, a in enumerate(roots) for b in roots[i + 1:]
+        )
+
+    def result(self):
+        """
+        The classes in order of their first assertion and the first assertion of the largest class, like the
+        original sequential vote. After an early stop, classes that were not compared yet stay apart.
+        """
+        roots = self.roots()
+        equivalence_classes = []
+        for root in roots:
+            indices = sorted(i for node in range(len(self.nodes)) if self.classes.find(node) == root for i in self.members[node])
+            equivalence_classes.append([self.asrts[i] for i in indices])
+        max_class = max(equivalence_classes, key=len, default=[])
+        return {
+            "ok": True,
+            "equivalence_classes": equivalence_classes,
+            "vote_result": max_class[0] if max_class else None,
+            "comparisons": self.comparisons,
+            "stopped_early": self.majority() is not None and self.next_pairs_available(),
+        }
@@ -0,0 +1,56 @@
+import os
+import shutil
+import threading
+import concurrent.futures
+from collections import deque
+
+class WorkDirPool:
+    """
+    Pool of reusable task directories under `root` (e.g. `/dev/shm/sva_server` to keep them in memory).
+    A released directory is emptied on a background thread and only then handed out again,
+    so neither creation nor cleanup happens on the request path.
+    """
+
+    def __init__(self, root, size):
+        # One sub directory per server process, so several servers can share the same root
+        self.root      = os.path.join(os.path.abspath(root), f"server_{os.getpid()}")
+        self._free     = deque()
+        self._lock     = threading.Lock()
+        self._count    = 0
+        self._cleaner  = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        shutil.rmtree(self.root, ignore_errors=True)
+        for _ in range(size):
+            self._free.append(self._create())
+
+    def _create(self):
+        with self._lock:
+            path = os.path.join(self.root, f"slot_{self._count:05d}")
+            self._count += 1
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def acquire(self):
+        try:
+            return self._free.popleft()
+        except IndexError:
+            # Every directory is in use or being cleaned, grow the pool
+            return self._create()
+
+    def release(self, path):
+        self._cleaner.submit(self._clean, path)
+
+    def _clean(self, path):
+        for name in os.listdir(path):
+            child = os.path.join(path, name)
+            if os.path.isdir(child) and not os.path.islink(child):
+                shutil.rmtree(child, ignore_errors=True)
+            else:
+                try:
+                    os.remove(child)
+                except FileNotFoundError:
+                    pass
+        self._free.append(path)
+
+    def close(self):
+        self._cleaner.shutdown(wait=True)
+        shutil.rmtree(self.root, ignore_errors=True)
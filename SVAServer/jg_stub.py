@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Stand-in for `jg` to run and test the server without JasperGold, it only fakes the lines the report parsers look for.
+
+Batch mode:    jg_stub.py -fpv -batch -tcl tcls/syntax_check.tcl -define SVA_PATH sva.sva ...
+Session mode:  jg_stub.py -fpv -no_gui -proj proj, then the TCL commands sent by Sessions.py on stdin
+
+Environment:
+    JG_STUB_STARTUP  seconds before the first command is read, like license checkout (default 0)
+    JG_STUB_DELAY    seconds per script (default 0)
+    JG_STUB_HANG     scripts whose design or defines contain this text never finish
+Sources containing STUB_SYNTAX_ERROR fail elaboration.
+"""
+import os
+import re
+import sys
+import time
+
+def read_file(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (OSError, TypeError):
+        return ""
+
+def run_script(tcl_path, variables):
+    sources = read_file(variables.get("SVA_PATH")) + read_file(variables.get("SV_PATH"))
+    hang = os.environ.get("JG_STUB_HANG")
+    if hang and (hang in sources or any(hang in value for value in variables.values())):
+        while True:
+            time.sleep(60)
+    time.sleep(float(os.environ.get("JG_STUB_DELAY", "0")))
+    script = os.path.basename(tcl_path)
+    print(f"INFO (jg_stub): sourcing {tcl_path}")
+    if script == "equality_multi_check.tcl":
+        # A syntax error in the shared testbench falls back to one elaboration per pair
+        shared = "STUB_SYNTAX_ERROR" not in sources
+        if not shared:
+            print("[ERROR (VERI-1137)] syntax error near 'STUB_SYNTAX_ERROR'")
+        print(f"@@SHARED_ELABORATION {int(shared)}")
+        pair_dir = variables.get("PAIR_DIR", "")
+        for i in range(int(variables.get("PAIR_COUNT", "0"))):
+            print(f"@@PAIR_START {i}")
+            if not shared and "STUB_SYNTAX_ERROR" in read_file(os.path.join(pair_dir, f"pair_{i}.sva")):
+                print("[ERROR (VERI-1137)] syntax error near 'STUB_SYNTAX_ERROR'")
+            else:
+                lm_text  = re.sub(r"\s+", "", read_file(os.path.join(pair_dir, f"pair_{i}.lm")))
+                ref_text = re.sub(r"\s+", "", read_file(os.path.join(pair_dir, f"pair_{i}.ref")))
+                print("Full equivalence" if lm_text == ref_text else "No equivalence")
+            print(f"@@PAIR_END {i}")
+        return 0
+    if "STUB_SYNTAX_ERROR" in sources:
+        print("[ERROR (VERI-1137)] syntax error near 'STUB_SYNTAX_ERROR'")
+        print("ERROR: problem encountered at line 1 in file " + tcl_path)
+        return 1
+    if script == "equality_check.tcl":
+        lm_text  = re.sub(r"\s+", "", variables.get("LM_ASSERT_TEXT", ""))
+        ref_text = re.sub(r"\s+", "", variables.get("REF_ASSERT_TEXT", ""))
+        print("Full equivalence" if lm_text == ref_text else "No equivalence")
+    elif script in ("correctness_verify.tcl", "correctness_verify_impl_only.tcl", "coverage_check.tcl"):
+        count = max(1, len(re.findall(r"\bassert\s+property\b", sources)))
+        labels = re.findall(r"(\w+)\s*:\s*assert\s+property\b", sources)
+        names = labels if len(labels) == count else [f"assert_{i}" for i in range(count)]
+        print("properties: " + " ".join(f"stub.{name}" for name in names))
+        print("times: " + " ".join(["0.01"] * count))
+        print("proofs: " + " ".join(["proven"] * count))
+        if script == "coverage_check.tcl":
+            print("\nCOVERAGE REPORT\nTYPE|MODEL|COVERAGE\n--------------------")
+            for cov_type in ("stimuli", "coi"):
+                for model in ("functional", "statement", "toggle", "expression", "branch"):
+                    print(f"{cov_type}|{model}|100.0")
+            print("### COVERAGE_REPORT_START ###\n### UNDETECTABLE_START ###\n\n### UNDETECTABLE_END ###")
+            print("### UNPROCESSED_START ###\n\n### UNPROCESSED_END ###\n### COVERAGE_REPORT_END ###")
+    return 0
+
+def unquote(word, variables):
+    # Double quoted TCL word: substitute unescaped $variables, then resolve backslash escapes
+    if not (word.startswith('"') and word.endswith('"')):
+        return word
+    word = re.sub(r"(?<!\\)\$(\w+)", lambda m: variables.get(m.group(1), ""), word[1:-1])
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), word)
+
+def run_session(variables):
+    time.sleep(float(os.environ.get("JG_STUB_STARTUP", "0")))
+    print("INFO (jg_stub): session ready", flush=True)
+    for line in sys.stdin:
+        line = line.strip()
+        source = re.match(r"set (\w+) \[catch \{source (\S+)\} \w+\]$", line)
+        if source:
+            variables[source.group(1)] = str(run_script(source.group(2), variables))
+        elif line.startswith("set "):
+            _, name, word = line.split(" ", 2)
+            variables[name] = unquote(word, variables)
+        elif line.startswith("puts "):
+            print(unquote(line[len("puts "):], variables))
+        elif line.startswith("unset "):
+            for name in line.split()[1:]:
+                variables.pop(name, None)
+        elif line == "exit":
+            break
+        # clear -all and the error branch need nothing here
+        sys.stdout.flush()
+
+def main(args):
+    variables, tcl_path, batch = {}, None, False
+    i = 0
+    while i < len(args):
+        if args[i] == "-define":
+            variables[args[i + 1]] = args[i + 2]
+            i += 3
+        elif args[i] in ("-tcl", "-proj"):
+            tcl_path = args[i + 1] if args[i] == "-tcl" else tcl_path
+            i += 2
+        else:
+            batch = batch or args[i] == "-batch"
+            i += 1
+    if batch:
+        run_script(tcl_path, variables)
+    else:
+        run_session(variables)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
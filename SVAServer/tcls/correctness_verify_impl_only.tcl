@@ -62,5 +62,15 @@ if {[info exists RESET]} {
 
 # get_design_info
 prove -all -time_limit 1m
+# Proof time of each property, `-` where the tool reports none
+set property_times {}
+foreach property [get_property_list -include {type {assert} disabled {0}}] {
+    if {[catch {get_property_info $property -list time} property_time] || $property_time eq ""} {
+        set property_time -
+    }
+    lappend property_times [join $property_time]
+}
+puts "times: $property_times"
+puts "properties: [get_property_list -include {type {assert} disabled {0}}]"
 puts "proofs: [get_status [get_property_list -include {type {assert} disabled {0}}]]"
 report
@@ -35,7 +35,18 @@ prove -all -time_limit 1m
 # Get proof results
 set proofs_status [get_status [get_property_list -include {type {assert} disabled {0}}]]
 
-# Output the proof results
+# Proof time of each property, `-` where the tool reports none
+set property_times {}
+foreach property [get_property_list -include {type {assert} disabled {0}}] {
+    if {[catch {get_property_info $property -list time} property_time] || $property_time eq ""} {
+        set property_time -
+    }
+    lappend property_times [join $property_time]
+}
+puts "times: $property_times"
+
+# Output the proof results, in the same order as the property names
+puts "properties: [get_property_list -include {type {assert} disabled {0}}]"
 puts "proofs: $proofs_status"
 
 # Check if any properties failed (have status 'cex' or 'falsified')
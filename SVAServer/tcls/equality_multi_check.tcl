@@ -0,0 +1,47 @@
+# Equivalence of several assertion pairs in one JasperGold run, see `equality_check_multi` in Executor.py
+# SVA_PATH is the testbench with every assertion of the pairs, it is analyzed and elaborated once.
+# For pair i, PAIR_DIR holds:
+#   pair_<i>.sva  testbench with both assertions, only elaborated when SVA_PATH fails to elaborate
+#   pair_<i>.lm   assertion text
+#   pair_<i>.ref  reference assertion text
+# "@@SHARED_ELABORATION 1" (or 0) tells whether SVA_PATH elaborated. The output of each pair is framed by
+# "@@PAIR_START <i>" and "@@PAIR_END <i>", a failing pair does not stop the others.
+
+proc read_text {path} {
+    set f [open $path]
+    set text [read -nonewline $f]
+    close $f
+    return $text
+}
+
+# Syntax of all candidates at once, a syntax error in one of them falls back to one elaboration per pair
+clear -all
+analyze -clear
+if {[catch {analyze -sv12 $SVA_PATH; elaborate} err]} {
+    puts "ERROR: $err"
+    set shared_elaboration 0
+} else {
+    set shared_elaboration 1
+}
+puts "@@SHARED_ELABORATION $shared_elaboration"
+
+set signal_list [split $SIGNAL_LIST ","]
+for {set i 0} {$i < $PAIR_COUNT} {incr i} {
+    puts "@@PAIR_START $i"
+    if {!$shared_elaboration} {
+        clear -all
+        analyze -clear
+        if {[catch {analyze -sv12 $PAIR_DIR/pair_$i.sva; elaborate} err]} {
+            puts "ERROR: $err"
+            puts "@@PAIR_END $i"
+            continue
+        }
+    }
+
+    clear -all
+    include tcls/pec.tcle
+    if {[catch {prop_eq_checker [read_text $PAIR_DIR/pair_$i.lm] [read_text $PAIR_DIR/pair_$i.ref] "" "" $signal_list} err]} {
+        puts "ERROR: $err"
+    }
+    puts "@@PAIR_END $i"
+}
@@ -363,6 +363,31 @@ always  @(negedge i_clock)
     end    
 endmodule'''
     }
+elif test_func == "batch":
+    url = "http://127.0.0.1:4422/batch"
+    data = [
+        {
+            "endpoint": "/equal",
+            "payload": {
+                "key_signal" : "clk",
+                "asrt": f"assert property (@(posedge clk) sig_A[{i}] |-> ##1 sig_B[{i}]);",
+                "ref_asrt": "assert property (@(posedge clk) sig_A[0] |-> ##1 sig_B[0]);",
+                "tb": "module testbench (\n    input clk,\n    input [3:0] sig_A,\n    input [3:0] sig_B\n);\nendmodule",
+                "signal_list": "[3:0] sig_A, [3:0] sig_B"
+            }
+        }
+        for i in range(4)
+    ]
+
+elif test_func == "batch_stream":
+    url = "http://127.0.0.1:4422/batch/stream"
+    data = [
+        {
+            "endpoint": "/syntax",
+            "payload": {"impl": f"module m{i}(input clk);\nendmodule"}
+        }
+        for i in range(4)
+    ]
 
 else:
     assert False
@@ -371,6 +396,13 @@ headers = {
     "Content-Type": "application/json"
 }
 
+if url.endswith("/stream"):
+    with requests.post(url, json=data, headers=headers, stream=True) as response:
+        for line in response.iter_lines():
+            if line:
+                print(line.decode())
+    sys.exit(0)
+
 import concurrent.futures
 
 def send_request():
@@ -0,0 +1,115 @@
+import os
+import re
+import sys
+import time
+import socket
+import subprocess
+import httpx
+import pytest
+import yaml
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The server modules import each other by their bare names
+sys.path.insert(0, SERVER_DIR)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_until_up(url, process, log_path, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            with open(log_path) as f:
+                raise RuntimeError(f"{url} exited with code {process.returncode}:\n{f.read()}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout} seconds")
+
+class Processes:
+    """
+    Verifier servers and coordinators started by a test from configs in `root`, the servers run `jg_stub.py`
+    as `jg`. Their output goes to `<name>.log`, see `log()`.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.running = {}
+        bin_dir = root / "bin"
+        bin_dir.mkdir()
+        jg = bin_dir / "jg"
+        jg.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(SERVER_DIR, "jg_stub.py")}" "$@"\n')
+        jg.chmod(0o755)
+        self.env = os.environ | {"PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}", "PYTHONUNBUFFERED": "1"}
+
+    def start(self, script, section, config, status_path, env=None):
+        name = f"{section}_{config['port']}"
+        config_path = self.root / f"{name}.yaml"
+        config_path.write_text(yaml.safe_dump({section: config}))
+        log_path = self.root / f"{name}.log"
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(
+                [sys.executable, script, "--config", str(config_path)],
+                cwd=SERVER_DIR,
+                env=self.env | (env or {}),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        url = f"http://127.0.0.1:{config['port']}"
+        self.running[url] = (process, log_path)
+        wait_until_up(url + status_path, process, log_path)
+        return url
+
+    def server(self, env=None, **overrides):
+        port = free_port()
+        data = self.root / f"server_{port}"
+        config = {
+            "host": "127.0.0.1",
+            "port": port,
+            "max_workers": 2,
+            "queue_max_size": 64,
+            "time_limit": 30,
+            "cache_path": str(data / "results.db"),
+            "design_cache_path": str(data / "designs.db"),
+            "report_store_path": str(data / "reports.db"),
+            "journal_path": str(data / "journal.db"),
+            "work_dir_root": str(data / "work"),
+            "jg_session_root": str(data / "sessions"),
+            "disconnect_poll_interval": 0.2,
+            "drain_exit": False,
+        }
+        return self.start("Server.py", "verifier", config | overrides, "/status", env)
+
+    def coordinator(self, backends, **overrides):
+        config = {"host": "127.0.0.1", "port": free_port(), "backends": backends, "probe_interval": 0.5}
+        return self.start("Coordinator.py", "coordinator", config | overrides, "/cluster")
+
+    def metric(self, url, name):
+        # Sum of the samples of the metric `name` over all its labels
+        text = httpx.get(url + "/metrics", timeout=10).text
+        return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if re.match(rf"{name}(\{{|\s)", line))
+
+    def log(self, url):
+        with open(self.running[url][1]) as f:
+            return f.read()
+
+    def stop(self, url, timeout=30):
+        process, _ = self.running.pop(url)
+        process.terminate()
+        try:
+            return process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            return process.wait()
+
+@pytest.fixture
+def processes(tmp_path):
+    processes = Processes(tmp_path)
+    yield processes
+    for url in list(processes.running):
+        processes.stop(url)
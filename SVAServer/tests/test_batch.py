@@ -0,0 +1,39 @@
+import httpx
+import pytest
+
+def syntax_item(i, broken=False):
+    impl = f"module m{i}(input clk); assert property (@(posedge clk) {'STUB_SYNTAX_ERROR' if broken else 'clk'}); endmodule"
+    return {"endpoint": "/syntax", "payload": {"impl": impl}}
+
+@pytest.fixture
+def server(processes):
+    return processes.server()
+
+def test_results_keep_the_item_order(server):
+    items = [syntax_item(i, broken=i % 2 == 1) for i in range(6)]
+    results = httpx.post(server + "/batch", json=items, timeout=60).json()
+    assert [result["syntax"] for result in results] == [i % 2 == 0 for i in range(6)]
+
+def test_failed_item_does_not_fail_the_batch(server):
+    # The payload lacks `impl`, the task raises in the worker
+    items = [syntax_item(0), {"endpoint": "/syntax", "payload": {}}, syntax_item(2)]
+    response = httpx.post(server + "/batch", json=items, timeout=60)
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0]["syntax"] and results[2]["syntax"]
+    assert "impl" in results[1]["error"] and results[1]["retryable"] is False
+
+def test_single_task_endpoints_are_unchanged(server):
+    result = httpx.post(server + "/syntax", json=syntax_item(0)["payload"], timeout=60).json()
+    assert result["syntax"]
+
+@pytest.mark.parametrize("body, message", [
+    ({"endpoint": "/syntax"}, "must be a list"),
+    ([{"endpoint": "/syntax"}], "Batch item 0 must be"),
+    ([{"endpoint": "/nope", "payload": {}}], "Unknown endpoint in batch item 0"),
+    ([{"endpoint": "/syntax", "payload": {}, "priority": "high"}], "Priority must be an integer"),
+])
+def test_malformed_batches_are_rejected(server, body, message):
+    response = httpx.post(server + "/batch", json=body, timeout=60)
+    assert response.status_code == 400
+    assert message in response.json()["error"]
@@ -0,0 +1,36 @@
+import json
+import time
+import httpx
+import pytest
+
+def syntax_item(i, text="clk", **fields):
+    return {"endpoint": "/syntax", "payload": {"impl": f"module m{i}(input clk); assert property (@(posedge clk) {text}); endmodule"}} | fields
+
+@pytest.fixture
+def server(processes):
+    return processes.server(env={"JG_STUB_HANG": "HANG_HERE"})
+
+def stream(server, items):
+    # (seconds since the request, line) of every streamed line
+    start, lines = time.time(), []
+    with httpx.stream("POST", server + "/batch/stream", json=items, timeout=60) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        for line in response.iter_lines():
+            if line:
+                lines.append((time.time() - start, json.loads(line)))
+    return lines
+
+def test_every_item_is_streamed_with_its_index(server):
+    items = [syntax_item(i, "STUB_SYNTAX_ERROR" if i == 1 else "clk") for i in range(4)]
+    results = {line["index"]: line["result"] for _, line in stream(server, items)}
+    assert sorted(results) == [0, 1, 2, 3]
+    assert [results[i]["syntax"] for i in range(4)] == [True, False, True, True]
+
+def test_results_are_sent_as_they_finish(server):
+    # The first item only finishes at its deadline, the second one is streamed long before
+    items = [syntax_item(0, "HANG_HERE", deadline=3), syntax_item(1)]
+    lines = stream(server, items)
+    assert [line["index"] for _, line in lines] == [1, 0]
+    assert lines[0][0] < 2 <= lines[1][0]
+    assert lines[1][1]["result"] == {"error": "Deadline exceeded before the task finished", "retryable": False}
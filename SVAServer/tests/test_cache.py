@@ -0,0 +1,54 @@
+import itertools
+import Cache
+
+def make_cache(tmp_path, monkeypatch, **limits):
+    # Evict on every put and give every access its own time, so the LRU order is deterministic
+    clock = itertools.count(1)
+    monkeypatch.setattr(Cache, "EVICT_INTERVAL", 1)
+    monkeypatch.setattr(Cache.time, "time", lambda: float(next(clock)))
+    return Cache.ResultCache(str(tmp_path / "results.db"), limits.get("max_entries", 1000), limits.get("max_bytes", 1 << 30))
+
+def test_make_key_ignores_trailing_whitespace():
+    assert Cache.make_key("/equal", {"asrt": "a |-> b;  \n\n"}) == Cache.make_key("/equal", {"asrt": "a |-> b;"})
+    assert Cache.make_key("/equal", {"asrt": "a |-> b;"}) != Cache.make_key("/equal", {"asrt": "a |=> b;"})
+
+def test_make_key_depends_on_namespace_and_version():
+    payload = {"asrt": "a |-> b;"}
+    assert Cache.make_key("/equal", payload) != Cache.make_key("/equal_opt", payload)
+    assert Cache.make_key("/equal", payload, "v1") != Cache.make_key("/equal", payload, "v2")
+
+def test_get_returns_stored_value(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch)
+    assert cache.get("missing") is None
+    cache.put("key", {"ok": True, "syntax": 1.0})
+    assert cache.get("key") == {"ok": True, "syntax": 1.0}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_evicts_least_recently_used_entries(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_entries=10)
+    for i in range(10):
+        cache.put(f"key{i}", i)
+    # A read refreshes the entry, the next oldest ones go first
+    cache.get("key0")
+    cache.put("key10", 10)
+    assert cache.stats()["entries"] == 9
+    assert cache.get("key0") == 0
+    assert cache.get("key1") is None
+    assert cache.get("key2") is None
+    assert cache.get("key3") == 3
+    assert cache.stats()["evictions"] == 2
+
+def test_evicts_by_size(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path, monkeypatch, max_bytes=1000)
+    for i in range(5):
+        cache.put(f"key{i}", "x" * 298)
+    # Entries are 300 bytes of JSON, down to 90% of the limit keeps the newest three
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["size_bytes"] <= 900
+    assert cache.get("key4") is not None
+    assert cache.get("key0") is None
+
+def test_entries_survive_reopening(tmp_path, monkeypatch):
+    make_cache(tmp_path, monkeypatch).put("key", [1, 2])
+    assert make_cache(tmp_path, monkeypatch).get("key") == [1, 2]
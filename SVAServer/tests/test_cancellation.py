@@ -0,0 +1,69 @@
+import os
+import time
+import httpx
+import pytest
+
+def syntax(text="clk"):
+    return {"impl": f"module m(input clk); assert property (@(posedge clk) {text}); endmodule"}
+
+@pytest.fixture
+def server(processes):
+    # One worker: a task that is not cancelled blocks the next one for time_limit seconds
+    return processes.server(max_workers=1, result_cache=False, env={"JG_STUB_HANG": "HANG_HERE"})
+
+def running_stubs(root):
+    # jg_stub processes started for the tasks of this test, their work dirs are under `root`
+    stubs = []
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().decode(errors="replace")
+        except OSError:
+            continue
+        if "jg_stub.py" in cmdline and str(root) in cmdline:
+            stubs.append(int(pid))
+    return stubs
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.1)
+
+def assert_slot_is_free(server):
+    start = time.time()
+    assert httpx.post(server + "/syntax", json=syntax(), timeout=60).json()["syntax"]
+    assert time.time() - start < 10
+
+def test_deadline_cancels_the_running_task(processes, server):
+    start = time.time()
+    response = httpx.post(server + "/syntax", json=syntax("HANG_HERE"), headers={"X-Deadline": "1"}, timeout=60)
+    assert response.status_code == 504
+    assert time.time() - start < 5
+    wait_for(lambda: not running_stubs(processes.root))
+    assert processes.metric(server, "sva_tasks_cancelled_total") == 1
+    assert_slot_is_free(server)
+
+def test_disconnect_cancels_the_running_task(processes, server):
+    with pytest.raises(httpx.ReadTimeout):
+        httpx.post(server + "/syntax", json=syntax("HANG_HERE"), timeout=httpx.Timeout(60, read=1))
+    wait_for(lambda: processes.metric(server, "sva_tasks_cancelled_total") == 1)
+    wait_for(lambda: not running_stubs(processes.root))
+    assert_slot_is_free(server)
+
+def test_queued_task_past_its_deadline_never_runs(processes, server):
+    # The job holds the only worker, the request expires in the queue
+    job_id = httpx.post(server + "/jobs", json={"endpoint": "/syntax", "payload": syntax("HANG_HERE")}, timeout=60).json()["job_id"]
+    wait_for(lambda: running_stubs(processes.root))
+    response = httpx.post(server + "/syntax", json=syntax("clk || HANG_HERE"), headers={"X-Deadline": "0.5"}, timeout=60)
+    assert response.status_code == 504
+    # Deleting the job cancels its task
+    httpx.delete(f"{server}/jobs/{job_id}", timeout=60)
+    wait_for(lambda: processes.metric(server, "sva_tasks_cancelled_total") == 2)
+    assert_slot_is_free(server)
+    # Only the job and the last request started the tool
+    assert processes.metric(server, "sva_tool_runs_total") == 2
+
+def test_deadline_must_be_a_number(server):
+    response = httpx.post(server + "/syntax", json=syntax(), headers={"X-Deadline": "soon"}, timeout=60)
+    assert response.status_code == 400
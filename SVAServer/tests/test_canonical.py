@@ -0,0 +1,54 @@
+from Canonical import canonical
+import Utils
+
+CLK = "assert property (@(posedge clk) {});"
+
+def same(a, b, *widths):
+    return canonical(CLK.format(a), *widths) == canonical(CLK.format(b), *widths)
+
+def test_label_and_whitespace_are_ignored():
+    assert canonical("a1: " + CLK.format("a  |->  b")) == canonical(CLK.format("(a) |-> (b)"))
+
+def test_commutative_operands_are_sorted():
+    assert same("req && ack |-> gnt", "ack && req |-> gnt")
+    assert same("(a || b) || c |-> d", "c || (b || a) |-> d")
+    assert not same("a |-> b", "b |-> a")
+
+def test_non_overlapping_implication():
+    assert same("a |=> b", "a |-> ##1 b")
+    assert same("a |=> ##1 b", "a |-> ##2 b")
+    assert same("a |-> ##0 b", "a |-> b")
+
+def test_greater_than_is_mirrored():
+    assert same("cnt > 3 |-> full", "3 < cnt |-> full")
+
+def test_case_equality_of_one_bit_signals():
+    assert same("a === b |-> c", "a == b |-> c", {"a", "b"})
+    assert not same("a === b |-> c", "a == b |-> c", {"a"})
+
+def test_single_index_is_one_bit_only_for_vectors():
+    assert same("v[0] === a |-> c", "v[0] == a |-> c", {"a"}, {"v"})
+    # m is not a vector, m[0] may select a whole element
+    assert not same("m[0] === a |-> c", "m[0] == a |-> c", {"a"}, {"v"})
+
+def test_unsupported_input_has_no_form():
+    assert canonical(CLK.format("a |-> b dist {0 := 1}")) is None
+    assert canonical("assert property (a |->") is None
+
+def test_vector_names():
+    code = """
+    module tb(input logic clk, input logic [7:0] v, w);
+        logic [3:0][1:0] m;
+        reg [1:0] mem [0:3];
+        wire one;
+    endmodule
+    """
+    assert Utils.vector_names(code) == {"v", "w"}
+
+def test_case_equality_with_unknown_literals_is_kept():
+    # `a !== 1'bx` is 4-state, `a != 1'bx` is always X
+    assert not same("a !== 1'bx", "a != 1'bx", {"a"})
+    assert not same("a === 1'bz", "a == 1'bz", {"a"})
+    assert not same("a === 1'b?", "a == 1'b?", {"a"})
+    assert not same("v[1'bx] === 1'b0", "v[1'bx] == 1'b0", set(), {"v"})
+    assert same("a !== 1'b1", "a != 1'b1", {"a"})
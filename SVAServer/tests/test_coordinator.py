@@ -0,0 +1,92 @@
+import re
+import json
+import time
+import httpx
+import pytest
+import Coordinator
+
+def syntax_item(i, broken=False):
+    impl = f"module m{i}(input clk); assert property (@(posedge clk) {'STUB_SYNTAX_ERROR' if broken else 'clk'}); endmodule"
+    return {"endpoint": "/syntax", "payload": {"impl": impl}}
+
+@pytest.fixture
+def cluster(processes):
+    backends = [processes.server(), processes.server()]
+    return processes.coordinator(backends), backends
+
+def requests_to(processes, url, path):
+    return len(re.findall(rf'"POST {re.escape(path)} HTTP', processes.log(url)))
+
+def test_batch_is_sent_as_one_batch_per_backend(processes, cluster):
+    coordinator, backends = cluster
+    items = [syntax_item(i, broken=i % 3 == 0) for i in range(8)]
+    results = httpx.post(coordinator + "/batch", json=items, timeout=60).json()
+    assert [result["syntax"] for result in results] == [i % 3 != 0 for i in range(8)]
+    # Both backends took part of the batch, each of them in a single request
+    assert [requests_to(processes, backend, "/batch") for backend in backends] == [1, 1]
+    assert all(requests_to(processes, backend, "/syntax") == 0 for backend in backends)
+
+def test_batch_stream_keeps_the_item_indices(cluster):
+    coordinator, _ = cluster
+    items = [syntax_item(i, broken=i == 2) for i in range(5)]
+    with httpx.stream("POST", coordinator + "/batch/stream", json=items, timeout=60) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    results = {line["index"]: line["result"] for line in lines}
+    assert sorted(results) == list(range(5))
+    assert [results[i]["syntax"] for i in range(5)] == [i != 2 for i in range(5)]
+
+def test_jobs_are_routed_back_to_their_backend(cluster):
+    coordinator, _ = cluster
+    job_ids = httpx.post(coordinator + "/jobs", json=[syntax_item(i) for i in range(4)], timeout=60).json()["job_ids"]
+    assert {job_id.split(".")[0] for job_id in job_ids} == {"0", "1"}
+    jobs = httpx.post(coordinator + "/jobs/poll", json={"job_ids": job_ids, "wait": 0}, timeout=60).json()["jobs"]
+    deadline = time.time() + 30
+    while any(job["status"] != "done" for job in jobs) and time.time() < deadline:
+        jobs = httpx.post(coordinator + "/jobs/poll", json={"job_ids": job_ids, "wait": 5}, timeout=60).json()["jobs"]
+    assert [job["job_id"] for job in jobs] == job_ids
+    assert all(job["status"] == "done" for job in jobs)
+    job = httpx.get(f"{coordinator}/jobs/{job_ids[0]}", timeout=60).json()
+    assert job["job_id"] == job_ids[0] and job["result"]["syntax"]
+
+def test_draining_backend_is_skipped(processes, cluster):
+    coordinator, backends = cluster
+    httpx.post(backends[0] + "/admin/drain", timeout=60)
+    time.sleep(1.5)
+    results = httpx.post(coordinator + "/batch", json=[syntax_item(i) for i in range(4)], timeout=60).json()
+    assert all(result["syntax"] for result in results)
+    assert requests_to(processes, backends[0], "/batch") == 0
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    def fake_backends(*busy_for):
+        backends = []
+        for seconds in busy_for:
+            backend = Coordinator.Backend(f"http://backend{len(backends)}")
+            backend.healthy = True
+            backend.max_workers = 8
+            backend.busy_until = time.time() + seconds if seconds else 0.0
+            backends.append(backend)
+        monkeypatch.setattr(Coordinator, "backends", backends, raising=False)
+        monkeypatch.setattr(Coordinator, "hash_ring", Coordinator.HashRing(backends, 16), raising=False)
+        monkeypatch.setattr(Coordinator, "LOAD_SLACK", 0.25, raising=False)
+        monkeypatch.setattr(Coordinator, "PROBE_INTERVAL", 2, raising=False)
+        return backends
+    return fake_backends
+
+def test_retry_after_of_saturated_backends_only(fake_backends):
+    fake_backends(0, 30, 60)
+    response = Coordinator.busy_response("busy")
+    assert 29 <= int(response.headers["Retry-After"]) <= 30
+    fake_backends(0, 0)
+    assert Coordinator.busy_response("busy").headers["Retry-After"] == "2"
+
+def test_plan_batch_groups_items_per_backend(fake_backends):
+    backends = fake_backends(0, 0)
+    items = [{"payload": {"tb": f"design {i % 2}"}} for i in range(4)] + [{"payload": {}}]
+    groups = Coordinator.plan_batch(items)
+    assert sorted(index for _, indices in groups for index in indices) == list(range(5))
+    assert all(indices == sorted(indices) for _, indices in groups)
+    assert all(backend.inflight == 0 for backend in backends)
+    # Items on one design go to one backend, as long as it is not overloaded
+    backend_of = {index: order[0] for order, indices in groups for index in indices}
+    assert backend_of[0] is backend_of[2] and backend_of[1] is backend_of[3]
@@ -0,0 +1,74 @@
+import time
+import multiprocessing
+import pytest
+import Designs
+import Executor
+
+TB = "module tb(input clk, input tb_reset, input [3:0] data);\nendmodule\n"
+
+@pytest.fixture
+def design_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(Designs, "design_cache", None)
+    monkeypatch.setattr(Designs, "cache_pid", None)
+    monkeypatch.setattr(Designs, "cache_config", None)
+    Designs.configure(str(tmp_path / "designs.db"), 1000, 1 << 30)
+    return tmp_path
+
+def computed_in(log_path, value, delay=0.0):
+    # compute() for memoize() that leaves a line in `log_path` for every call, from any process
+    def compute():
+        with open(log_path, "a") as f:
+            f.write("computed\n")
+        time.sleep(delay)
+        return value
+    return compute
+
+def computations(log_path):
+    return log_path.read_text().count("computed") if log_path.exists() else 0
+
+def test_computed_once_per_design_and_version(design_cache):
+    log_path = design_cache / "calls.log"
+    assert Designs.memoize("declarations", TB, 1, computed_in(log_path, {"n": 1})) == {"n": 1}
+    assert Designs.memoize("declarations", TB, 1, computed_in(log_path, {"n": 2})) == {"n": 1}
+    assert computations(log_path) == 1
+    # Another version, design or namespace is another entry
+    assert Designs.memoize("declarations", TB, 2, computed_in(log_path, {"n": 3})) == {"n": 3}
+    assert Designs.memoize("declarations", TB + "// v2\n", 1, computed_in(log_path, {"n": 4})) == {"n": 4}
+    assert Designs.memoize("testbench", TB, 1, computed_in(log_path, {"n": 5})) == {"n": 5}
+    assert computations(log_path) == 4
+
+def test_failed_runs_are_not_stored(design_cache):
+    log_path = design_cache / "calls.log"
+    assert Designs.memoize("declarations", TB, 1, computed_in(log_path, None)) is None
+    assert Designs.memoize("declarations", TB, 1, computed_in(log_path, {"n": 1})) == {"n": 1}
+    assert computations(log_path) == 2
+
+def memoize_in_worker(log_path):
+    return Designs.memoize("declarations", TB, 1, computed_in(log_path, {"n": 1}, delay=0.5))
+
+def test_concurrent_workers_compute_once(design_cache):
+    log_path = design_cache / "calls.log"
+    # Opened in the parent before the fork, like the server's first request, the workers open their own
+    Designs.get_cache()
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.map(memoize_in_worker, [log_path] * 4)
+    assert results == [{"n": 1}] * 4
+    assert computations(log_path) == 1
+    assert Designs.memoize("declarations", TB, 1, computed_in(log_path, {"n": 2})) == {"n": 1}
+
+def test_unconfigured_cache_always_computes(tmp_path):
+    log_path = tmp_path / "calls.log"
+    Designs.memoize("declarations", TB, 1, computed_in(log_path, {"n": 1}))
+    Designs.memoize("declarations", TB, 1, computed_in(log_path, {"n": 1}))
+    assert computations(log_path) == 2
+
+def test_signal_list_runs_yosys_once_per_testbench(design_cache, monkeypatch):
+    calls = []
+    def declaration_index(code, work_dir):
+        calls.append(code)
+        variables = [{"name": "clk", "width": 1}, {"name": "tb_reset", "width": 1}, {"name": "data", "width": 4}]
+        return {"variables": variables, "parameters": [], "local_params": []}
+    monkeypatch.setattr(Executor, "declaration_index", declaration_index)
+    for sample in range(3):
+        assert Executor.infer_signal_list({"tb": TB, "asrt": f"sample {sample}"}, str(design_cache)) == "clk, tb_reset, [3:0] data"
+    assert calls == [TB]
@@ -0,0 +1,49 @@
+import time
+import httpx
+
+def syntax_item(i):
+    return {"endpoint": "/syntax", "payload": {"impl": f"module m{i}(input clk); assert property (@(posedge clk) clk); endmodule"}}
+
+def start(processes, tmp_path, **overrides):
+    # Consecutive servers share the journal, like one server restarted
+    config = {"max_workers": 1, "result_cache": False, "journal_path": str(tmp_path / "journal.db")}
+    return processes.server(env={"JG_STUB_DELAY": "1"}, **config | overrides)
+
+def wait_jobs(server, job_ids, timeout=30):
+    deadline = time.time() + timeout
+    while True:
+        jobs = httpx.post(server + "/jobs/poll", json={"job_ids": job_ids, "wait": 5}, timeout=60).json()["jobs"]
+        if all(job["status"] != "pending" for job in jobs) or time.time() > deadline:
+            return jobs
+
+def test_drained_jobs_finish_after_the_restart(processes, tmp_path):
+    server = start(processes, tmp_path, drain_exit=True)
+    job_ids = httpx.post(server + "/jobs", json=[syntax_item(i) for i in range(3)], timeout=60).json()["job_ids"]
+    time.sleep(0.3)
+    drained = httpx.post(server + "/admin/drain", timeout=60).json()
+    assert drained == {"draining": True, "spilled": 2, "running": 1}
+    response = httpx.post(server + "/syntax", json=syntax_item(3)["payload"], timeout=60)
+    assert response.status_code == 503 and int(response.headers["Retry-After"]) > 0
+    # Spilled jobs stay pending until they run again
+    assert [job["status"] for job in wait_jobs(server, job_ids[1:], timeout=0)] == ["pending", "pending"]
+    # Exits by itself once the running task is done, uvicorn re-raises the SIGTERM it stopped on
+    process, _ = processes.running.pop(server)
+    process.wait(30)
+
+    restarted = start(processes, tmp_path)
+    jobs = wait_jobs(restarted, job_ids)
+    assert [job["status"] for job in jobs] == ["done"] * 3
+    assert all(job["result"]["syntax"] for job in jobs)
+    assert processes.metric(restarted, "sva_replayed_total") == 2
+    # The finished job came from the journal, only the spilled ones ran again
+    assert processes.metric(restarted, "sva_tool_runs_total") == 2
+
+def test_queued_tasks_survive_a_plain_shutdown(processes, tmp_path):
+    server = start(processes, tmp_path)
+    job_ids = httpx.post(server + "/jobs", json=[syntax_item(i) for i in range(4)], timeout=60).json()["job_ids"]
+    time.sleep(0.3)
+    processes.stop(server)
+    restarted = start(processes, tmp_path)
+    jobs = wait_jobs(restarted, job_ids)
+    assert [job["status"] for job in jobs] == ["done"] * 4
+    assert processes.metric(restarted, "sva_replayed_total") == 3
@@ -0,0 +1,54 @@
+import httpx
+import pytest
+from Executor import equal_multi_pairs
+
+TB = "module tb(input clk, input tb_reset, input a, input b, input c);\nendmodule\n"
+
+def assertion(consequent):
+    return f"asrt: assert property (@(posedge clk) disable iff (tb_reset) a |-> {consequent});"
+
+def payload(asrts, **fields):
+    return {"tb": TB, "key_signal": "tb_reset", "signal_list": "clk tb_reset a b c", "asrts": asrts} | fields
+
+def test_pairs():
+    assert equal_multi_pairs({"asrts": ["x", "y", "z"]}) == [(0, 1), (0, 2), (1, 2)]
+    assert equal_multi_pairs({"asrts": ["x", "y"], "ref_asrt": "r"}) == [(0, None), (1, None)]
+    assert equal_multi_pairs({"asrts": ["x", "y"], "pairs": [[1, 0], ["0", 1]]}) == [(1, 0), (0, 1)]
+    with pytest.raises(ValueError, match="out of range"):
+        equal_multi_pairs({"asrts": ["x", "y"], "pairs": [[0, 2]]})
+    with pytest.raises(ValueError, match="index pairs"):
+        equal_multi_pairs({"asrts": ["x", "y"], "pairs": [[0]]})
+    with pytest.raises(ValueError, match="list of asrts"):
+        equal_multi_pairs({"asrts": "x"})
+
+@pytest.fixture
+def server(processes):
+    return processes.server(time_limit=1, env={"JG_STUB_HANG": "HANG_HERE"})
+
+def test_pairs_are_checked(server):
+    asrts = [assertion("b"), assertion("b"), assertion("c")]
+    result = httpx.post(server + "/equal_multi", json=payload(asrts), timeout=60).json()
+    pairs = {(pair["asrt"], pair["ref_asrt"]): pair for pair in result["pairs"]}
+    assert all(pair["checked"] for pair in pairs.values())
+    assert pairs[0, 1]["functionality"] == 1.0
+    assert pairs[0, 2]["syntax"] and not pairs[0, 2]["functionality"]
+
+def test_pairs_out_of_range_are_rejected(server):
+    body = payload([assertion("b"), assertion("c")], pairs=[[0, 5]])
+    response = httpx.post(server + "/equal_multi", json=body, timeout=60)
+    assert response.status_code == 400
+    assert "out of range" in response.json()["error"]
+    response = httpx.post(server + "/batch", json=[{"endpoint": "/equal_multi", "payload": body}], timeout=60)
+    assert response.status_code == 400
+    assert response.json()["error"].startswith("Batch item 0:")
+
+def test_pairs_not_reached_are_not_checked(server):
+    asrts = [assertion("b"), assertion("b"), assertion("HANG_HERE")]
+    result = httpx.post(server + "/equal_multi", json=payload(asrts), timeout=60).json()
+    pairs = {(pair["asrt"], pair["ref_asrt"]): pair for pair in result["pairs"]}
+    # Decided without JasperGold before the run timed out
+    assert pairs[0, 1]["checked"] and pairs[0, 1]["functionality"]
+    for key in ((0, 2), (1, 2)):
+        assert pairs[key] | {"asrt": None, "ref_asrt": None} == {
+            "asrt": None, "ref_asrt": None, "checked": False, "syntax": None, "functionality": None, "func_relaxed": None,
+        }
@@ -0,0 +1,50 @@
+import httpx
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+def syntax(i, text="clk"):
+    return {"impl": f"module m{i}(input clk); assert property (@(posedge clk) {text}); endmodule"}
+
+@pytest.fixture
+def server(processes):
+    # Without the result cache only coalescing and idempotency keys can avoid running a task again
+    return processes.server(result_cache=False, env={"JG_STUB_DELAY": "1"})
+
+def post_together(server, bodies, headers=None):
+    with ThreadPoolExecutor(len(bodies)) as pool:
+        responses = pool.map(lambda body: httpx.post(server + "/syntax", json=body, headers=headers, timeout=60), bodies)
+        return [response.json() for response in responses]
+
+def test_identical_requests_share_one_run(processes, server):
+    results = post_together(server, [syntax(0)] * 3)
+    assert all(result == results[0] for result in results)
+    assert processes.metric(server, "sva_coalesced_total") == 2
+    assert processes.metric(server, "sva_tool_runs_total") == 1
+
+def test_different_requests_run_on_their_own(processes, server):
+    post_together(server, [syntax(0), syntax(1)])
+    assert processes.metric(server, "sva_coalesced_total") == 0
+    assert processes.metric(server, "sva_tool_runs_total") == 2
+
+def test_retry_with_idempotency_key_attaches_to_the_first_run(processes, server):
+    headers = {"Idempotency-Key": "sample-1"}
+    first = httpx.post(server + "/syntax", json=syntax(0), headers=headers, timeout=60).json()
+    # Even after the task finished, and without the result cache
+    retry = httpx.post(server + "/syntax", json=syntax(0), headers=headers, timeout=60).json()
+    assert retry == first
+    assert processes.metric(server, "sva_idempotent_replays_total") == 1
+    assert processes.metric(server, "sva_tool_runs_total") == 1
+    httpx.post(server + "/syntax", json=syntax(0), timeout=60)
+    assert processes.metric(server, "sva_tool_runs_total") == 2
+
+def test_retried_job_submission_returns_the_same_job(processes, server):
+    headers = {"Idempotency-Key": "jobs-1"}
+    items = [{"endpoint": "/syntax", "payload": syntax(i)} for i in range(2)]
+    first = httpx.post(server + "/jobs", json=items, headers=headers, timeout=60).json()["job_ids"]
+    retry = httpx.post(server + "/jobs", json=items, headers=headers, timeout=60).json()["job_ids"]
+    assert retry == first and len(set(first)) == 2
+    jobs = httpx.post(server + "/jobs/poll", json={"job_ids": first, "wait": 30}, timeout=60).json()["jobs"]
+    while any(job["status"] == "pending" for job in jobs):
+        jobs = httpx.post(server + "/jobs/poll", json={"job_ids": first, "wait": 30}, timeout=60).json()["jobs"]
+    assert processes.metric(server, "sva_idempotent_replays_total") == 2
+    assert processes.metric(server, "sva_tool_runs_total") == 2
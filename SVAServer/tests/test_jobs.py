@@ -0,0 +1,58 @@
+import time
+import asyncio
+import httpx
+import pytest
+import Jobs
+
+def syntax_item(i, text="clk"):
+    return {"endpoint": "/syntax", "payload": {"impl": f"module m{i}(input clk); assert property (@(posedge clk) {text}); endmodule"}}
+
+@pytest.fixture
+def server(processes):
+    return processes.server(env={"JG_STUB_HANG": "HANG_HERE"})
+
+def test_submit_and_fetch_one_job(server):
+    job_id = httpx.post(server + "/jobs", json=syntax_item(0), timeout=60).json()["job_id"]
+    job = httpx.get(f"{server}/jobs/{job_id}", params={"wait": 30}, timeout=60).json()
+    assert job["job_id"] == job_id and job["status"] == "done"
+    assert job["result"]["syntax"]
+
+def test_poll_many_jobs(server):
+    items = [syntax_item(i, "STUB_SYNTAX_ERROR" if i == 2 else "clk") for i in range(3)]
+    job_ids = httpx.post(server + "/jobs", json=items, timeout=60).json()["job_ids"]
+    deadline = time.time() + 30
+    jobs = []
+    while time.time() < deadline:
+        jobs = httpx.post(server + "/jobs/poll", json={"job_ids": job_ids, "wait": 5}, timeout=60).json()["jobs"]
+        if all(job["status"] == "done" for job in jobs):
+            break
+    assert [job["job_id"] for job in jobs] == job_ids
+    assert [job["result"]["syntax"] for job in jobs] == [True, True, False]
+
+def test_pending_job_can_be_deleted(server):
+    job_id = httpx.post(server + "/jobs", json=syntax_item(0, "HANG_HERE"), timeout=60).json()["job_id"]
+    start = time.time()
+    job = httpx.get(f"{server}/jobs/{job_id}", params={"wait": 1}, timeout=60).json()
+    assert job["status"] == "pending" and time.time() - start >= 1
+    assert httpx.delete(f"{server}/jobs/{job_id}", timeout=60).json() == {"deleted": True}
+    assert httpx.get(f"{server}/jobs/{job_id}", timeout=60).status_code == 404
+
+def test_unknown_jobs(server):
+    assert httpx.get(f"{server}/jobs/nope", timeout=60).status_code == 404
+    jobs = httpx.post(server + "/jobs/poll", json={"job_ids": ["nope"]}, timeout=60).json()["jobs"]
+    assert jobs == [{"job_id": "nope", "status": "unknown"}]
+    assert httpx.delete(f"{server}/jobs/nope", timeout=60).json() == {"deleted": False}
+
+def test_finished_jobs_expire_after_ttl(monkeypatch):
+    async def run():
+        store = Jobs.JobStore(ttl=10)
+        finished, running = asyncio.Future(), asyncio.Future()
+        finished_id, running_id = store.add(finished), store.add(running)
+        finished.set_result({"ok": True})
+        await asyncio.sleep(0)
+        now = time.time()
+        monkeypatch.setattr(Jobs.time, "time", lambda: now + 11)
+        assert store.expire() == 1
+        assert store.get(finished_id) is None
+        assert store.status(running_id, str) == {"job_id": running_id, "status": "pending"}
+    asyncio.run(run())
@@ -0,0 +1,24 @@
+import Journal
+
+def test_pending_tasks_are_replayed_in_order(tmp_path):
+    path = str(tmp_path / "journal.db")
+    Journal.TaskJournal(path).spill_tasks([
+        ({"asrt": "a"}, "/equal", 1, "alice", ["job-1"]),
+        ({"impl": "module m; endmodule"}, "/syntax", 0, "bob", []),
+    ])
+    # A new journal on the same file, like the server after a restart
+    journal = Journal.TaskJournal(path)
+    pending = journal.pending_tasks()
+    assert [task[1:] for task in pending] == [
+        ({"asrt": "a"}, "/equal", 1, "alice", ["job-1"]),
+        ({"impl": "module m; endmodule"}, "/syntax", 0, "bob", []),
+    ]
+    journal.remove_task(pending[0][0])
+    assert [task[2] for task in journal.pending_tasks()] == ["/syntax"]
+
+def test_job_results_are_popped_once(tmp_path):
+    path = str(tmp_path / "journal.db")
+    Journal.TaskJournal(path).save_jobs([("job-1", {"ok": True}, 100.0), ("job-2", {"ok": False}, 200.0)])
+    journal = Journal.TaskJournal(path)
+    assert sorted(journal.pop_jobs()) == [("job-1", {"ok": True}, 100.0), ("job-2", {"ok": False}, 200.0)]
+    assert journal.pop_jobs() == []
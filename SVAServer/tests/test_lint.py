@@ -0,0 +1,35 @@
+import Lint
+
+def test_valid_assertion_has_no_problems():
+    assert Lint.lint("asrt: assert property (@(posedge clk) disable iff (rst) req |-> ##[1:3] ack);") == []
+
+def test_empty_assertion():
+    assert Lint.lint("  \n") == ["empty assertion"]
+
+def test_leftover_fence():
+    assert Lint.lint("```systemverilog\nassert property (a |-> b);\n```") == [
+        "line 1: leftover markdown fence",
+        "line 3: leftover markdown fence",
+    ]
+
+def test_unbalanced_brackets():
+    assert Lint.lint("assert property (a |-> b;") == ["line 1: unclosed '('"]
+    assert Lint.lint("assert property (a |-> b[0)];") == ["line 1: ')' closes '[' of line 1"]
+    assert Lint.lint("assert property a |-> b);") == ["line 1: unmatched ')'"]
+
+def test_missing_operand():
+    assert Lint.lint("assert property (a |-> );") == ["line 1: '|->' without a right operand"]
+    assert Lint.lint("assert property (&& b);") == ["line 1: '&&' without a left operand"]
+    # `##` can start a sequence
+    assert Lint.lint("assert property (##1 b);") == []
+
+def test_undeclared_names():
+    scope = "module tb(input clk, input req); endmodule"
+    text = "asrt: assert property (@(posedge clk) req |-> $past(ack));"
+    assert Lint.undeclared(text, scope) == ["line 1: 'ack' is not declared"]
+    assert Lint.undeclared(text, scope, ["ack"]) == []
+
+def test_undeclared_names_with_imports():
+    text = "assert property (@(posedge clk) req |-> pkg_ack);"
+    assert Lint.undeclared(text, "import pkg::*;\nmodule tb; endmodule") == []
+    assert Lint.undeclared(text, "`include \"defs.svh\"\nmodule tb; endmodule") == []
@@ -0,0 +1,60 @@
+import Reports
+
+def test_stream_keeps_verdict_lines_and_stops_on_final():
+    stream = Reports.ReportStream.for_verdict(Reports.VERIFY_VERDICT)
+    assert not stream.feed(b"INFO: elaborating\ntimes: 0.1 0.2\nproperties: tb.a")
+    # The echo of the `puts` command is matched but not final
+    assert not stream.feed(b" tb.b\nputs \"proofs: $x\"\n")
+    assert stream.feed(b"proofs: proven cex\nreport\n")
+    assert stream.matched == ["times: 0.1 0.2", "properties: tb.a tb.b", "puts \"proofs: $x\"", "proofs: proven cex"]
+
+def test_stream_matches_last_line_on_close():
+    stream = Reports.ReportStream.for_verdict(Reports.EQUAL_VERDICT)
+    stream.feed(b"INFO\nFull equivalence")
+    assert not stream.done
+    assert stream.close()
+    assert stream.matched_text() == "Full equivalence"
+
+def test_stream_keeps_sections():
+    stream = Reports.ReportStream.for_verdict(Reports.COVERAGE_VERDICT)
+    stream.feed(b"noise\n### UNDETECTABLE_START ###\n{a b} c\n### UNDETECTABLE_END ###\nmore noise\n")
+    assert stream.matched == ["### UNDETECTABLE_START ###", "{a b} c", "### UNDETECTABLE_END ###"]
+    assert Reports.parse_coverage(stream.matched_text())["undetectable"] == ["a b", "c"]
+
+def test_report_keeps_head_and_tail():
+    stream = Reports.ReportStream(max_bytes=8)
+    for chunk in (b"0123", b"456789", b"abcdef"):
+        stream.feed(chunk)
+    assert stream.report() == "0123" + Reports.TRUNCATED_MARKER.format(8) + "cdef"
+
+def test_short_report_is_kept_whole():
+    stream = Reports.ReportStream(max_bytes=100)
+    stream.feed(b"line 1\nline 2\n")
+    assert stream.report() == "line 1\nline 2\n"
+
+def test_parse_properties():
+    text = "properties: tb.a tb.b\ntimes: 0.25 {time 1.5 s}\nproofs: proven cex"
+    assert Reports.parse_properties(text) == [
+        {"name": "tb.a", "status": "proven", "time": 0.25},
+        {"name": "tb.b", "status": "cex", "time": 1.5},
+    ]
+    # Names and times that do not line up with the statuses are dropped
+    assert Reports.parse_properties("properties: tb.a\ntimes: - 2\nproofs: proven cex") == [
+        {"name": None, "status": "proven", "time": None},
+        {"name": None, "status": "cex", "time": 2.0},
+    ]
+    assert Reports.parse_properties("proofs: proven") == [{"name": None, "status": "proven", "time": None}]
+
+def test_split_pairs_keeps_finished_pairs():
+    text = "\n".join([
+        "@@SHARED_ELABORATION 1",
+        "@@PAIR_START 0", "Full equivalence", "@@PAIR_END 0",
+        "@@PAIR_START 2", "implies", "implies", "@@PAIR_END 2",
+        "@@PAIR_START 3", "syntax error",
+    ])
+    assert Reports.split_pairs(text) == {0: "Full equivalence\n", 2: "implies\nimplies\n"}
+    assert Reports.shared_elaboration(text) is True
+
+def test_shared_elaboration():
+    assert Reports.shared_elaboration("@@SHARED_ELABORATION 0\n@@PAIR_START 0") is False
+    assert Reports.shared_elaboration("syntax error") is None
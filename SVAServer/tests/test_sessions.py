@@ -0,0 +1,111 @@
+import os
+import sys
+import signal
+import threading
+import subprocess
+import pytest
+import Sessions
+
+STUB    = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "jg_stub.py")
+COMMAND = [sys.executable, STUB, "-fpv", "-no_gui"]
+EQUAL   = "tcls/equality_check.tcl"
+SYNTAX  = "tcls/syntax_check.tcl"
+
+@pytest.fixture
+def make_pool(tmp_path):
+    pools = []
+
+    def make_pool(max_tasks=100, startup_timeout=10, command=COMMAND):
+        pool = Sessions.SessionPool(command, 1, max_tasks, tmp_path / "sessions", startup_timeout)
+        pools.append(pool)
+        return pool
+    yield make_pool
+    for pool in pools:
+        pool.close()
+
+def equal(pool, lm, ref, timeout=10):
+    return pool.run(EQUAL, {"LM_ASSERT_TEXT": lm, "REF_ASSERT_TEXT": ref}, timeout)
+
+def session_pid(pool):
+    # Pid of the idle session the next task gets, waits for a replacement that is still starting
+    session = pool._idle.get()
+    pool._idle.put(session)
+    return session.process.pid
+
+def test_tasks_share_a_session(make_pool):
+    pool = make_pool()
+    returncode, report = equal(pool, "a |-> b", "a|->b")
+    assert returncode == 0 and "Full equivalence" in report
+    pid = session_pid(pool)
+    returncode, report = equal(pool, "a |-> b", "b |-> a")
+    assert returncode == 0 and "No equivalence" in report
+    assert session_pid(pool) == pid
+
+def test_defines_reach_the_script_verbatim(make_pool):
+    pool = make_pool()
+    text = 'a |-> $past(b) && c[0] == "x\\y"\n'
+    assert "Full equivalence" in equal(pool, text, text)[1]
+
+def test_failed_script_keeps_the_session(make_pool, tmp_path):
+    pool = make_pool()
+    sva = tmp_path / "sva.sva"
+    sva.write_text("assert property (STUB_SYNTAX_ERROR);")
+    equal(pool, "a", "a")
+    pid = session_pid(pool)
+    returncode, report = pool.run(SYNTAX, {"SVA_PATH": str(sva)}, 10)
+    assert returncode == 1 and "syntax error" in report
+    assert session_pid(pool) == pid
+    assert "Full equivalence" in equal(pool, "a", "a")[1]
+
+def test_hanging_task_times_out_and_is_replaced(make_pool, monkeypatch):
+    monkeypatch.setenv("JG_STUB_HANG", "HANG_HERE")
+    pool = make_pool()
+    equal(pool, "a", "a")
+    pid = session_pid(pool)
+    with pytest.raises(subprocess.TimeoutExpired):
+        equal(pool, "HANG_HERE", "a", timeout=0.5)
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+    assert session_pid(pool) != pid
+    assert "Full equivalence" in equal(pool, "a", "a")[1]
+
+def test_session_is_recycled_after_max_tasks(make_pool):
+    pool = make_pool(max_tasks=2)
+    equal(pool, "a", "a")
+    first = session_pid(pool)
+    equal(pool, "a", "a")
+    second = session_pid(pool)
+    assert second != first
+    equal(pool, "a", "a")
+    assert session_pid(pool) == second
+
+def test_tool_exiting_during_a_task_is_replaced(make_pool, monkeypatch):
+    monkeypatch.setenv("JG_STUB_HANG", "HANG_HERE")
+    pool = make_pool()
+    equal(pool, "a", "a")
+    pid = session_pid(pool)
+    threading.Timer(0.3, os.killpg, (pid, signal.SIGKILL)).start()
+    with pytest.raises(Sessions.SessionError):
+        equal(pool, "HANG_HERE", "a")
+    assert session_pid(pool) != pid
+    assert "Full equivalence" in equal(pool, "a", "a")[1]
+
+def test_session_killed_while_idle_is_replaced(make_pool):
+    pool = make_pool()
+    equal(pool, "a", "a")
+    pid = session_pid(pool)
+    os.killpg(pid, signal.SIGKILL)
+    # Like a cancelled task, whose session is dead by the time the next task starts
+    pool._idle.queue[-1].process.wait()
+    assert "Full equivalence" in equal(pool, "a", "a")[1]
+    assert session_pid(pool) != pid
+
+def test_slow_startup_fails_the_task(make_pool, monkeypatch):
+    monkeypatch.setenv("JG_STUB_STARTUP", "5")
+    pool = make_pool(startup_timeout=0.5)
+    with pytest.raises(subprocess.TimeoutExpired):
+        equal(pool, "a", "a")
+
+def test_parse_jg_command():
+    command = ["jg", "-fpv", "-batch", "-tcl", EQUAL, "-define", "LM_ASSERT_TEXT", "a b", "-allow_unsupported_OS"]
+    assert Sessions.parse_jg_command(command) == (EQUAL, {"LM_ASSERT_TEXT": "a b"})
@@ -0,0 +1,43 @@
+import pytest
+import Designs
+import Executor
+
+IMPL = "module dut(input clk, input rst_n, input a, output reg b);\nalways @(posedge clk) b <= a;\nendmodule\n"
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    # Counts the runs of the testbench generator, which needs Yosys
+    monkeypatch.setattr(Designs, "design_cache", None)
+    monkeypatch.setattr(Designs, "cache_pid", None)
+    monkeypatch.setattr(Designs, "cache_config", None)
+    Designs.configure(str(tmp_path / "designs.db"), 1000, 1 << 30)
+    calls = []
+    def generate_testbench(impl, work_dir):
+        calls.append(impl)
+        if "broken" in impl:
+            raise RuntimeError("Yosys failed")
+        return {"testbench": f"module tb_{len(calls)}();\nendmodule\n", "top_name": "dut", "clk": "clk", "reset": "rst_n", "reset_polarity": 0}
+    monkeypatch.setattr(Executor, "generate_testbench", generate_testbench)
+    return calls
+
+def test_testbench_is_generated_once_per_design(generator, tmp_path):
+    first = Executor.testbench_generate({"impl": IMPL}, str(tmp_path))
+    assert first == {
+        "ok": True, "testbench": "module tb_1();\nendmodule\n", "top_name": "dut", "clk": "clk", "reset": "rst_n", "reset_polarity": 0,
+    }
+    assert Executor.testbench_generate({"impl": IMPL}, str(tmp_path)) == first
+    assert generator == [IMPL]
+    Executor.testbench_generate({"impl": IMPL.replace("dut", "other")}, str(tmp_path))
+    assert len(generator) == 2
+
+def test_new_generator_version_invalidates_testbenches(generator, tmp_path, monkeypatch):
+    Executor.testbench_generate({"impl": IMPL}, str(tmp_path))
+    monkeypatch.setattr(Executor, "TESTBENCH_VERSION", "next")
+    assert Executor.testbench_generate({"impl": IMPL}, str(tmp_path))["testbench"] == "module tb_2();\nendmodule\n"
+    assert len(generator) == 2
+
+def test_failures_are_not_stored(generator, tmp_path):
+    impl = IMPL + "// broken\n"
+    for _ in range(2):
+        assert Executor.testbench_generate({"impl": impl}, str(tmp_path)) == {"ok": False, "error": "Yosys failed"}
+    assert len(generator) == 2
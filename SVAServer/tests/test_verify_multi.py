@@ -0,0 +1,78 @@
+import httpx
+import pytest
+from Executor import label_assertions, label_statuses, verify_multi
+
+TB = "module tb(input clk, input tb_reset, input a, input b);\nendmodule\n"
+IMPL = "module dut(input clk, input rst, input a, output reg b);\nalways @(posedge clk) b <= a;\nendmodule\n"
+
+def assertion(consequent, label="old"):
+    return f"property p_{consequent}; @(posedge clk) a |=> {consequent}; endproperty\n{label}: assert property (p_{consequent});"
+
+def test_labels_replace_existing_ones():
+    labeled = label_assertions([assertion("b"), "@(posedge clk) a |=> b"])
+    assert [(label, has_label) for label, _, has_label in labeled] == [("asrt_0", True), ("asrt_1", False)]
+    # The label goes on the directive, after the property declaration
+    assert labeled[0][1].endswith("asrt_0: assert property (p_b);") and "old:" not in labeled[0][1]
+    assert [label for label, _, _ in label_assertions({"first": "assert property (a);", 2: "assert property (b);"})] == ["first", "2"]
+
+def test_statuses_by_label():
+    properties = [
+        {"name": "tb.inst.asrt_1", "status": "cex"},
+        {"name": "tb.assert_0", "status": "undetermined"},
+        {"name": "tb.asrt_0", "status": "proven"},
+    ]
+    statuses = label_statuses(["asrt_0", "asrt_1", "asrt_2", "missing"], properties, unlabeled={"asrt_2"})
+    # The unlabeled assertion gets the property no label claims
+    assert statuses == {"asrt_0": "proven", "asrt_1": "cex", "asrt_2": "undetermined", "missing": None}
+
+class FakeJasperGold:
+    # Proves every labeled assertion of one run, a run with "bad" in it has a syntax error
+    def __init__(self):
+        self.runs = []
+
+    def __call__(self, task, work_dir):
+        self.runs.append(task["asrt"])
+        if "bad" in task["asrt"]:
+            return {"ok": True, "syntax": 0.0, "functionality": 0.0, "func_relaxed": 0.0, "properties": []}
+        labels = [line.split(":")[0] for line in task["asrt"].splitlines() if ": assert" in line]
+        properties = [{"name": f"tb.{label}", "status": "cex" if "fails" in task["asrt"] and len(labels) == 1 else "proven"} for label in labels]
+        return {"ok": True, "syntax": 1.0, "functionality": 1.0, "func_relaxed": 1.0, "properties": properties}
+
+def test_all_assertions_in_one_run():
+    jg = FakeJasperGold()
+    result = verify_multi({"tb": TB, "asrts": [assertion("b"), assertion("a")]}, "work", jg)
+    assert len(jg.runs) == 1
+    assert result["labels"] == {"asrt_0": "proven", "asrt_1": "proven"}
+
+def test_syntax_error_falls_back_to_one_run_per_assertion():
+    jg = FakeJasperGold()
+    asrts = {"good": assertion("b"), "broken": assertion("bad"), "fails": assertion("fails")}
+    result = verify_multi({"tb": TB, "asrts": asrts}, "work", jg)
+    assert len(jg.runs) == 4
+    assert result["labels"] == {"good": "proven", "broken": "syntax_error", "fails": "cex"}
+    assert (result["syntax"], result["functionality"], result["func_relaxed"]) == (2 / 3, 1 / 3, 1 / 3)
+
+def test_single_assertion_with_syntax_error():
+    jg = FakeJasperGold()
+    result = verify_multi({"tb": TB, "asrts": [assertion("bad")]}, "work", jg)
+    assert len(jg.runs) == 1
+    assert result["labels"] == {"asrt_0": "syntax_error"}
+
+@pytest.fixture
+def server(processes):
+    return processes.server(result_cache=False)
+
+def test_verify_many_assertions(processes, server):
+    body = {"tb": TB, "impl": IMPL, "asrts": [assertion("b"), assertion("a")]}
+    result = httpx.post(server + "/verify", json=body, timeout=60).json()
+    assert result["labels"] == {"asrt_0": "proven", "asrt_1": "proven"}
+    assert processes.metric(server, "sva_tool_runs_total") == 1
+
+def test_verify_impl_only_with_a_broken_assertion(processes, server):
+    asrts = {"good": assertion("b"), "broken": assertion("STUB_SYNTAX_ERROR"), "unbalanced": "assert property (@(posedge clk) (a |=> b);"}
+    body = {"impl": IMPL, "top_name": "dut", "clock": "clk", "reset": "rst", "asrts": asrts}
+    result = httpx.post(server + "/verify_impl_only", json=body, timeout=60).json()
+    assert result["labels"] == {"good": "proven", "broken": "syntax_error", "unbalanced": "syntax_error"}
+    assert result["syntax"] == pytest.approx(1 / 3) and result["functionality"] == pytest.approx(1 / 3)
+    # The static checks reject the shared run and the unbalanced assertion before JasperGold
+    assert processes.metric(server, "sva_tool_runs_total") == 2
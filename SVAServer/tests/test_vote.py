@@ -0,0 +1,64 @@
+import Vote
+
+def run(vote, equivalent, limit=4):
+    # Answers every comparison with `equivalent(a, b)` of the node assertions until the vote is over
+    while not vote.finished():
+        pairs = vote.next_pairs(limit)
+        assert pairs
+        for a, b in pairs:
+            vote.record(a, b, equivalent(vote.nodes[a], vote.nodes[b]))
+    return vote.result()
+
+def test_union_find_roots_at_smallest_index():
+    classes = Vote.UnionFind([1, 2, 3, 4])
+    assert classes.union(3, 1) == 1
+    assert classes.union(2, 3) == 1
+    assert classes.find(2) == classes.find(3) == 1
+    assert classes.weight[1] == 2 + 4 + 3
+    assert classes.find(0) == 0
+
+def test_identical_forms_are_one_node():
+    vote = Vote.MajorityVote([
+        "a1: assert property (@(posedge clk) a |=> b);",
+        "a2: assert property (@(posedge clk) a |-> ##1 b);",
+        "a3: assert property (@(posedge clk) b |-> a);",
+    ])
+    assert vote.members == [[0, 1], [2]]
+    # The first node already holds two of the three assertions
+    assert vote.finished()
+    assert vote.comparisons == 0
+
+def test_next_pairs_hands_out_each_class_once():
+    vote = Vote.MajorityVote(["a", "b", "c", "d"])
+    assert vote.next_pairs(4) == [(0, 1), (2, 3)]
+    assert vote.next_pairs(4) == []
+    vote.record(0, 1, False)
+    # 2 and 3 are still being compared
+    assert vote.next_pairs(4) == []
+    vote.record(2, 3, False)
+    assert vote.next_pairs(4) == [(0, 2), (1, 3)]
+
+def test_vote_stops_at_majority():
+    asrts = ["x", "y", "x2", "z", "x3"]
+    result = run(Vote.MajorityVote(asrts), lambda a, b: a[0] == b[0], limit=1)
+    assert result["equivalence_classes"][0] == ["x", "x2", "x3"]
+    assert result["vote_result"] == "x"
+    # y and z were never compared
+    assert result["equivalence_classes"][1:] == [["y"], ["z"]]
+    assert result["comparisons"] == 4
+    assert result["stopped_early"]
+
+def test_vote_without_majority_compares_all_classes():
+    asrts = ["a", "b", "a2", "b2"]
+    result = run(Vote.MajorityVote(asrts), lambda a, b: a[0] == b[0], limit=1)
+    assert result["equivalence_classes"] == [["a", "a2"], ["b", "b2"]]
+    assert result["vote_result"] == "a"
+    assert not result["stopped_early"]
+
+def test_merged_class_keeps_known_differences():
+    vote = Vote.MajorityVote(["a", "b", "c", "d", "e"])
+    vote.record(0, 2, False)
+    vote.record(1, 2, True)
+    # 2 merged into 1, so 0 differs from the class of 1
+    assert frozenset((0, 1)) in vote.different
+    assert (0, 1) not in vote.next_pairs(10)